@@ -29,7 +29,10 @@ from .acicounters import (  # noqa
 from .aciHealthScore import HealthScore  # noqa
 from .aciFaults import (Faults)  # noqa
 from .aciSearch import AciSearch, Searchable  # noqa
-from .acisession import EventHandler, Login, Session, Subscriber  # noqa
+from .acimetrics import MetricsRegistry, serve_metrics  # noqa
+from .acireplay import RecordingAdapter, ReplayAdapter  # noqa
+from .acisession import (ApicResponse, BatchWriter, EventHandler, Login, RateLimiter,  # noqa
+                         ResponseCache, Session, Subscriber)
 from .aciTable import Table  # noqa
 from .acibaseobject import BaseACIObject, BaseRelation
 from .acitoolkit import (  # noqa
@@ -38,6 +38,7 @@ class CommonConcreteObject(BaseACIPhysObject):
     Intermediate abstract class that provides common methods for physical
     objects storing data in an 'attr' dictionary.
     """
+    __slots__ = ('attr', '_top')
 
     def __init__(self, parent=None):
         self.attr = {'dn': '', 'name': ''}
@@ -131,6 +132,7 @@ class ConcreteArp(CommonConcreteObject):
     self.domain[x].name
     self.domain[x].encap
     """
+    __slots__ = ('domain',)
 
     def __init__(self, parent=None):
         """
@@ -282,6 +284,7 @@ class ConcreteArp(CommonConcreteObject):
 
 
 class ConcreteArpDomain(CommonConcreteObject):
+    __slots__ = ('_stats', 'context', 'encap', 'tenant')
 
     def __init__(self, parent=None):
         """
@@ -404,6 +407,7 @@ class ConcreteArpDomain(CommonConcreteObject):
 
 
 class ConcreteArpEntry(CommonConcreteObject):
+    __slots__ = ('interface_id', 'ip', 'mac', 'oper_st', 'physical_interface')
 
     @staticmethod
     def _get_parent_class():
@@ -486,6 +490,7 @@ class ConcreteVpc(CommonConcreteObject):
 
     It will contain peer info and port membership.
     """
+    __slots__ = ('member_ports', 'peer_info')
 
     def __init__(self, parent=None):
         """
@@ -682,6 +687,7 @@ class ConcreteVpcIf(CommonConcreteObject):
     """
     Class to hold a VPC interface
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -846,6 +852,7 @@ class ConcreteContext(CommonConcreteObject):
     The l3-context on a switch.  This is derived from
     the concrete model
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -1011,6 +1018,7 @@ class ConcreteSVI(CommonConcreteObject):
     The SVIs on a switch.  This is derived from
     the concrete model in the switch
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -1158,6 +1166,7 @@ class ConcreteLoopback(CommonConcreteObject):
     """
     Loopback interfaces on the switch
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -1265,6 +1274,7 @@ class ConcreteBD(CommonConcreteObject):
     The bridge domain on a switch.  This is derived from
     the concrete model
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -1513,6 +1523,7 @@ class ConcreteAccCtrlRule(CommonConcreteObject):
     """
     Access control rules on a switch
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -1717,6 +1728,7 @@ class ConcreteFilter(CommonConcreteObject):
     """
     Access control filters on a switch
     """
+    __slots__ = ('entries',)
 
     def __init__(self, parent=None):
         """
@@ -1885,6 +1897,7 @@ class ConcreteFilterEntry(CommonConcreteObject):
     """
     Access control entries of a filter
     """
+    __slots__ = ()
 
     @staticmethod
     def _get_parent_class():
@@ -2001,6 +2014,7 @@ class ConcreteEp(CommonConcreteObject):
     """
     Endpoint on the switch
     """
+    __slots__ = ()
 
     def __init__(self, parent=None):
         """
@@ -2398,6 +2412,7 @@ class ConcretePortChannel(CommonConcreteObject):
     """
     This gets the port channels for the switch
     """
+    __slots__ = ('members',)
 
     def __init__(self, parent=None):
         """
@@ -2632,6 +2647,7 @@ class ConcreteTunnel(CommonConcreteObject):
     """
     Concrete representation of an overlay tunnel
     """
+    __slots__ = ('node',)
 
     def __init__(self, parent=None):
         """
@@ -2791,6 +2807,7 @@ class ConcreteOverlay(CommonConcreteObject):
     """
     Will retrieve the overlay information for the switch
     """
+    __slots__ = ('node',)
 
     def __init__(self, parent=None):
         """
@@ -2957,6 +2974,7 @@ class ConcreteOverlay(CommonConcreteObject):
 
 class BaseConcreteDp(CommonConcreteObject):
     """ BaseConcreteDp :  Base class for ConcreteCdp and ConcreteLLdp """
+    __slots__ = ()
 
     def __init__(self, parent=None):
         super(BaseConcreteDp, self).__init__(parent)
@@ -3024,6 +3042,7 @@ class ConcreteCdp(BaseConcreteDp):
     """
     The object that represents the CDP instance information. Currently only one CDP instance is supported
     """
+    __slots__ = ()
 
     def __init__(self, parent=None):
         """
@@ -3110,6 +3129,7 @@ class ConcreteCdp(BaseConcreteDp):
 
 
 class ConcreteCdpIf(CommonConcreteObject):
+    __slots__ = ('_stats',)
 
     def __init__(self, parent=None):
         """
@@ -3198,6 +3218,7 @@ class ConcreteCdpIf(CommonConcreteObject):
 
 
 class ConcreteCdpAdjEp(CommonConcreteObject):
+    __slots__ = ('duplex', 'neigh_device_id', 'neigh_int', 'neigh_platID', 'raw_local_interface', 'sysName')
 
     @staticmethod
     def _get_parent_class():
@@ -3281,6 +3302,7 @@ class ConcreteLLdp(BaseConcreteDp):
     """
     The object that represents the LLDP instance information. Currently only one LLDP instance is supported
     """
+    __slots__ = ()
 
     def __init__(self, parent=None):
         """
@@ -3366,6 +3388,7 @@ class ConcreteLLdp(BaseConcreteDp):
 
 
 class ConcreteLLdpIf(CommonConcreteObject):
+    __slots__ = ('_stats',)
 
     def __init__(self, parent=None):
         """
@@ -3455,6 +3478,7 @@ class ConcreteLLdpIf(CommonConcreteObject):
 
 
 class ConcreteLLdpAdjEp(CommonConcreteObject):
+    __slots__ = ('chassis_id_t', 'ip', 'mac', 'neigh_int', 'raw_local_interface')
 
     @staticmethod
     def _get_parent_class():
@@ -30,7 +30,6 @@
 """
 ACI Toolkit module for Health Scores
 """
-import json
 
 
 class HealthScore(object):
@@ -68,7 +67,7 @@ class HealthScore(object):
         :return: list of HealthScore objects
         """
         resp = session.get(url)
-        scores = json.loads(resp.text)['imdata']
+        scores = resp.json()['imdata']
         objects = []
         for score in scores:
             obj = HealthScore()
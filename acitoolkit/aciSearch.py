@@ -140,6 +140,7 @@ class AciSearch(object):
     This class is a base class that creates a method for rolling up through the object heirarchy all of the
     Searchable instances.
     """
+    __slots__ = ()
 
     def get_searchable(self):
         """
@@ -0,0 +1,826 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""  This module contains the AsyncSession class that communicates with the
+     APIC using asyncio.  It requires Python 3.5 or later and the aiohttp
+     library.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import time
+
+import requests
+from requests.exceptions import ConnectionError
+try:
+    import aiohttp
+    NO_AIOHTTP = False
+except ImportError:
+    NO_AIOHTTP = True
+
+from .acimetrics import MetricsRegistry
+from .acisession import (CredentialsError, GET_RETRIES, MIN_PAGE_SIZE, PAGE_SIZE,
+                         PAGE_WORKERS, RETRY_BACKOFF, TOO_BIG_ERROR, _backoff_delay,
+                         _split_page_size)
+
+
+class _EventSource(object):
+    """
+    Presents a single event received by an AsyncSession to the get_event
+    class method of the toolkit classes, which reads the events from a
+    Session.
+    """
+    def __init__(self, url, event):
+        self._url = url
+        self._event = event
+
+    def has_events(self, url):
+        return url == self._url and self._event is not None
+
+    def get_event(self, url):
+        if not self.has_events(url):
+            raise ValueError
+        event, self._event = self._event, None
+        return event
+
+
+class AsyncSession(object):
+    """
+       AsyncSession class
+       This class offers the same interface as Session but all of the APIC
+       communication methods are coroutines that share a single event loop
+       and a pooled HTTP client.  Login refresh, websocket event reception
+       and subscription refresh run as tasks on the same loop.
+
+       Only username and password authentication is supported.
+    """
+    def __init__(self, url, uid, pwd=None, verify_ssl=False,
+                 subscription_enabled=True, proxy=None, max_connections=100):
+        """
+        :param url:  String containing the APIC URL such as ``https://1.2.3.4``
+        :param uid: String containing the username that will be used as\
+        part of the  the APIC login credentials.
+        :param pwd: String containing the password that will be used as\
+        part of the  the APIC login credentials.
+        :param verify_ssl:  Used only for SSL connections with the APIC.\
+        Indicates whether SSL certificates must be verified.  Possible\
+        values are True and False with the default being False.
+        :param subscription_enabled: Boolean indicating whether the websocket\
+        should be opened on login.  Default is True.
+        :param proxy: Optional string containing the proxy URL passed\
+        directly to the aiohttp library
+        :param max_connections: Integer containing the maximum number of\
+        simultaneous connections kept in the HTTP connection pool
+        """
+        if NO_AIOHTTP:
+            raise ImportError('Cannot use AsyncSession because aiohttp is not available.\n\
+            Please install it using "pip install aiohttp"')
+        url = str(url)
+        uid = str(uid)
+        if pwd is None:
+            raise CredentialsError("A password must be provided")
+        if 'https://' in url:
+            self.ipaddr = url[len('https://'):]
+        else:
+            self.ipaddr = url[len('http://'):]
+        self.api = url
+        self.uid = uid
+        self.pwd = str(pwd)
+        self.verify_ssl = verify_ssl
+        self.token = None
+        self.session = None
+        self.login_error = False
+        self._logged_in = False
+        self._subscription_enabled = subscription_enabled
+        self._proxy = proxy
+        self._max_connections = max_connections
+        self.retry_backoff = RETRY_BACKOFF
+        self.metrics = MetricsRegistry()
+        self._login_timeout = 0
+        self._refresh_time = 30
+        self._relogin_callbacks = []
+        self._subscriptions = {}
+        self._subscription_urls = {}
+        self._events = {}
+        self._ws = None
+        self._ws_task = None
+        self._tasks = []
+        self._relogin_lock = None
+        self.page_size = PAGE_SIZE
+        self.max_page_workers = PAGE_WORKERS
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @staticmethod
+    def _build_response(status_code, content, url=None):
+        """
+        Build a requests.Response instance so that the results of the
+        coroutines can be consumed the same way as those of Session.
+
+        :param status_code: Integer containing the HTTP status code
+        :param content: bytes containing the body of the response
+        :param url: String containing the URL of the request
+        :returns: Instance of requests.Response
+        """
+        resp = requests.Response()
+        resp.status_code = status_code
+        resp._content = content
+        resp.encoding = 'utf-8'
+        resp.url = url
+        return resp
+
+    async def _request(self, method, url, data=None, timeout=None):
+        """
+        Send a single HTTP request to the APIC.
+
+        :param method: String containing the HTTP method
+        :param url: String containing the URL relative to the APIC address
+        :param data: Optional string containing the body of the request
+        :param timeout: Optional number of seconds before the request times out
+        :returns: Instance of requests.Response
+        """
+        full_url = self.api + url
+        kwargs = {'proxy': self._proxy}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        start = time.time()
+        try:
+            async with self.session.request(method, full_url, data=data, **kwargs) as resp:
+                content = await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if self.metrics is not None:
+                self.metrics.observe_request(method, url, time.time() - start, None, 0)
+            raise ConnectionError(e)
+        if self.metrics is not None:
+            self.metrics.observe_request(method, url, time.time() - start, resp.status, len(content))
+        return self._build_response(resp.status, content, full_url)
+
+    def _count(self, name, url):
+        """
+        Increment a counter of the metrics
+
+        :param name: String containing the counter name
+        :param url: String containing the URL relative to the APIC address
+        """
+        if self.metrics is not None:
+            self.metrics.inc(name, url)
+
+    def _open_client_session(self):
+        """
+        Create the pooled HTTP client used for all of the requests.
+        """
+        connector = aiohttp.TCPConnector(limit=self._max_connections,
+                                         ssl=None if self.verify_ssl else False)
+        # APIC cookies are returned for the IP address so allow them
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    async def _send_login(self, timeout=None):
+        """
+        Send the actual login request to the APIC and open the web
+        socket interface.
+        """
+        if self.session is None:
+            self._open_client_session()
+        self._logged_in = False
+        login_url = '/api/aaaLogin.json'
+        data = {'aaaUser': {'attributes': {'name': self.uid,
+                                           'pwd': self.pwd}}}
+        ret = await self._request('POST', login_url, data=json.dumps(data, sort_keys=True),
+                                  timeout=timeout)
+        if not ret.ok:
+            logging.error('Could not login to APIC.')
+            return ret
+        self._logged_in = True
+        ret_data = json.loads(ret.text)['imdata'][0]
+        timeout = ret_data['aaaLogin']['attributes']['refreshTimeoutSeconds']
+        self.token = str(ret_data['aaaLogin']['attributes']['token'])
+        if self._subscription_enabled:
+            await self._open_web_socket('https://' in self.api)
+        self._login_timeout = int(timeout) / 2
+        return ret
+
+    async def login(self, timeout=None):
+        """
+        Initiate login to the APIC.  Opens a communication session with the\
+        APIC and starts the tasks that keep the login and the subscriptions\
+        refreshed.
+
+        :returns: Response class instance from the requests library.\
+        response.ok is True if login is successful.
+        """
+        logging.info('Initializing connection to the APIC')
+        try:
+            resp = await self._send_login(timeout)
+        except ConnectionError as e:
+            logging.error('Could not login to APIC due to ConnectionError: %s', e)
+            return self._build_response(404, b'{"error": "Could not login to APIC due to ConnectionError"}')
+        if resp.ok:
+            self._tasks.append(asyncio.ensure_future(self._login_loop()))
+            if self._subscription_enabled:
+                self._tasks.append(asyncio.ensure_future(self._subscription_refresh_loop()))
+        return resp
+
+    def logged_in(self):
+        """
+        Returns whether the session is logged in to the APIC
+
+        :return: True or False. True if the session is logged in to the APIC.
+        """
+        return self._logged_in and not self.login_error
+
+    async def _relogin(self):
+        """
+        Login again and reissue the subscriptions.  Concurrent callers that
+        hit an expired token share a single relogin.
+        """
+        if self._relogin_lock is None:
+            self._relogin_lock = asyncio.Lock()
+        token = self.token
+        async with self._relogin_lock:
+            if token != self.token:
+                # Another coroutine has already logged back in
+                return None
+            resp = await self._send_login()
+        if resp.ok:
+            await self.resubscribe()
+        return resp
+
+    async def refresh_login(self, timeout=None):
+        """
+        Refresh the login to the APIC
+
+        :param timeout: Integer containing the number of seconds for connection timeout
+        :return: Instance of requests.Response
+        """
+        refresh_url = '/api/aaaRefresh.json'
+        resp = await self.get(refresh_url, timeout=timeout)
+        if not resp.ok:
+            logging.error('Could not refresh APIC login: %s', resp.status_code)
+            return resp
+        ret_data = json.loads(resp.text)['imdata'][0]
+        self.token = str(ret_data['aaaLogin']['attributes']['token'])
+        return resp
+
+    async def _login_loop(self):
+        """
+        Task responsible for refreshing the APIC login before timeout.
+        """
+        while True:
+            await asyncio.sleep(self._login_timeout)
+            try:
+                resp = await self.refresh_login(timeout=120)
+            except ConnectionError:
+                logging.error('Could not refresh APIC login due to ConnectionError')
+                self._login_timeout = 30
+                self.login_error = True
+            else:
+                if resp.ok:
+                    self._check_callbacks()
+                    continue
+            try:
+                resp = await self._relogin()
+                if resp is not None and resp.ok:
+                    self._check_callbacks()
+            except ConnectionError:
+                logging.error('Could not relogin to APIC due to ConnectionError')
+                self.login_error = True
+
+    def _check_callbacks(self):
+        """
+        Invoke the callback functions on a successful relogin
+        if there was an error response
+        """
+        if self.login_error:
+            logging.info('Logged back into the APIC')
+            self.login_error = False
+            self.invoke_login_callbacks()
+
+    async def close(self):
+        """
+        Close the session
+        """
+        tasks, self._tasks = self._tasks, []
+        self._ws_task = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def push_to_apic(self, url, data, timeout=None):
+        """
+        Push the object data to the APIC
+
+        :param url: String containing the URL that will be used to\
+                    send the object data to the APIC.
+        :param data: Dictionary containing the JSON objects to be sent\
+                     to the APIC.
+        :returns: Response class instance from the requests library.\
+                  response.ok is True if request is sent successfully.
+        """
+        logging.debug('Posting url: %s data: %s', url, data)
+        data = json.dumps(data, sort_keys=True)
+        resp = await self._request('POST', url, data=data, timeout=timeout)
+        if resp.status_code == 403:
+            logging.error(resp.text)
+            logging.error('Trying to login again....')
+            self._count('relogins', url)
+            await self._relogin()
+            logging.error('Trying post again...')
+            resp = await self._request('POST', url, data=data, timeout=timeout)
+        logging.debug('Response: %s %s', resp, resp.text)
+        return resp
+
+    async def _get_page(self, url, page_number, page_size, timeout=None):
+        """
+        Get a single page of a query result.
+
+        :param url: String containing the URL of the query
+        :param page_number: Integer containing the page to get
+        :param page_size: Integer containing the number of objects in a page
+        :returns: Instance of requests.Response
+        """
+        logging.debug('Getting page %s', page_number)
+        self._count('pages', url)
+        separator = '&' if '?' in url else '?'
+        return await self._request('GET', url + '%spage=%s&page-size=%s' % (separator, page_number, page_size),
+                                   timeout=timeout)
+
+    async def _get_pages(self, url, timeout=None):
+        """
+        Collect a response that is too big for the APIC to return at once.
+        The first page gives the total number of objects and the remaining
+        pages are then fetched concurrently and reassembled in order.
+
+        :param url: String containing the URL of the query
+        :returns: Instance of requests.Response containing all of the pages
+        """
+        logging.error('Response too big. Need to collect it in pages. Starting collection...')
+        page_size = self.page_size
+        resp = await self._get_page(url, 0, page_size, timeout)
+        while resp.status_code == 400 and TOO_BIG_ERROR in resp.text and page_size // 2 >= MIN_PAGE_SIZE:
+            page_size //= 2
+            logging.debug('Page too big. Reducing page size to %s', page_size)
+            resp = await self._get_page(url, 0, page_size, timeout)
+        if not resp.ok:
+            return resp
+        entries = resp.json()['imdata']
+        total_count = int(resp.json()['totalCount'])
+        remaining = total_count - page_size
+        if remaining > 0:
+            workers = max(1, self.max_page_workers)
+            fetch_size = _split_page_size(page_size, remaining, workers)
+            first_page = page_size // fetch_size
+            semaphore = asyncio.Semaphore(workers)
+
+            async def get_page(page_number):
+                async with semaphore:
+                    return await self._get_page(url, page_number, fetch_size, timeout)
+            pages = await asyncio.gather(*[get_page(page_number) for page_number in
+                                           range(first_page, first_page + (remaining + fetch_size - 1) // fetch_size)])
+            for page in pages:
+                if not page.ok:
+                    logging.error('Could not collect page %s', page.url)
+                    return page
+                entries += page.json()['imdata']
+        resp_content = {'imdata': entries,
+                        'totalCount': total_count}
+        resp._content = json.dumps(resp_content).encode()
+        return resp
+
+    async def get(self, url, timeout=None):
+        """
+        Perform a REST GET call to the APIC.
+
+        :param url: String containing the URL that will be used to\
+        send the object data to the APIC.
+        :returns: Response class instance from the requests library.\
+        response.ok is True if request is sent successfully.\
+        response.json() will return the JSON data sent back by the APIC.
+        """
+        logging.debug(url)
+        resp = await self._request('GET', url, timeout=timeout)
+        if resp.status_code == 403:
+            logging.error(resp.text)
+            logging.error('Trying to login again....')
+            self._count('relogins', url)
+            await self._relogin()
+            logging.error('Trying get again...')
+            resp = await self._request('GET', url, timeout=timeout)
+        elif resp.status_code == 400 and TOO_BIG_ERROR in resp.text:
+            resp = await self._get_pages(url, timeout=timeout)
+        elif 400 < resp.status_code < 600:
+            logging.debug('Received error: %s %s' % (str(resp.status_code), resp.text))
+            retries = GET_RETRIES
+            while retries > 0:
+                await asyncio.sleep(_backoff_delay(GET_RETRIES - retries, base=self.retry_backoff))
+                logging.debug('Retrying query')
+                self._count('retries', url)
+                resp = await self._request('GET', url, timeout=timeout)
+                if resp.status_code != 200:
+                    logging.debug('Retry was not successful.')
+                    retries -= 1
+                else:
+                    logging.debug('Retry was successful.')
+                    break
+            if retries == 0:
+                logging.error('Raising ConnectionError')
+                raise ConnectionError
+        logging.debug(resp)
+        return resp
+
+    async def _open_web_socket(self, use_secure=True):
+        """
+        Opens the web socket connection with the APIC and starts the task
+        that receives the events.
+
+        :param use_secure: Boolean indicating whether the web socket
+                           should be secure.  Default is True.
+        """
+        if use_secure:
+            ws_url = 'wss://%s/socket%s' % (self.ipaddr, self.token)
+        else:
+            ws_url = 'ws://%s/socket%s' % (self.ipaddr, self.token)
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+        if self._ws_task is not None:
+            # Replace the reader of the previous websocket
+            self._ws_task.cancel()
+            if self._ws_task in self._tasks:
+                self._tasks.remove(self._ws_task)
+            self._ws_task = None
+        try:
+            self._ws = await self.session.ws_connect(ws_url, proxy=self._proxy)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logging.error('Unable to open websocket connection')
+            self._ws = None
+            return
+        self._ws_task = asyncio.ensure_future(self._ws_reader(self._ws))
+        self._tasks.append(self._ws_task)
+
+    async def _ws_reader(self, ws):
+        """
+        Task responsible for websocket communication.
+        Receives events through the websocket and places them into the
+        queue of the subscribed URL.
+
+        :param ws: websocket to read the events from
+        """
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT or not len(msg.data):
+                continue
+            try:
+                event = json.loads(msg.data)
+            except ValueError:
+                logging.error('Non-JSON event: %s', msg.data)
+                continue
+            self._route_event(event)
+
+    def _route_event(self, event):
+        """
+        Put the event into correct bucket based on URLs that have been
+        subscribed.
+
+        :param event: Dictionary containing the decoded event
+        """
+        for subscription_id in event['subscriptionId']:
+            url = self._subscription_urls.get(str(subscription_id))
+            if url is None:
+                logging.debug('Event for unknown subscription id %s', subscription_id)
+                continue
+            self._event_queue(url).put_nowait(event)
+
+    def _set_subscription_id(self, url, subscription_id):
+        """
+        Record the subscription id of a URL and keep the index from the
+        subscription ids to the URLs used to route the events up to date.
+
+        :param url: URL string of the subscription
+        :param subscription_id: String containing the subscription id or\
+                                None if the subscription failed
+        """
+        self._remove_subscription_id(url)
+        self._subscriptions[url] = subscription_id
+        if subscription_id is not None:
+            self._subscription_urls[subscription_id] = url
+
+    def _remove_subscription_id(self, url):
+        """
+        Remove a URL from the index of the subscription ids
+
+        :param url: URL string of the subscription
+        """
+        subscription_id = self._subscriptions.get(url)
+        if self._subscription_urls.get(subscription_id) == url:
+            del self._subscription_urls[subscription_id]
+
+    def _event_queue(self, url):
+        """
+        Get the queue holding the events of a particular URL
+
+        :param url: URL string of the subscription
+        :returns: asyncio.Queue instance
+        """
+        if url not in self._events:
+            self._events[url] = asyncio.Queue()
+        return self._events[url]
+
+    async def _send_subscription(self, url, only_new=False):
+        """
+        Send the subscription for the specified URL.
+
+        :param url: URL string to issue the subscription
+        :param only_new: Boolean indicating whether to queue the existing objects
+        """
+        try:
+            resp = await self.get(url)
+        except ConnectionError:
+            resp = None
+        if resp is None or not resp.ok or 'subscriptionId' not in resp.json():
+            self._set_subscription_id(url, None)
+            logging.error('Could not send subscription to APIC for url %s', url)
+            return self._build_response(404, b'{"error": "Could not send subscription to APIC"}')
+        resp_data = resp.json()
+        self._set_subscription_id(url, str(resp_data['subscriptionId']))
+        if not only_new:
+            queue = self._event_queue(url)
+            for item in resp_data['imdata']:
+                queue.put_nowait({"totalCount": "1",
+                                  "subscriptionId": [resp_data['subscriptionId']],
+                                  "imdata": [item]})
+        return resp
+
+    async def subscribe(self, url, only_new=False):
+        """
+        Subscribe to events for a particular URL.
+
+        :param url:  URL string to issue subscription
+        :param only_new: Boolean indicating whether to get all events or only the new events.
+        """
+        if not self._subscription_enabled:
+            return
+        logging.info('Subscribing to url: %s', url)
+        if url in self._subscriptions:
+            return
+        if self._ws is None or self._ws.closed:
+            await self._open_web_socket('https://' in self.api)
+        return await self._send_subscription(url, only_new=only_new)
+
+    def is_subscribed(self, url):
+        """
+        Check if subscribed to events for a particular URL.
+
+        :param url:  URL string to issue subscription
+        """
+        return url in self._subscriptions
+
+    async def resubscribe(self):
+        """
+        Resubscribe to the current subscriptions.  Used after a re-login
+
+        :return: None
+        """
+        urls = list(self._subscriptions)
+        self._subscriptions = {}
+        self._subscription_urls = {}
+        await asyncio.gather(*[self.subscribe(url, only_new=True) for url in urls])
+
+    async def refresh_subscriptions(self):
+        """
+        Refresh all of the subscriptions.
+        """
+        if self._ws is None or self._ws.closed:
+            logging.warning('Websocket not established on subscription refresh. Re-establishing websocket')
+            await self._open_web_socket('https://' in self.api)
+        refreshes = []
+        for url, subscription_id in list(self._subscriptions.items()):
+            if subscription_id is None:
+                refreshes.append(self._send_subscription(url))
+            else:
+                refreshes.append(self.get('/api/subscriptionRefresh.json?id=' + subscription_id))
+        for resp in await asyncio.gather(*refreshes, return_exceptions=True):
+            if isinstance(resp, Exception) or not resp.ok:
+                logging.warning('Could not refresh subscription')
+                await self.resubscribe()
+                break
+
+    async def _subscription_refresh_loop(self):
+        """
+        Task responsible for refreshing the subscriptions before timer expiry.
+        """
+        while True:
+            await asyncio.sleep(self._refresh_time)
+            try:
+                await self.refresh_subscriptions()
+            except ConnectionError:
+                logging.error('Could not refresh subscriptions due to ConnectionError')
+
+    def has_events(self, url):
+        """
+        Check if there are events for a particular URL.
+
+        :param url:  URL string belonging to subscription
+        :returns: True or False. True if an event exists for this subscription.
+        """
+        return url in self._events and not self._events[url].empty()
+
+    def get_event_count(self, url):
+        """
+        Check the number of subscription events for a particular APIC URL
+
+        :param url:  URL string belonging to subscription
+        :returns: Interger number of events in event queue
+        """
+        if url not in self._events:
+            return 0
+        return self._events[url].qsize()
+
+    async def get_event(self, url, timeout=None):
+        """
+        Get an event for a particular URL.  Waits for the next event if\
+        none is pending.
+
+        :param url:  URL string belonging to subscription
+        :param timeout: Optional number of seconds to wait for an event.\
+        asyncio.TimeoutError is raised if it expires.
+        :returns: Dictionary containing the event
+        """
+        if url not in self._subscriptions and url not in self._events:
+            raise ValueError
+        event = await asyncio.wait_for(self._event_queue(url).get(), timeout)
+        logging.debug('Event received %s', event)
+        return event
+
+    @staticmethod
+    def _get_event_object(cls, url, event):
+        """
+        Build the toolkit object for an event in the same way as the\
+        get_event class method.  Classes whose get_event can look up the\
+        relations of the object with an additional query are built without them.
+
+        :param cls: toolkit class such as Tenant
+        :param url: URL string of the subscription the event was received on
+        :param event: Dictionary containing the event
+        :returns: toolkit object or None if the event is not for the class
+        """
+        source = _EventSource(url, event)
+        if 'with_relations' in inspect.signature(cls.get_event).parameters:
+            return cls.get_event(source, with_relations=False)
+        return cls.get_event(source)
+
+    async def events(self, *targets, only_new=False):
+        """
+        Asynchronous iterator over the events of toolkit classes or URLs::
+
+            async for event in session.events(EPG, Endpoint):
+                ...
+
+        The subscriptions are issued if needed and are refreshed and\
+        reissued after a relogin by the tasks of the session.
+
+        The events are only taken from the queues of the subscriptions as\
+        they are consumed.  The iterator should be closed with aclose(),\
+        or the session closed, once it is no longer used.
+
+        :param targets: toolkit classes such as Tenant, whose events are\
+                        yielded as the objects returned by their get_event,\
+                        or URL strings, whose events are yielded as\
+                        dictionaries.
+        :param only_new: Boolean indicating whether to get all events or\
+                         only the new events.
+        """
+        if not self._subscription_enabled:
+            logging.warning('Iterating over events on a session with subscriptions disabled')
+            return
+        sources = {}
+        for target in targets:
+            if isinstance(target, str):
+                sources[target] = target
+            else:
+                for url in target._get_subscription_urls():
+                    sources[url] = target
+        for url in sources:
+            await self.subscribe(url, only_new=only_new)
+
+        # Merge the event queues of the subscriptions.  The merged queue
+        # holds a single event so that the events not consumed yet stay in
+        # the queues of the subscriptions.
+        merged = asyncio.Queue(maxsize=1)
+
+        async def forward(url):
+            while True:
+                event = await self.get_event(url)
+                await merged.put((url, event))
+        forwarders = [asyncio.ensure_future(forward(url)) for url in sources]
+        # Closing the session stops the forwarders of an iterator that is never closed
+        self._tasks.extend(forwarders)
+        try:
+            while True:
+                url, event = await merged.get()
+                target = sources[url]
+                if isinstance(target, str):
+                    yield event
+                    continue
+                try:
+                    obj = self._get_event_object(target, url, event)
+                except Exception:
+                    logging.exception('Could not build %s from event %s', target.__name__, event)
+                    continue
+                if obj is not None:
+                    yield obj
+        finally:
+            for forwarder in forwarders:
+                forwarder.cancel()
+                if forwarder in self._tasks:
+                    self._tasks.remove(forwarder)
+            await asyncio.gather(*forwarders, return_exceptions=True)
+
+    async def unsubscribe(self, url):
+        """
+        Unsubscribe from events for a particular URL.
+
+        :param url:  URL string to remove issue subscription
+        """
+        logging.info('Unsubscribing from url: %s', url)
+        if url not in self._subscriptions:
+            return
+        if '&subscription=yes' in url:
+            unsubscribe_url = url.split('&subscription=yes')[0] + '&subscription=no'
+        elif '?subscription=yes' in url:
+            unsubscribe_url = url.split('?subscription=yes')[0] + '?subscription=no'
+        else:
+            raise ValueError('No subscription string in URL being unsubscribed')
+        resp = await self.get(unsubscribe_url)
+        if not resp.ok:
+            logging.warning('Could not unsubscribe from url: %s', unsubscribe_url)
+        self._remove_subscription_id(url)
+        del self._subscriptions[url]
+        self._events.pop(url, None)
+
+    def register_login_callback(self, callback_fn):
+        """
+        Register a callback function that will be called when the session performs a
+        successful relogin attempt after disconnecting from the APIC.
+
+        :param callback_fn: function to be called
+        """
+        if callback_fn not in self._relogin_callbacks:
+            self._relogin_callbacks.append(callback_fn)
+
+    def deregister_login_callback(self, callback_fn):
+        """
+        Delete the registration of a callback function that was registered via the
+        register_login_callback function.
+
+        :param callback_fn: function to be deregistered
+        """
+        if callback_fn in self._relogin_callbacks:
+            self._relogin_callbacks.remove(callback_fn)
+
+    def invoke_login_callbacks(self):
+        """
+        Invoke registered callback functions when the session performs a
+        successful relogin attempt after disconnecting from the APIC.
+        """
+        for callback_fn in self._relogin_callbacks:
+            callback_fn(self)
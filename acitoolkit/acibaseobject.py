@@ -30,18 +30,356 @@
 """
 This module implements the Base Class for creating all of the ACI Objects.
 """
+from collections import deque
 import logging
 from operator import attrgetter
 import sys
 
+from requests.exceptions import ConnectionError
+
 from .aciSearch import AciSearch, Searchable
 from .acisession import Session
 
 
+# Slots holding the attributes the identity of a BaseACIObject is derived
+# from, by the name of the property they are accessed through
+_IDENTITY_SLOTS = {'_name_slot': 'name', '_parent_slot': '_parent'}
+# Classes whose instances compare by the identity key of BaseACIObject
+_IDENTITY_CLASSES = {}
+# Classes whose name is held in the name slot of BaseACIObject
+_NAMED_CLASSES = {}
+# Keys standing for the class of a parent in the identity keys, by class
+_PARENT_CLASSES = {}
+# Attributes set before BaseACIObject.__init__ is called, in the order
+# they are set, by class
+_ATTRIBUTE_PREFIXES = {}
+# Object whose attribute assignments are recorded and the names recorded
+# so far, by class
+_ATTRIBUTE_TRACES = {}
+# Slots holding values derived from the other attributes
+_CACHE_SLOTS = ('_identity', '_child_index', '_relation_index', '_attachment_index')
+
+
+def _uses_identity_key(cls):
+    """
+    Check whether the instances of a class are compared with
+    BaseACIObject.__eq__, so that their identity key can stand in for them
+
+    :param cls: class of the object
+    :returns: True or False
+    """
+    uses_key = _IDENTITY_CLASSES.get(cls)
+    if uses_key is None:
+        owner = next(klass for klass in cls.__mro__ if '__eq__' in klass.__dict__)
+        uses_key = _IDENTITY_CLASSES[cls] = owner is BaseACIObject
+    return uses_key
+
+
+def _has_name_slot(cls):
+    """
+    Check whether the name of the instances of a class is held in the name
+    property of BaseACIObject, so that renaming them goes through its setter
+
+    :param cls: class of the object
+    :returns: True or False
+    """
+    named = _NAMED_CLASSES.get(cls)
+    if named is None:
+        named = _NAMED_CLASSES[cls] = getattr(cls, 'name', None) is BaseACIObject.__dict__['name']
+    return named
+
+
+class _ParentClass(str):
+    """
+    Class of a parent in an identity key.  The parents of two objects are
+    compared with isinstance, so the classes of the parents match when one
+    of them is a subclass of the other.  As the class is not part of the
+    hash of a parent, all of the keys hash alike.
+    """
+    __hash__ = str.__hash__
+
+    def __new__(cls, parent_class):
+        key = str.__new__(cls, 'parent')
+        key.parent_class = parent_class
+        return key
+
+    def __eq__(self, other):
+        if isinstance(other, _ParentClass):
+            return (issubclass(self.parent_class, other.parent_class) or
+                    issubclass(other.parent_class, self.parent_class))
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return '_ParentClass(%s)' % self.parent_class.__name__
+
+
+def _get_parent_class(cls):
+    """
+    Get the key standing for the class of a parent in the identity keys.
+    There is one key per class so that the keys of parents of the same
+    class are identical.
+
+    :param cls: class of the parent
+    :returns: _ParentClass instance
+    """
+    key = _PARENT_CLASSES.get(cls)
+    if key is None:
+        key = _PARENT_CLASSES[cls] = _ParentClass(cls)
+    return key
+
+
+def _remove_identical(objects, obj):
+    """
+    Remove an object from a list by identity rather than equality
+
+    :param objects: list of objects
+    :param obj: object to remove
+    """
+    for i, other in enumerate(objects):
+        if other is obj:
+            del objects[i]
+            return
+
+
+class _ChildIndex(object):
+    """
+    Index of the children of an object by class and by name.  The lists
+    of the index keep the order of the children list they mirror.
+    """
+    __slots__ = ('children', 'size', 'by_class', 'by_name', 'rename_generation')
+
+    def __init__(self, children):
+        self.children = children
+        self.size = 0
+        self.by_class = {}
+        self.by_name = None
+        self.rename_generation = None
+        for child in children:
+            self.add(child)
+
+    def is_current(self, children):
+        """
+        Check whether the index still mirrors a children list
+
+        :param children: children list of the object owning the index
+        :returns: True or False
+        """
+        return self.children is children and self.size == len(children)
+
+    def add(self, child):
+        """
+        Add a child appended to the children list
+        """
+        self.by_class.setdefault(type(child), []).append(child)
+        if self.by_name is not None and _has_name_slot(type(child)):
+            self.by_name.setdefault((type(child), child.name), []).append(child)
+        self.size += 1
+
+    def remove(self, child):
+        """
+        Remove a child removed from the children list
+        """
+        children = self.by_class[type(child)]
+        _remove_identical(children, child)
+        if not children:
+            del self.by_class[type(child)]
+        if self.by_name is not None and _has_name_slot(type(child)):
+            _remove_identical(self.by_name.get((type(child), child.name), []), child)
+        self.size -= 1
+
+    def get_classes(self, only_class):
+        """
+        Get the classes of the children that are instances of a class
+
+        :param only_class: class or tuple of classes
+        :returns: list of classes
+        """
+        return [cls for cls in self.by_class if issubclass(cls, only_class)]
+
+    def get_named(self, cls, name):
+        """
+        Get the children of a class with a given name.  The name index is
+        built on first use and rebuilt after any object has been renamed.
+
+        :param cls: class of the children whose name is held in the name slot
+        :param name: name of the children
+        :returns: list of children
+        """
+        if self.by_name is None or self.rename_generation != BaseACIObject._rename_generation:
+            self.rename_generation = BaseACIObject._rename_generation
+            self.by_name = {}
+            for child_class, children in self.by_class.items():
+                if _has_name_slot(child_class):
+                    for child in children:
+                        self.by_name.setdefault((child_class, child.name), []).append(child)
+        return self.by_name.get((cls, name), ())
+
+
+class _RelationIndex(object):
+    """
+    Index of the relations or the attachments of an object by the class of
+    their item and their relation type, and by the name of their item.  The
+    lists of the index keep the order of the relation list they mirror.
+    The status of a relation changes in place so it is not indexed.
+    """
+    __slots__ = ('relations', 'size', 'by_class', 'by_name', 'rename_generation')
+
+    def __init__(self, relations):
+        self.relations = relations
+        self.size = 0
+        self.by_class = {}
+        self.by_name = None
+        self.rename_generation = None
+        for relation in relations:
+            self.add(relation)
+
+    def is_current(self, relations):
+        """
+        Check whether the index still mirrors a relation list
+
+        :param relations: relation or attachment list of the object owning the index
+        :returns: True or False
+        """
+        return self.relations is relations and self.size == len(relations)
+
+    def add(self, relation):
+        """
+        Add a relation appended to the relation list
+        """
+        key = (type(relation.item), relation.relation_type)
+        self.by_class.setdefault(key, []).append(relation)
+        if self.by_name is not None and _has_name_slot(key[0]):
+            self.by_name.setdefault(key + (relation.item.name,), []).append(relation)
+        self.size += 1
+
+    def remove(self, relation):
+        """
+        Remove a relation removed from the relation list
+        """
+        key = (type(relation.item), relation.relation_type)
+        relations = self.by_class[key]
+        _remove_identical(relations, relation)
+        if not relations:
+            del self.by_class[key]
+        if self.by_name is not None and _has_name_slot(key[0]):
+            _remove_identical(self.by_name.get(key + (relation.item.name,), []), relation)
+        self.size -= 1
+
+    def get_by_class(self, item_class, relation_type=None, any_type=False):
+        """
+        Get the relations whose item is an instance of a class
+
+        :param item_class: class or tuple of classes of the item
+        :param relation_type: relation type of the relations
+        :param any_type: True to get the relations of any relation type
+        :returns: list of relations in the order of the relation list
+        """
+        keys = [key for key in self.by_class
+                if issubclass(key[0], item_class) and (any_type or key[1] == relation_type)]
+        if len(keys) == 1:
+            return self.by_class[keys[0]]
+        if not keys:
+            return []
+        keys = set(keys)
+        return [relation for relation in self.relations
+                if (type(relation.item), relation.relation_type) in keys]
+
+    def get_equal(self, item, relation_type=None):
+        """
+        Get the relations of a relation type whose item may be equal to an
+        object.  Where the items compare by the identity key, only those
+        of a related class with the same name are returned.
+
+        :param item: object the items are compared with
+        :param relation_type: relation type of the relations
+        :returns: list of relations, not in the order of the relation list
+        """
+        item_class = type(item)
+        if not isinstance(item, BaseACIObject) or not _uses_identity_key(item_class):
+            return [relation for relation in self.relations
+                    if relation.relation_type == relation_type]
+        resp = []
+        for (cls, rtype), relations in list(self.by_class.items()):
+            if rtype != relation_type:
+                continue
+            if _uses_identity_key(cls) and _has_name_slot(cls):
+                # Equal objects are of related classes and have the same name
+                if issubclass(cls, item_class) or issubclass(item_class, cls):
+                    resp.extend(self._get_named(cls, rtype, item.name))
+            else:
+                resp.extend(relations)
+        return resp
+
+    def _get_named(self, cls, relation_type, name):
+        """
+        Get the relations whose item has a given class and name.  The name
+        index is built on first use and rebuilt after any object has been
+        renamed.
+        """
+        if self.by_name is None or self.rename_generation != BaseACIObject._rename_generation:
+            self.rename_generation = BaseACIObject._rename_generation
+            self.by_name = {}
+            for key, relations in self.by_class.items():
+                if _has_name_slot(key[0]):
+                    for relation in relations:
+                        self.by_name.setdefault(key + (relation.item.name,), []).append(relation)
+        return self.by_name.get((cls, relation_type, name), ())
+
+
+def _record_attribute(obj, name, value):
+    """
+    __setattr__ of a class while the first of its instances is created.
+    Records the order in which the object sets its attributes before
+    BaseACIObject.__init__ is called.
+    """
+    object.__setattr__(obj, name, value)
+    trace = _ATTRIBUTE_TRACES.get(type(obj))
+    if trace is not None and trace[0] is obj:
+        name = _IDENTITY_SLOTS.get(name, name)
+        if name not in trace[1]:
+            trace[1].append(name)
+
+
+def _get_attribute_names(obj):
+    """
+    Get the names of the attributes set on an object in the order they
+    are set.  The attributes that the class sets before calling
+    BaseACIObject.__init__ come first, followed by those held in
+    __slots__, from the base class down, and by those in the instance
+    __dict__.  This is the order of the instance __dict__ when it held
+    all of the attributes.
+
+    :param obj: object whose attributes are listed
+    :returns: list of attribute name strings
+    """
+    names = []
+    for klass in reversed(type(obj).__mro__):
+        for name in klass.__dict__.get('__slots__', ()):
+            if name in ('__dict__', '__weakref__') or name in _CACHE_SLOTS or name in names:
+                continue
+            try:
+                # The slot descriptor is used directly as a subclass may
+                # shadow the slot with a property
+                klass.__dict__[name].__get__(obj, klass)
+            except AttributeError:
+                continue
+            names.append(_IDENTITY_SLOTS.get(name, name))
+    names.extend(name for name in getattr(obj, '__dict__', ()) if name not in names)
+    prefix = _ATTRIBUTE_PREFIXES.get(type(obj))
+    if prefix:
+        names = [name for name in prefix if name in names] + [name for name in names if name not in prefix]
+    return names
+
+
 class BaseRelation(object):
     """
     Class for all basic relations.
     """
+    __slots__ = ('item', 'status', 'relation_type')
 
     def __init__(self, item, status, relation_type=None):
         """
@@ -96,11 +434,69 @@ class BaseRelation(object):
         return not self == other
 
 
+class _EventBatch(object):
+    """
+    Stands in for the Session while events drained in bulk are turned into
+    objects.  The subscription event calls are answered from the drained
+    events and everything else is passed to the real Session.
+    """
+    def __init__(self, session):
+        self._session = session
+        self._events = {}
+
+    def __getattr__(self, item):
+        return getattr(self._session, item)
+
+    def __len__(self):
+        return sum(len(events) for events in self._events.values())
+
+    def add(self, url, events):
+        """
+        Add the events drained for a subscription URL
+
+        :param url: URL string of the subscription
+        :param events: list of event dictionaries
+        """
+        self._events.setdefault(url, deque()).extend(events)
+
+    def has_events(self, url):
+        return len(self._events.get(url, ())) != 0
+
+    def get_event(self, url):
+        if not self.has_events(url):
+            raise ValueError
+        return self._events[url].popleft()
+
+
 class BaseACIObject(AciSearch):
     """
     This class defines functionality common to all ACI objects.
     Functions may be overwritten by inheriting classes.
+
+    The attributes common to all of the objects are held in __slots__.
+    Subclasses that are instantiated in large numbers declare their own
+    attributes in __slots__ as well.  Any other attribute is kept in the
+    instance __dict__, which is only allocated when such an attribute
+    is first set.
     """
+    __slots__ = ('_name_slot', '_deleted', '_children', '_relations', '_attachments', '_tags',
+                 '_parent_slot', 'descr', 'dn', '_session', '_identity', '_child_index',
+                 '_relation_index', '_attachment_index', '__dict__')
+    # Incremented whenever an object whose identity key may be cached is
+    # renamed or moved, which makes every cached identity key stale
+    _identity_generation = 0
+    # Incremented whenever an object is renamed, which makes the name
+    # indexes of the children stale
+    _rename_generation = 0
+
+    def __new__(cls, *args, **kwargs):
+        obj = super(BaseACIObject, cls).__new__(cls)
+        if cls not in _ATTRIBUTE_PREFIXES:
+            # Record the order in which the first instance sets its
+            # attributes until BaseACIObject.__init__ is called
+            _ATTRIBUTE_TRACES[cls] = (obj, [])
+            cls.__setattr__ = _record_attribute
+        return obj
 
     def __init__(self, name=None, parent=None):
         """
@@ -118,6 +514,16 @@ class BaseACIObject(AciSearch):
             raise TypeError
         if isinstance(parent, str):
             raise TypeError("Parent object can't be a string")
+        if self.__class__ not in _ATTRIBUTE_PREFIXES:
+            trace = _ATTRIBUTE_TRACES.get(self.__class__)
+            if trace is not None and trace[0] is self:
+                del _ATTRIBUTE_TRACES[self.__class__]
+                del self.__class__.__setattr__
+                _ATTRIBUTE_PREFIXES[self.__class__] = trace[1]
+        self._identity = None
+        self._child_index = None
+        self._relation_index = None
+        self._attachment_index = None
         self.name = name
         self._deleted = False
         self._children = []
@@ -485,6 +891,39 @@ class BaseACIObject(AciSearch):
                 obj.mark_as_deleted()
             return obj
 
+    @classmethod
+    def get_events(cls, session, max_events=None):
+        """
+        Gets the events that are pending for this class in a single call.\
+        The pending events are taken from the subscriptions in bulk and\
+        then turned into objects the same way as get_event().
+
+        :param session:  the instance of Session used for APIC communication
+        :param max_events: Optional maximum number of events to process.\
+                           All of the pending events are processed if None.
+        :returns: list of objects, oldest event first
+        """
+        batch = _EventBatch(session)
+        for url in cls._get_subscription_urls():
+            if max_events is not None:
+                remaining = max_events - len(batch)
+                if remaining <= 0:
+                    break
+            else:
+                remaining = None
+            if session.has_events(url):
+                batch.add(url, session.drain_events(url, remaining))
+        objs = []
+        while len(batch):
+            pending = len(batch)
+            obj = cls.get_event(batch)
+            if obj is not None:
+                objs.append(obj)
+            if len(batch) == pending:
+                logging.error('Events not handled by %s.get_event', cls.__name__)
+                break
+        return objs
+
     @classmethod
     def has_events(cls, session, extension=''):
         """
@@ -604,12 +1043,71 @@ class BaseACIObject(AciSearch):
         :param item:  Object to be attached.
         """
         if self.is_attached(item):
-            self._relations.remove(BaseRelation(item, 'attached'))
-            relation = BaseRelation(self, 'attached')
-            if relation in item._attachments:
-                item._attachments.remove(relation)
-        self._relations.append(BaseRelation(item, 'attached'))
-        item._attachments.append(BaseRelation(self, 'attached'))
+            self._pop_relation(BaseRelation(item, 'attached'))
+            if item._check_attachment(self, 'attached'):
+                item._pop_relation(BaseRelation(self, 'attached'), attachments=True)
+        self._append_relation(BaseRelation(item, 'attached'))
+        item._append_relation(BaseRelation(self, 'attached'), attachments=True)
+
+    def _get_relation_list(self, attachments=False):
+        """
+        Get the list of relations, or of attachments, with the name of the
+        slot holding its index
+        """
+        if attachments:
+            return self._attachments, '_attachment_index'
+        return self._relations, '_relation_index'
+
+    def _get_relation_index(self, attachments=False):
+        """
+        Get the index of the relations, or of the attachments, building it
+        if the list has changed other than through _append_relation and
+        _pop_relation
+
+        :param attachments: True to get the index of the attachments
+        :returns: _RelationIndex instance
+        """
+        relations, slot = self._get_relation_list(attachments)
+        index = getattr(self, slot, None)
+        if index is None or not index.is_current(relations):
+            index = _RelationIndex(relations)
+            setattr(self, slot, index)
+        return index
+
+    def _append_relation(self, relation, attachments=False):
+        """
+        Append a relation to the relations, or to the attachments, keeping
+        their index current
+
+        :param relation: BaseRelation instance
+        :param attachments: True to append to the attachments
+        """
+        relations, slot = self._get_relation_list(attachments)
+        relations.append(relation)
+        index = getattr(self, slot, None)
+        if index is None:
+            return
+        if index.relations is relations and index.size == len(relations) - 1:
+            index.add(relation)
+        else:
+            setattr(self, slot, None)
+
+    def _pop_relation(self, relation, attachments=False):
+        """
+        Remove the first relation equal to a relation from the relations,
+        or from the attachments, keeping their index current
+
+        :param relation: BaseRelation instance
+        :param attachments: True to remove from the attachments
+        """
+        relations, slot = self._get_relation_list(attachments)
+        index = getattr(self, slot, None)
+        if index is not None and not index.is_current(relations):
+            index = None
+            setattr(self, slot, None)
+        removed = relations.pop(relations.index(relation))
+        if index is not None:
+            index.remove(removed)
 
     def _check_relation(self, item, status):
         """
@@ -618,8 +1116,8 @@ class BaseACIObject(AciSearch):
 
         :returns: True or False, True indicates the relation exists.
         """
-        check = BaseRelation(item, status)
-        return check in self._relations
+        return any(relation.item == item and relation.status == status
+                   for relation in self._get_relation_index().get_equal(item))
 
     def is_attached(self, item):
         """
@@ -646,11 +1144,11 @@ class BaseACIObject(AciSearch):
         :param item:  Object to be detached.
         """
         if self.is_attached(item):
-            self._relations.remove(BaseRelation(item, 'attached'))
-            item._attachments.remove(BaseRelation(self, 'attached'))
+            self._pop_relation(BaseRelation(item, 'attached'))
+            item._pop_relation(BaseRelation(self, 'attached'), attachments=True)
         if not self.is_detached(item):
-            self._relations.append(BaseRelation(item, 'detached'))
-            item._attachments.append(BaseRelation(self, 'detached'))
+            self._append_relation(BaseRelation(item, 'detached'))
+            item._append_relation(BaseRelation(self, 'detached'), attachments=True)
 
     def _check_attachment(self, item, status):
         """
@@ -659,8 +1157,9 @@ class BaseACIObject(AciSearch):
 
         :returns: True or False, True indicates the attachment exists.
         """
-        check = BaseRelation(item, status)
-        return check in self._attachments
+        index = self._get_relation_index(attachments=True)
+        return any(relation.item == item and relation.status == status
+                   for relation in index.get_equal(item))
 
     def has_attachment(self, item):
         """
@@ -676,6 +1175,32 @@ class BaseACIObject(AciSearch):
         """
         return self._check_attachment(item, 'detached')
 
+    def _get_child_index(self):
+        """
+        Get the index of the children, building it if the children list
+        has changed other than through add_child and remove_child
+
+        :returns: _ChildIndex instance
+        """
+        index = getattr(self, '_child_index', None)
+        if index is None or not index.is_current(self._children):
+            index = self._child_index = _ChildIndex(self._children)
+        return index
+
+    def _child_added(self, obj):
+        """
+        Update the index of the children after a child has been appended
+
+        :param obj: Child object appended to the children list
+        """
+        index = getattr(self, '_child_index', None)
+        if index is None:
+            return
+        if index.children is self._children and index.size == len(self._children) - 1:
+            index.add(obj)
+        else:
+            self._child_index = None
+
     def get_child(self, child_type, child_name):
         """
         Gets a specific immediate child of this object
@@ -684,8 +1209,11 @@ class BaseACIObject(AciSearch):
         :param child_name: Name of the child to return
         :return: The specific instance of child_type or None if not found
         """
-        children = self.get_children(child_type)
-        for child in children:
+        classes = self._get_child_index().get_classes(child_type)
+        if len(classes) == 1 and _has_name_slot(classes[0]):
+            children = self._child_index.get_named(classes[0], child_name)
+            return children[0] if children else None
+        for child in self.get_children(child_type):
             if child.name == child_name:
                 return child
         return None
@@ -700,11 +1228,11 @@ class BaseACIObject(AciSearch):
         :returns: List of children objects.
         """
         if only_class is not None:
-            resp = []
-            for child in self._children:
-                if isinstance(child, only_class):
-                    resp.append(child)
-            return resp
+            index = self._get_child_index()
+            classes = index.get_classes(only_class)
+            if len(classes) <= 1:
+                return list(index.by_class[classes[0]]) if classes else []
+            return [child for child in self._children if isinstance(child, only_class)]
         return self._children
 
     def add_child(self, obj):
@@ -717,6 +1245,7 @@ class BaseACIObject(AciSearch):
         if not obj.has_parent():
             obj.set_parent(self)
         self._children.append(obj)
+        self._child_added(obj)
 
     def has_child(self, obj):
         """
@@ -726,7 +1255,20 @@ class BaseACIObject(AciSearch):
         :returns:  True or False, True indicates that it does indeed\
                    have the `obj` object as a child.
         """
-        return any(child == obj for child in self._children)
+        obj_class = obj.__class__
+        if not isinstance(obj, BaseACIObject) or not _uses_identity_key(obj_class):
+            return any(child == obj for child in self._children)
+        index = self._get_child_index()
+        for cls, children in list(index.by_class.items()):
+            if _uses_identity_key(cls) and _has_name_slot(cls):
+                # Equal objects are of related classes and have the same name
+                if issubclass(cls, obj_class) or issubclass(obj_class, cls):
+                    children = index.get_named(cls, obj.name)
+                else:
+                    continue
+            if any(child == obj for child in children):
+                return True
+        return False
 
     def remove_child(self, obj):
         """
@@ -734,7 +1276,12 @@ class BaseACIObject(AciSearch):
 
         :param obj:  Child object that is to be removed.
         """
-        self._children.remove(obj)
+        index = getattr(self, '_child_index', None)
+        if index is not None and not index.is_current(self._children):
+            index = self._child_index = None
+        child = self._children.pop(self._children.index(obj))
+        if index is not None:
+            index.remove(child)
 
     def populate_children(self, deep=False, include_concrete=False):
         """
@@ -807,18 +1354,13 @@ class BaseACIObject(AciSearch):
 
     def _has_any_relation(self, other_class):
         """Check if the object has any relation to the other class"""
-        for relation in self._relations:
-            is_other_class = isinstance(relation.item, other_class)
-            if is_other_class and relation.is_attached():
-                return True
-        return False
+        relations = self._get_relation_index().get_by_class(other_class, any_type=True)
+        return any(relation.is_attached() for relation in relations)
 
     def _has_relation(self, obj, relation_type=None):
         """Check if the object has a relation to the other object"""
-        for relation in self._relations:
-            same_item = relation.item == obj
-            same_relation_type = relation.relation_type == relation_type
-            if same_item and relation.is_attached() and same_relation_type:
+        for relation in self._get_relation_index().get_equal(obj, relation_type):
+            if relation.item == obj and relation.is_attached():
                 return True
         return False
 
@@ -826,9 +1368,8 @@ class BaseACIObject(AciSearch):
         """Add a relation to the object"""
         if self._has_relation(obj):
             return
-        relation = BaseRelation(obj, 'attached', relation_type)
-        self._relations.append(relation)
-        obj._attachments.append(BaseRelation(self, 'attached', relation_type))
+        self._append_relation(BaseRelation(obj, 'attached', relation_type))
+        obj._append_relation(BaseRelation(self, 'attached', relation_type), attachments=True)
 
     def _remove_attachment(self, obj, relation_type=None):
         """
@@ -837,27 +1378,23 @@ class BaseACIObject(AciSearch):
         :param obj: Object that is the subject of the attachment
         :param relation_type: String indicating the relation type
         """
-        removal_attachment = BaseRelation(obj, 'attached', relation_type)
-        for attachment in self._attachments:
-            if attachment == removal_attachment:
+        index = self._get_relation_index(attachments=True)
+        for attachment in index.get_equal(obj, relation_type):
+            if attachment.item == obj and attachment.is_attached():
                 attachment.set_as_detached()
 
     def _remove_relation(self, obj, relation_type=None):
         """Remove a relation from the object"""
-        removal = BaseRelation(obj, 'attached', relation_type)
-        for relation in self._relations:
-            if relation == removal:
+        for relation in self._get_relation_index().get_equal(obj, relation_type):
+            if relation.item == obj and relation.is_attached():
                 relation.set_as_detached()
                 obj._remove_attachment(relation.item, relation_type)
         return True
 
     def _remove_all_relation(self, obj_class, relation_type=None):
         """Remove all relations belonging to a particular class"""
-        for relation in self._relations:
-            same_obj_class = isinstance(relation.item, obj_class)
-            same_relation_type = relation.relation_type == relation_type
-            attached = relation.is_attached()
-            if same_obj_class and same_relation_type and attached:
+        for relation in self._get_relation_index().get_by_class(obj_class, relation_type):
+            if relation.is_attached():
                 relation.set_as_detached()
                 relation.item._remove_attachment(self, relation_type)
 
@@ -865,34 +1402,19 @@ class BaseACIObject(AciSearch):
         """Return a single relation belonging to a particular class.
            This will return the first relation encountered.
         """
-        for relation in self._relations:
-            same_obj_class = isinstance(relation.item, obj_class)
-            same_relation_type = relation.relation_type == relation_type
-            attached = relation.is_attached()
-            if same_obj_class and attached and same_relation_type:
+        for relation in self._get_relation_index().get_by_class(obj_class, relation_type):
+            if relation.is_attached():
                 return relation.item
 
     def _get_all_relation(self, obj_class, relation_type=None):
         """Get all relations belonging to a particular class"""
-        resp = []
-        for relation in self._relations:
-            same_obj_class = isinstance(relation.item, obj_class)
-            same_relation_type = relation.relation_type == relation_type
-            attached = relation.is_attached()
-            if same_obj_class and attached and same_relation_type:
-                resp.append(relation.item)
-        return resp
+        return [relation.item for relation in self._get_relation_index().get_by_class(obj_class, relation_type)
+                if relation.is_attached()]
 
     def _get_all_detached_relation(self, obj_class, relation_type=None):
         """Get all detached relations belonging to a particular class"""
-        resp = []
-        for relation in self._relations:
-            same_obj_class = isinstance(relation.item, obj_class)
-            same_relation_type = relation.relation_type == relation_type
-            attached = relation.is_attached()
-            if same_obj_class and not attached and same_relation_type:
-                resp.append(relation.item)
-        return resp
+        return [relation.item for relation in self._get_relation_index().get_by_class(obj_class, relation_type)
+                if relation.is_detached()]
 
     def get_interfaces(self, status='attached'):
         """
@@ -911,24 +1433,18 @@ class BaseACIObject(AciSearch):
                 resp.append(relation.item)
         return resp
 
-    def _get_all_relations_by_class(self, relations, attached_class,
+    def _get_all_relations_by_class(self, index, attached_class,
                                     status='attached', relation_type=None):
         """
         Internal function to get relations or attachments for a given class.
 
-        :param relations: list of relations or attachments
+        :param index: _RelationIndex of the relations or attachments
         :param attached_class:  The class that is the subject of the search.
         :param status:  Valid values are 'attached' and 'detached'.\
                         Default is 'attached'.
         """
-        resp = []
-        for relation in relations:
-            same_class = isinstance(relation.item, attached_class)
-            same_status = relation.status == status
-            same_relation_type = (relation.relation_type == relation_type) or relation_type is None
-            if same_relation_type and same_class and same_status:
-                resp.append(relation.item)
-        return resp
+        relations = index.get_by_class(attached_class, relation_type, any_type=relation_type is None)
+        return [relation.item for relation in relations if relation.status == status]
 
     def get_all_attached(self, attached_class, status='attached', relation_type=None):
         """
@@ -939,7 +1455,7 @@ class BaseACIObject(AciSearch):
         :param status:  Valid values are 'attached' and 'detached'.\
                         Default is 'attached'.
         """
-        return self._get_all_relations_by_class(self._relations,
+        return self._get_all_relations_by_class(self._get_relation_index(),
                                                 attached_class,
                                                 status=status,
                                                 relation_type=relation_type)
@@ -953,7 +1469,7 @@ class BaseACIObject(AciSearch):
         :param status:  Valid values are 'attached' and 'detached'.\
                         Default is 'attached'.
         """
-        return self._get_all_relations_by_class(self._attachments,
+        return self._get_all_relations_by_class(self._get_relation_index(attachments=True),
                                                 attached_class,
                                                 status=status,
                                                 relation_type=relation_type)
@@ -1006,15 +1522,81 @@ class BaseACIObject(AciSearch):
                             'children': children_json}}
         return resp
 
+    def _reset_identity(self):
+        """
+        Drop the cached identity key of the object when it is renamed or moved
+        """
+        if getattr(self, '_identity', None) is not None:
+            # The keys cached by the descendants include this one
+            self._identity = None
+            BaseACIObject._identity_generation += 1
+
+    def _set_name(self, name):
+        current = getattr(self, '_name_slot', None)
+        if current is not name and current != name:
+            if current is not None:
+                BaseACIObject._rename_generation += 1
+            self._reset_identity()
+        self._name_slot = name
+
+    def _set_parent(self, parent):
+        if getattr(self, '_parent_slot', None) is not parent:
+            self._reset_identity()
+        self._parent_slot = parent
+
+    # The identity attributes are the only ones whose assignment is checked.
+    # They are read through attrgetter so that reading them runs no Python code.
+    name = property(attrgetter('_name_slot'), _set_name)
+    _parent = property(attrgetter('_parent_slot'), _set_parent)
+
+    def _get_identity(self):
+        """
+        Get the identity key of the object and its hash.  The key is made
+        of the name of the object and the class and key of its parent, the
+        class matching the subclasses and base classes of its own, so
+        that two objects with the same key are at the same place in the
+        object model, i.e. have the same DN.  It is computed once and
+        reused until an object is renamed or moved.
+
+        :returns: tuple of the identity key and its hash
+        """
+        try:
+            identity = self._identity
+        except AttributeError:
+            identity = None
+        if identity is not None and identity[0] == BaseACIObject._identity_generation:
+            return identity[1], identity[2]
+        generation = BaseACIObject._identity_generation
+        parent = self._parent
+        # Objects that compare in their own way may change identity at any
+        # time, so neither their key nor those of their children are cached
+        cacheable = _uses_identity_key(self.__class__)
+        if parent is None:
+            parent_key = None
+        elif isinstance(parent, BaseACIObject) and _uses_identity_key(parent.__class__):
+            parent_key = (_get_parent_class(parent.__class__), parent._get_identity()[0])
+            cacheable = cacheable and getattr(parent, '_identity', None) is not None
+        else:
+            parent_key = parent
+            cacheable = False
+        key = (parent_key, self.name)
+        key_hash = hash(key)
+        if cacheable and generation == BaseACIObject._identity_generation:
+            self._identity = (generation, key, key_hash)
+        return key, key_hash
+
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            self_key = (self.get_parent(), self.name)
-            other_key = (other.get_parent(), other.name)
-            return self_key == other_key
+            if self is other:
+                return True
+            return self._get_identity()[0] == other._get_identity()[0]
         return NotImplemented
 
     def __hash__(self):
-        return hash((self.get_parent(), self.name))
+        identity = getattr(self, '_identity', None)
+        if identity is not None and identity[0] == BaseACIObject._identity_generation:
+            return identity[2]
+        return self._get_identity()[1]
 
     def __ne__(self, other):
         return not self == other
@@ -1084,20 +1666,17 @@ class BaseACIObject(AciSearch):
                 tenant_url = tenant_url + parent._get_url_extension()
         query_url = ('/api/mo/uni%s.json?query-target=subtree&'
                      'target-subtree-class=%s' % (tenant_url, apic_class))
-        ret = session.get(query_url)
         resp = []
-        if ret.ok:
-            data = ret.json()['imdata']
-            logging.debug('response returned %s', data)
-        else:
-            logging.error('Could not get %s. Received response: %s', query_url, ret.text)
-            return resp
-        for object_data in data:
-            name = str(object_data[apic_class]['attributes']['name'])
-            obj = toolkit_class(name, parent)
-            attribute_data = object_data[apic_class]['attributes']
-            obj._populate_from_attributes(attribute_data)
-            resp.append(obj)
+        try:
+            for object_data in session.iter_imdata(query_url):
+                name = str(object_data[apic_class]['attributes']['name'])
+                obj = toolkit_class(name, parent)
+                attribute_data = object_data[apic_class]['attributes']
+                obj._populate_from_attributes(attribute_data)
+                resp.append(obj)
+        except ConnectionError:
+            logging.error('Could not get %s.', query_url)
+            return []
         return resp
 
     def find(self, search_object):
@@ -1124,7 +1703,7 @@ class BaseACIObject(AciSearch):
         """
         result = []
         match = True
-        for attrib in search_object.__dict__:
+        for attrib in _get_attribute_names(search_object):
             value1 = getattr(search_object, attrib)
             if value1 is not None:
                 if hasattr(self, attrib):
@@ -1150,7 +1729,7 @@ class BaseACIObject(AciSearch):
         """
         text = ''
         textf = '{0:>16}: {1}\n'
-        for attrib in self.__dict__:
+        for attrib in _get_attribute_names(self):
             if attrib[0] != '_':
                 text += textf.format(attrib, getattr(self, attrib))
         return text
@@ -1162,7 +1741,7 @@ class BaseACIObject(AciSearch):
         :returns: list of [(attr, value),]
         """
         result = []
-        for attrib in self.__dict__:
+        for attrib in _get_attribute_names(self):
             if attrib[0] != '_':
                 result.append((attrib, getattr(self, attrib)))
         return result
@@ -1211,7 +1790,7 @@ class BaseACIObject(AciSearch):
             result[name] = getattr(self, name)
             return result
 
-        for attrib in self.__dict__:
+        for attrib in _get_attribute_names(self):
             if attrib[0] != '_':
                 value = getattr(self, attrib)
                 try:
@@ -1325,6 +1904,7 @@ class BaseACIObject(AciSearch):
 class BaseACIPhysObject(BaseACIObject):
     """Base class for physical objects
     """
+    __slots__ = ('pod',)
 
     def __init__(self, name='', parent=None, pod=None):
         self._session = None
@@ -1418,6 +1998,7 @@ class BaseACIPhysObject(BaseACIObject):
         if self.has_child(child_obj):
             self.remove_child(child_obj)
         self._children.append(child_obj)
+        self._child_added(child_obj)
 
     def get_children(self, child_type=None):
         """Returns the list of children.  If childType is provided, then
@@ -1431,11 +2012,7 @@ class BaseACIPhysObject(BaseACIObject):
         :returns: list of children
         """
         if child_type:
-            children = []
-            for child in self._children:
-                if isinstance(child, child_type):
-                    children.append(child)
-            return children
+            return super(BaseACIPhysObject, self).get_children(child_type)
         else:
             return list(self._children)
 
@@ -1517,6 +2094,8 @@ class _Tag(BaseACIObject):
     """
     Tag class
     """
+    __slots__ = ()
+
     def __init__(self, name=None, parent=None):
         self.name = name
         self._deleted = False
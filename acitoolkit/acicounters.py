@@ -334,11 +334,8 @@ class InterfaceStats(object):
                            'class=statsHist&rsp-subtree-filter=eq(statsHist.index,"' + str(period - 1) + '")'
         else:
             mo_query_url = '/api/class/l1PhysIf.json?&rsp-subtree-include=stats&rsp-subtree-class=statsHist'
-        ret = session.get(mo_query_url)
-        data = ret.json()['imdata']
-
         result = {}
-        for interface in data:
+        for interface in session.iter_imdata(mo_query_url):
             if 'children' in interface['l1PhysIf']:
                 port_id = cls._parseDn2PortId(interface['l1PhysIf']['attributes']['dn'])
                 port_stats = InterfaceStats._process_data(interface)
@@ -17,14 +17,14 @@
      there is no actual APIC and the configuration comes from JSON files.
 """
 from copy import deepcopy
-import json
 import re
 try:
     import urlparse
 except ImportError:
-    from urllib.parse import urlparse
+    from urllib import parse as urlparse
 
-from .acisession import Session
+from . import acijson
+from .acisession import PAGE_SIZE, PAGE_WORKERS, Session
 import logging
 
 
@@ -81,10 +81,12 @@ class FakeSession(Session):
         self.db = []
         self.subscription_thread = FakeSubscriber()
         self._classes = {}
+        self.page_size = PAGE_SIZE
+        self.max_page_workers = PAGE_WORKERS
         for filename in filenames:
             with open(filename, 'r') as f:
                 try:
-                    data = json.loads(f.read())
+                    data = acijson.loads(f.read())
                 except ValueError:
                     continue
                 # Skip invalid formatted files
@@ -97,7 +99,7 @@ class FakeSession(Session):
                 self._fill_data(data['imdata'], None)
                 self.db.append(data)
             with open(filename, "w") as f:
-                f.write(unicode(json.dumps(data, indent=4)))
+                f.write(acijson.dumps(data, indent=4))
 
     def _get_config(self, url):
         """
@@ -165,7 +167,7 @@ class FakeSession(Session):
                 logging.error('Unknown class %s', cl)
                 return []
             return [cl_obj for _, cl_obj in lst]
-        for _, lst in self._classes.iteritems():
+        for _, lst in self._classes.items():
             if target and query_target != 'self':
                 lst = self._classes[target]
             for tup in lst:
@@ -197,7 +199,7 @@ class FakeSession(Session):
         if rsp_subtree != 'full':
             resp = []
             for node in db:
-                node_cl, _ = next(node.iteritems())
+                node_cl, _ = next(iter(node.items()))
                 # make a deep copy to avoid deleting other nodes
                 node_cl_copy = deepcopy(node[node_cl])
                 ret = {}
@@ -222,7 +224,7 @@ class FakeSession(Session):
         :return: None
         """
         for child in db:
-            _, contents = next(child.iteritems())
+            _, contents = next(iter(child.items()))
             if contents.get('children'):
                 del contents['children']
 
@@ -282,7 +284,7 @@ class FakeSession(Session):
         :return: None
         """
         for child in children:
-            node_cl, contents = next(child.iteritems())
+            node_cl, contents = next(iter(child.items()))
             attributes = contents['attributes']
             if not attributes.get('dn'):
                 rn = attributes['rn']
@@ -402,7 +404,7 @@ class FakeSession(Session):
                   response.ok is True if request is sent successfully.
         """
         if 'aaaUser' in data:
-            name = json.loads(data)['aaaUser']['attributes']['name']
+            name = acijson.loads(data)['aaaUser']['attributes']['name']
             return self.get_login_response(name)
         resp = FakeResponse()
         return resp
@@ -425,3 +427,18 @@ class FakeSession(Session):
         else:
             resp = FakeResponse(self._get_config(url))
         return resp
+
+    def iter_imdata(self, url, page_size=None, timeout=None, min_page_size=None):
+        """
+        Perform a REST GET call to the APIC and iterate over the returned\
+        objects one at a time.
+
+        :param url: String containing the URL of the query.
+        :param page_size: Ignored.  The fake APIC does not page responses.
+        :param timeout: Ignored.
+        :param min_page_size: Ignored.
+        :returns: Generator of dictionaries, one per object in the imdata\
+                  of the response.
+        """
+        for mo in self.get(url).json()['imdata']:
+            yield mo
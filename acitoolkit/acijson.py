@@ -0,0 +1,218 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""  This module contains the JSON codec used by the toolkit to encode and
+     decode the APIC payloads.  The fastest of orjson, ujson and simplejson
+     that is installed is used, falling back to the json standard library.
+"""
+import json
+import logging
+
+
+class JSONCodec(object):
+    """
+    JSON codec based on the json standard library.  Other codecs override
+    the methods they can accelerate and fall back to these for the options
+    they do not support.
+    """
+    name = 'json'
+
+    def dumps(self, obj, sort_keys=False, indent=None, separators=None):
+        """
+        Encode an object
+
+        :param obj: object to encode
+        :param sort_keys: Boolean indicating whether the dictionary keys are sorted
+        :param indent: Optional integer containing the indentation
+        :param separators: Optional tuple containing the item and key separators
+        :returns: String containing the JSON document
+        """
+        return json.dumps(obj, sort_keys=sort_keys, indent=indent, separators=separators)
+
+    def dumpb(self, obj, sort_keys=False):
+        """
+        Encode an object to UTF-8
+
+        :param obj: object to encode
+        :param sort_keys: Boolean indicating whether the dictionary keys are sorted
+        :returns: bytes containing the JSON document
+        """
+        return self.dumps(obj, sort_keys=sort_keys).encode('utf-8')
+
+    def loads(self, text):
+        """
+        Decode a JSON document
+
+        :param text: String or bytes containing the JSON document
+        :returns: decoded object
+        """
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        return json.loads(text)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    JSON codec based on orjson
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj, sort_keys=False, indent=None, separators=None):
+        if indent not in (None, 2) or separators is not None:
+            return super(OrjsonCodec, self).dumps(obj, sort_keys=sort_keys, indent=indent, separators=separators)
+        return self.dumpb(obj, sort_keys=sort_keys, indent=indent).decode('utf-8')
+
+    def dumpb(self, obj, sort_keys=False, indent=None):
+        option = self._orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, option=option)
+
+    def loads(self, text):
+        return self._orjson.loads(text)
+
+
+class UjsonCodec(JSONCodec):
+    """
+    JSON codec based on ujson
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj, sort_keys=False, indent=None, separators=None):
+        if separators is not None:
+            return super(UjsonCodec, self).dumps(obj, sort_keys=sort_keys, indent=indent, separators=separators)
+        return self._ujson.dumps(obj, sort_keys=sort_keys, indent=indent or 0,
+                                 escape_forward_slashes=False)
+
+    def loads(self, text):
+        return self._ujson.loads(text)
+
+
+class SimplejsonCodec(JSONCodec):
+    """
+    JSON codec based on simplejson
+    """
+    name = 'simplejson'
+
+    def __init__(self):
+        import simplejson
+        self._simplejson = simplejson
+
+    def dumps(self, obj, sort_keys=False, indent=None, separators=None):
+        return self._simplejson.dumps(obj, sort_keys=sort_keys, indent=indent, separators=separators)
+
+    def loads(self, text):
+        return self._simplejson.loads(text)
+
+
+CODECS = (OrjsonCodec, UjsonCodec, SimplejsonCodec, JSONCodec)
+_codec = None
+
+
+def set_codec(codec=None):
+    """
+    Select the JSON codec used by the toolkit
+
+    :param codec: String containing the codec name (orjson, ujson,\
+                  simplejson or json), JSONCodec instance or None to use\
+                  the fastest codec installed.
+    :returns: JSONCodec instance selected
+    :raises ImportError: if the named codec is not installed
+    """
+    global _codec
+    if isinstance(codec, JSONCodec):
+        _codec = codec
+        return _codec
+    for codec_class in CODECS:
+        if codec is not None and codec_class.name != codec:
+            continue
+        try:
+            _codec = codec_class()
+        except ImportError:
+            if codec is not None:
+                raise
+            continue
+        logging.debug('Using the %s JSON codec', _codec.name)
+        return _codec
+    raise ImportError('Unknown JSON codec %s' % codec)
+
+
+def get_codec():
+    """
+    Get the JSON codec used by the toolkit
+
+    :returns: JSONCodec instance
+    """
+    if _codec is None:
+        set_codec()
+    return _codec
+
+
+def dumps(obj, sort_keys=False, indent=None, separators=None):
+    """
+    Encode an object with the selected codec
+
+    :param obj: object to encode
+    :param sort_keys: Boolean indicating whether the dictionary keys are sorted
+    :param indent: Optional integer containing the indentation
+    :param separators: Optional tuple containing the item and key separators
+    :returns: String containing the JSON document
+    """
+    return get_codec().dumps(obj, sort_keys=sort_keys, indent=indent, separators=separators)
+
+
+def dumpb(obj, sort_keys=False):
+    """
+    Encode an object to UTF-8 with the selected codec
+
+    :param obj: object to encode
+    :param sort_keys: Boolean indicating whether the dictionary keys are sorted
+    :returns: bytes containing the JSON document
+    """
+    return get_codec().dumpb(obj, sort_keys=sort_keys)
+
+
+def loads(text):
+    """
+    Decode a JSON document with the selected codec
+
+    :param text: String or bytes containing the JSON document
+    :returns: decoded object
+    """
+    return get_codec().loads(text)
@@ -0,0 +1,296 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""  This module contains the MetricsRegistry class that records the
+     requests sent to the APIC by the Session and exports them in the
+     OpenMetrics text format.
+"""
+import threading
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+# Path segments kept as is in the URL templates
+URL_KEYWORDS = ('api', 'node', 'mo', 'class', 'uni', 'topology', 'sys')
+# Counters recorded in addition to the requests
+COUNTERS = {'pages': 'Pages collected for queries too big for a single response',
+            'retries': 'GET requests retried after an error response',
+            'relogins': 'Logins sent again after the APIC rejected a request',
+            'events_dropped': 'Subscription events discarded because the consumer fell behind',
+            'events_coalesced': 'Subscription events replaced by a later event for the same DN',
+            'events_replayed': 'Subscription events queued for the changes missed while disconnected'}
+
+
+def _split_path(path):
+    """
+    Split a URL path on the '/' that are not within the brackets of a DN
+
+    :param path: String containing the URL path
+    :returns: list of strings containing the path segments
+    """
+    segments = ['']
+    depth = 0
+    for char in path:
+        if char == '/' and not depth:
+            segments.append('')
+            continue
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth = max(0, depth - 1)
+        segments[-1] += char
+    return segments
+
+
+def url_template(url):
+    """
+    Get the template of a URL used to group the metrics of similar requests.
+    The naming values of the relative names and the class names are replaced
+    so that ``/api/mo/uni/tn-a.json?query-target=subtree`` becomes
+    ``/api/mo/uni/tn-{}`` and ``/api/node/class/fvTenant.json`` becomes
+    ``/api/node/class/{}``.
+
+    :param url: String containing the URL relative to the APIC address
+    :returns: String containing the URL template
+    """
+    path = url.partition('?')[0]
+    if path.endswith('.json') or path.endswith('.xml'):
+        path = path.rpartition('.')[0]
+    segments = _split_path(path)
+    template = []
+    for index, segment in enumerate(segments):
+        if segment in URL_KEYWORDS or not segment:
+            template.append(segment)
+        elif index == len(segments) - 1 and 'class' in segments:
+            template.append('{}')
+        elif '-' in segment:
+            template.append(segment.partition('-')[0] + '-{}')
+        elif index == 2 and segments[1] == 'api':
+            # API methods such as aaaLogin or subscriptionRefresh
+            template.append(segment)
+        else:
+            template.append('{}')
+    return '/'.join(template)
+
+
+def _escape(value):
+    """
+    Escape a label value of the OpenMetrics text format
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry(object):
+    """
+    In-process registry of the requests sent to the APIC grouped by method
+    and URL template.  Records the latency histogram, the number of responses
+    per status code and the response sizes of the requests as well as the
+    paging, retry, relogin and subscription event counters.
+
+    A registry can be shared by several sessions.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        :param buckets: tuple containing the upper bounds in seconds of the\
+                        latency histogram buckets.  The last bound must be\
+                        infinite.
+        """
+        self.buckets = tuple(buckets)
+        self._requests = {}
+        self._responses = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, method, url, latency, status_code, num_bytes):
+        """
+        Record a request
+
+        :param method: String containing the HTTP method
+        :param url: String containing the URL relative to the APIC address
+        :param latency: Number of seconds the request took
+        :param status_code: Integer containing the HTTP status code or None\
+                            if no response was received
+        :param num_bytes: Integer containing the size of the response body
+        """
+        key = (method.upper(), url_template(url))
+        with self._lock:
+            entry = self._requests.get(key)
+            if entry is None:
+                entry = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0, 'bytes': 0}
+                self._requests[key] = entry
+            for index, bound in enumerate(self.buckets):
+                if latency <= bound:
+                    entry['buckets'][index] += 1
+                    break
+            entry['sum'] += latency
+            entry['count'] += 1
+            entry['bytes'] += num_bytes
+            status_key = key + (str(status_code) if status_code is not None else 'error',)
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+
+    def add_bytes(self, method, url, num_bytes):
+        """
+        Add to the response size of a request already recorded.  Used for\
+        the responses that are read incrementally.
+
+        :param method: String containing the HTTP method
+        :param url: String containing the URL relative to the APIC address
+        :param num_bytes: Integer containing the number of bytes read
+        """
+        key = (method.upper(), url_template(url))
+        with self._lock:
+            if key in self._requests:
+                self._requests[key]['bytes'] += num_bytes
+
+    def inc(self, name, url, amount=1):
+        """
+        Increment a counter
+
+        :param name: String containing the counter name.  One of pages,\
+                     retries, relogins, events_dropped, events_coalesced or\
+                     events_replayed.
+        :param url: String containing the URL relative to the APIC address
+        :param amount: Integer containing the increment
+        """
+        key = (name, url_template(url))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def get_stats(self):
+        """
+        Get the recorded metrics
+
+        :returns: Dictionary indexed by URL template.  Each value is a\
+                  dictionary containing the number of requests, the total\
+                  latency, the latency histogram, the response bytes, the\
+                  responses per status code and the counters.
+        """
+        stats = {}
+        with self._lock:
+            for (method, template), entry in self._requests.items():
+                url_stats = stats.setdefault(template, {'requests': 0, 'latency': 0.0, 'bytes': 0,
+                                                        'histogram': [0] * len(self.buckets),
+                                                        'status': {}})
+                url_stats['requests'] += entry['count']
+                url_stats['latency'] += entry['sum']
+                url_stats['bytes'] += entry['bytes']
+                for index, count in enumerate(entry['buckets']):
+                    url_stats['histogram'][index] += count
+            for (method, template, status), count in self._responses.items():
+                status_stats = stats[template]['status']
+                status_stats[status] = status_stats.get(status, 0) + count
+            for (name, template), count in self._counters.items():
+                url_stats = stats.setdefault(template, {'requests': 0, 'latency': 0.0, 'bytes': 0,
+                                                        'histogram': [0] * len(self.buckets),
+                                                        'status': {}})
+                url_stats[name] = count
+        return stats
+
+    def reset(self):
+        """
+        Remove all of the recorded metrics
+        """
+        with self._lock:
+            self._requests.clear()
+            self._responses.clear()
+            self._counters.clear()
+
+    def to_openmetrics(self):
+        """
+        Export the metrics in the OpenMetrics text format, also accepted by
+        Prometheus
+
+        :returns: String containing the exposition
+        """
+        lines = ['# HELP acitoolkit_request_duration_seconds Time taken by the APIC requests',
+                 '# TYPE acitoolkit_request_duration_seconds histogram']
+        with self._lock:
+            requests = sorted(self._requests.items())
+            responses = sorted(self._responses.items())
+            counters = sorted(self._counters.items())
+        for (method, template), entry in requests:
+            labels = 'method="%s",url="%s"' % (method, _escape(template))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('acitoolkit_request_duration_seconds_bucket{%s,le="%s"} %d' % (labels, le, cumulative))
+            lines.append('acitoolkit_request_duration_seconds_sum{%s} %r' % (labels, entry['sum']))
+            lines.append('acitoolkit_request_duration_seconds_count{%s} %d' % (labels, entry['count']))
+        lines.append('# HELP acitoolkit_response_bytes Size of the APIC response bodies')
+        lines.append('# TYPE acitoolkit_response_bytes counter')
+        for (method, template), entry in requests:
+            lines.append('acitoolkit_response_bytes_total{method="%s",url="%s"} %d' % (method, _escape(template),
+                                                                                       entry['bytes']))
+        lines.append('# HELP acitoolkit_responses APIC responses by status code')
+        lines.append('# TYPE acitoolkit_responses counter')
+        for (method, template, status), count in responses:
+            lines.append('acitoolkit_responses_total{method="%s",url="%s",status="%s"} %d' % (method,
+                                                                                             _escape(template),
+                                                                                             status, count))
+        for name in sorted(COUNTERS):
+            lines.append('# HELP acitoolkit_%s %s' % (name, COUNTERS[name]))
+            lines.append('# TYPE acitoolkit_%s counter' % name)
+            for (counter_name, template), count in counters:
+                if counter_name == name:
+                    lines.append('acitoolkit_%s_total{url="%s"} %d' % (name, _escape(template), count))
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def wsgi_app(self, environ, start_response):
+        """
+        WSGI application serving the OpenMetrics exposition.  Can be mounted
+        in an existing web application or served with serve_metrics.
+        """
+        body = self.to_openmetrics().encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8'),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(registry, port, address=''):
+    """
+    Serve the metrics of a registry over HTTP from a daemon thread
+
+    :param registry: MetricsRegistry instance
+    :param port: Integer containing the TCP port
+    :param address: String containing the address to listen on.  Default is\
+                    all of the addresses.
+    :returns: the server instance.  Call shutdown() on it to stop serving.
+    """
+    server = make_server(address, port, registry.wsgi_app, handler_class=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
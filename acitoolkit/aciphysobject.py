@@ -1437,11 +1437,8 @@ class Node(BaseACIPhysObject):
 
         else:
             class_url = '/api/node/class/fabricNode.json'
-            ret = session.get(class_url)
-            ret._content = ret._content.decode().replace('\n', '').encode()
-            data = ret.json()['imdata']
             working_data = WorkingData()
-            for item in data:
+            for item in session.iter_imdata(class_url):
                 if 'fabricNode' in item:
                     if 'role' in item['fabricNode']['attributes']:
                         if item['fabricNode']['attributes']['role'] in ['leaf', 'spine', 'controller']:
@@ -3123,11 +3120,10 @@ class WorkingData(object):
         query_url = url + 'query-target=subtree&target-subtree-class=' + ','.join(apic_classes)
 
         ret = session.get(query_url)
-        ret._content = ret._content.decode().replace('\n', '').encode()
         data = ret.json()['imdata']
 
         if data:
-            self.rawjson = ret.json()['imdata']
+            self.rawjson = data
         else:
             self.rawjson = None
         if self.rawjson is not None:
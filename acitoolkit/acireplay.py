@@ -0,0 +1,287 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""  This module contains the transport adapters that record the HTTP
+     exchanges and websocket frames of a Session to an archive and replay
+     them without an APIC.
+"""
+import base64
+import collections
+import gzip
+import json
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from websocket import create_connection, WebSocketConnectionClosedException
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+
+def _relative_url(url):
+    """
+    Get the URL relative to the APIC address
+
+    :param url: String containing the absolute URL
+    :returns: String containing the path and the query of the URL
+    """
+    parsed = urlparse(url)
+    if parsed.query:
+        return parsed.path + '?' + parsed.query
+    return parsed.path
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter recording every HTTP exchange and websocket frame of
+    a Session to a gzip compressed archive of JSON records.  Installed with
+    Session.set_transport::
+
+        recorder = RecordingAdapter('get_deep.json.gz')
+        session.set_transport(recorder)
+        session.login()
+        Tenant.get_deep(session)
+        recorder.close()
+
+    The request bodies, and therefore the credentials, are not recorded.
+    """
+    def __init__(self, filename, adapter=None):
+        """
+        :param filename: String containing the archive file name
+        :param adapter: Optional transport adapter used to send the requests.\
+                        Default is a requests HTTPAdapter.
+        """
+        super(RecordingAdapter, self).__init__()
+        self._adapter = adapter or HTTPAdapter()
+        self._file = gzip.open(filename, 'wb')
+        self._start = None
+        self._num_exchanges = 0
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        """
+        Write a record to the archive
+
+        :param record: Dictionary containing the record
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            if record['type'] == 'http':
+                self._num_exchanges += 1
+            record['seq'] = self._num_exchanges
+            record['time'] = round(time.time() - self._start, 6)
+            self._file.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        start = time.time()
+        with self._lock:
+            if self._start is None:
+                self._start = start
+        resp = self._adapter.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                  proxies=proxies)
+        # Reading the content keeps it available to iter_content
+        content = resp.content
+        self._write({'type': 'http',
+                     'method': request.method,
+                     'url': _relative_url(request.url),
+                     'status': resp.status_code,
+                     'reason': resp.reason,
+                     'content_type': resp.headers.get('Content-Type'),
+                     'content': base64.b64encode(content).decode('ascii'),
+                     'elapsed': round(time.time() - start, 6)})
+        return resp
+
+    def create_connection(self, url, **kwargs):
+        """
+        Open the websocket and record the frames it receives
+
+        :param url: String containing the websocket URL
+        :returns: websocket instance
+        """
+        return _RecordingWebSocket(create_connection(url, **kwargs), self)
+
+    def close(self):
+        """
+        Close the archive and the underlying transport adapter
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._adapter.close()
+
+
+class _RecordingWebSocket(object):
+    """
+    Websocket wrapper recording the received frames
+    """
+    def __init__(self, ws, recorder):
+        self._ws = ws
+        self._recorder = recorder
+
+    @property
+    def connected(self):
+        return self._ws.connected
+
+    def recv(self):
+        frame = self._ws.recv()
+        if len(frame):
+            if isinstance(frame, bytes):
+                frame = frame.decode('utf-8')
+            self._recorder._write({'type': 'ws', 'frame': frame})
+        return frame
+
+    def close(self):
+        self._ws.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter serving the HTTP exchanges and websocket frames of an
+    archive written by RecordingAdapter.  Requests are answered with the
+    responses recorded for the same method and URL in the recorded order,
+    the last response being reused once they are exhausted.  Websocket
+    frames are delivered after the HTTP exchanges that preceded them during
+    the recording so that the event sequence is reproduced deterministically.
+    """
+    def __init__(self, filename, timing=False, speed=1.0):
+        """
+        :param filename: String containing the archive file name
+        :param timing: Boolean indicating whether the recorded response times\
+                       and websocket frame times are reproduced.  Default is False.
+        :param speed: Number dividing the reproduced times
+        """
+        super(ReplayAdapter, self).__init__()
+        self.timing = timing
+        self.speed = speed
+        self._responses = collections.defaultdict(collections.deque)
+        self.frames = []
+        self.num_served = 0
+        self._start = None
+        self._condition = threading.Condition()
+        with gzip.open(filename, 'rb') as archive:
+            for line in archive:
+                record = json.loads(line.decode('utf-8'))
+                if record['type'] == 'http':
+                    self._responses[(record['method'], record['url'])].append(record)
+                else:
+                    self.frames.append(record)
+
+    def _build_response(self, request, record):
+        """
+        Build the response of a request from a record
+
+        :param request: PreparedRequest instance
+        :param record: Dictionary containing the recorded exchange or None
+        :returns: Response class instance from the requests library
+        """
+        resp = requests.Response()
+        resp.request = request
+        resp.url = request.url
+        resp.encoding = 'utf-8'
+        if record is None:
+            logging.warning('No recorded response for %s %s', request.method, request.url)
+            resp.status_code = 404
+            resp.reason = 'Not Recorded'
+            resp._content = b'{"imdata": []}'
+        else:
+            resp.status_code = record['status']
+            resp.reason = record['reason']
+            resp._content = base64.b64decode(record['content'])
+            if record['content_type']:
+                resp.headers = CaseInsensitiveDict({'Content-Type': record['content_type']})
+        return resp
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        with self._condition:
+            if self._start is None:
+                self._start = time.time()
+            responses = self._responses.get((request.method, _relative_url(request.url)))
+            record = None
+            if responses:
+                record = responses.popleft() if len(responses) > 1 else responses[0]
+        if record is not None and self.timing:
+            time.sleep(record['elapsed'] / self.speed)
+        resp = self._build_response(request, record)
+        with self._condition:
+            self.num_served += 1
+            self._condition.notify_all()
+        return resp
+
+    def create_connection(self, url, **kwargs):
+        """
+        Open a websocket replaying the recorded frames
+
+        :param url: String containing the websocket URL
+        :returns: websocket instance
+        """
+        return _ReplayWebSocket(self)
+
+    def close(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+class _ReplayWebSocket(object):
+    """
+    Websocket delivering the recorded frames
+    """
+    def __init__(self, replayer):
+        self._replayer = replayer
+        self._next = 0
+        self.connected = True
+
+    def recv(self):
+        replayer = self._replayer
+        with replayer._condition:
+            while self.connected and (self._next >= len(replayer.frames) or
+                                      replayer.num_served < replayer.frames[self._next]['seq']):
+                replayer._condition.wait(1)
+            if not self.connected:
+                raise WebSocketConnectionClosedException('Replay websocket closed')
+            record = replayer.frames[self._next]
+            self._next += 1
+            start = replayer._start
+        if replayer.timing and start is not None:
+            delay = start + record['time'] / replayer.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return record['frame']
+
+    def close(self):
+        with self._replayer._condition:
+            self.connected = False
+            self._replayer._condition.notify_all()
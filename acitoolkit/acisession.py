@@ -33,25 +33,31 @@
 import copy
 import json
 import logging
+import random
 import ssl
 import threading
 import time
 import socket
 import base64
+import codecs
+import itertools
 import requests
 import sys
-from collections import namedtuple
+import zlib
+from collections import deque, namedtuple, OrderedDict
+from multiprocessing.pool import ThreadPool
 
 if sys.version_info < (3, 0, 0):
-    from urllib import unquote
+    from urllib import quote, unquote
 else:
-    from urllib.parse import unquote
+    from urllib.parse import quote, unquote
 
 try:
     from requests.packages.urllib3.exceptions import InsecureRequestWarning
 except ImportError:
     pass
-from six.moves.queue import Queue
+from . import acijson
+from .acimetrics import MetricsRegistry
 from websocket import create_connection, WebSocketException
 from requests.exceptions import ConnectionError
 try:
@@ -70,6 +76,168 @@ else:
     except AttributeError:
         pass
 
+# Number of objects requested per page when the APIC reports that a
+# query result is too big to be returned in a single response
+PAGE_SIZE = 10000
+# Page size is never reduced below this number of objects
+MIN_PAGE_SIZE = 500
+# Number of pages fetched concurrently
+PAGE_WORKERS = 4
+# Number of times a failed GET is retried before giving up
+GET_RETRIES = 3
+# Base and maximum number of seconds waited before retrying a failed GET
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 10
+# Response time in seconds above which a RateLimiter slows down
+RATE_TARGET_LATENCY = 2.0
+TOO_BIG_ERROR = 'Unable to process the query, result dataset is too big'
+# Default lifetime in seconds and size of the ResponseCache
+CACHE_TTL = 30
+CACHE_MAX_ENTRIES = 1000
+# Limits of a single POST sent by a BatchWriter
+BATCH_MAX_OBJECTS = 500
+BATCH_MAX_BYTES = 1000000
+# Number of threads running the callbacks registered with Session.add_event_handler
+EVENT_WORKERS = 4
+# Default limit of the events pending for a subscription, None for no limit,
+# and the policy applied when the limit is reached
+EVENT_LIMIT = None
+EVENT_POLICY = 'block'
+EVENT_POLICIES = ('block', 'drop-oldest', 'coalesce')
+# Number of events kept for subscriptions whose id is not known yet
+ORPHAN_EVENTS = 1000
+# Number of subscriptions refreshed or reissued concurrently
+SUBSCRIPTION_WORKERS = 8
+# Number of websockets the subscriptions are spread over, each with a login of its own
+SUBSCRIPTION_SHARDS = 1
+# Attributes identifying an MO among its siblings when merging batched configuration
+IDENTITY_ATTRIBUTES = ('dn', 'rn', 'name', 'ip', 'addr', 'mac', 'tDn', 'encap', 'id')
+
+
+def _split_page_size(page_size, remaining, workers):
+    """
+    Reduce the page size so that the remaining entries of a paged query are
+    spread across at least as many pages as there are workers.  The page size
+    is only ever halved so that it remains a divisor of the original size and
+    the page offsets of both sizes line up.
+
+    :param page_size: Integer containing the page size of the first page
+    :param remaining: Integer containing the number of entries not yet collected
+    :param workers: Integer containing the number of concurrent workers
+    :returns: Integer containing the page size for the remaining pages
+    """
+    while (page_size % 2 == 0 and page_size // 2 >= MIN_PAGE_SIZE and
+           (remaining + page_size - 1) // page_size < workers):
+        page_size //= 2
+    return page_size
+
+
+def _backoff_delay(attempt, base=RETRY_BACKOFF, cap=RETRY_BACKOFF_MAX):
+    """
+    Get the time to wait before a retry using exponential backoff with
+    full jitter so that clients retrying at the same time are spread out.
+
+    :param attempt: Integer containing the number of retries already made
+    :param base: Number of seconds of the first backoff
+    :param cap: Maximum number of seconds of a backoff
+    :returns: Number of seconds to wait
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+_APIC_DECODER = json.JSONDecoder(strict=False)
+
+
+def _decode_apic_json(text, encoding='utf-8'):
+    """
+    Decode a JSON document returned by the APIC.  The document is decoded
+    with the toolkit codec and only decoded again with the standard library
+    if it contains one of the APIC quirks.  Control characters within
+    strings are then accepted and single quotes escaped by the APIC, which
+    is not valid JSON, are fixed up so that the payload is not copied in
+    the common case.
+
+    :param text: String or bytes containing the JSON document
+    :param encoding: String containing the encoding of the bytes
+    :returns: decoded document
+    """
+    try:
+        return acijson.loads(text)
+    except ValueError:
+        if isinstance(text, bytes):
+            text = text.decode(encoding)
+        try:
+            return _APIC_DECODER.decode(text)
+        except ValueError:
+            if "\\'" not in text:
+                raise
+            return _APIC_DECODER.decode(text.replace("\\'", "'"))
+
+
+def _record_chunks(chunks, body):
+    """
+    Pass the chunks of a response through, keeping a copy of them
+
+    :param chunks: Iterator of bytes
+    :param body: list the chunks are appended to
+    :returns: Generator of bytes
+    """
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+
+
+def _iter_json_array(chunks, key='imdata'):
+    """
+    Incrementally decode the array stored under a key of a JSON document
+    and yield its elements one at a time.  Only the undecoded part of the
+    document is kept in memory.  Control characters within strings are
+    accepted as the APIC does not always escape them.
+
+    :param chunks: Iterator of bytes containing the JSON document
+    :param key: String containing the key of the array
+    :returns: Generator of the decoded array elements
+    """
+    decoder = json.JSONDecoder(strict=False)
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = None
+    # Minimum buffer size before trying to decode again.  Doubled on every
+    # incomplete element so that large elements are not decoded repeatedly.
+    needed = 0
+    # A final None flushes whatever is left once the document is complete
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is not None:
+            buf += text_decoder.decode(chunk)
+        if pos is None:
+            start = buf.find('"%s"' % key)
+            if start == -1:
+                continue
+            start = buf.find('[', start)
+            if start == -1:
+                continue
+            buf = buf[start + 1:]
+            pos = 0
+        if chunk is not None and len(buf) < needed:
+            continue
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buf):
+                break
+            if buf[pos] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                needed = 2 * (len(buf) - pos)
+                break
+            needed = 0
+            pos = end
+            yield element
+        buf = buf[pos:]
+        pos = 0
+
 
 class CredentialsError(Exception):
     def __init___(self, message):
@@ -77,6 +245,52 @@ class CredentialsError(Exception):
         self.message = message
 
 
+def _get_mod_ts(mo):
+    """
+    Get the modification timestamp of an MO
+
+    :param mo: Dictionary containing the MO keyed by its class name
+    :returns: String containing the modTs or None if the MO has none
+    """
+    for value in mo.values():
+        return value.get('attributes', {}).get('modTs')
+
+
+def _get_catch_up_url(url, timestamp):
+    """
+    Get the URL querying the MOs of a subscription modified after a
+    timestamp.  The modTs filter is only added when the class of the MOs
+    can be told from the URL.
+
+    :param url: URL string of the subscription
+    :param timestamp: String containing the modTs
+    :returns: URL string
+    """
+    path, _, query = url.partition('?')
+    params = [param for param in query.split('&') if param and not param.startswith('subscription=')]
+    class_names = []
+    existing_filter = None
+    for param in params:
+        name, _, value = param.partition('=')
+        if name == 'target-subtree-class':
+            class_names = unquote(value).split(',')
+        elif name == 'query-target-filter':
+            existing_filter = param
+    if not class_names and '/class/' in path:
+        class_names = [path.rsplit('/', 1)[1].partition('.')[0]]
+    if class_names:
+        # The offset of the timestamp may contain a '+'
+        filters = ['gt({0}.modTs,"{1}")'.format(class_name, quote(timestamp)) for class_name in class_names]
+        mod_filter = filters[0] if len(filters) == 1 else 'or({0})'.format(','.join(filters))
+        if existing_filter is not None:
+            params.remove(existing_filter)
+            mod_filter = 'and({0},{1})'.format(existing_filter.partition('=')[2], mod_filter)
+        params.append('query-target-filter=' + mod_filter)
+    if not params:
+        return path
+    return path + '?' + '&'.join(params)
+
+
 class Login(threading.Thread):
     """
     Login thread responsible for refreshing the APIC login before timeout.
@@ -133,11 +347,13 @@ class Login(threading.Thread):
 class EventHandler(threading.Thread):
     """
     Thread responsible for websocket communication.
-    Receives events through the websocket and places them into a Queue
+    Receives events through a websocket and places them into the
+    buckets of the subscriptions
     """
-    def __init__(self, subscriber):
+    def __init__(self, subscriber, ws):
         threading.Thread.__init__(self)
         self.subscriber = subscriber
+        self._ws = ws
         self._exit = False
 
     def exit(self):
@@ -149,12 +365,127 @@ class EventHandler(threading.Thread):
     def run(self):
         while not self._exit:
             try:
-                event = self.subscriber._ws.recv()
+                event = self._ws.recv()
             except:
                 break
             if not len(event):
                 continue
-            self.subscriber._event_q.put(event)
+            cache = self.subscriber._apic.cache
+            try:
+                event = _decode_apic_json(event)
+            except ValueError:
+                logging.error('Non-JSON event: %s', event)
+                if cache is not None:
+                    cache.clear()
+                continue
+            if cache is not None:
+                cache.invalidate_event(event)
+            self.subscriber._queue_event(event)
+
+
+class _EventBucket(object):
+    """
+    Events pending for a subscription.  Holds at most max_events events
+    and applies a policy when the limit is reached:
+
+    - block: the websocket reader waits until the events are consumed
+    - drop-oldest: the oldest pending event is discarded
+    - coalesce: an event replaces the pending event of the same DN so that
+      only the latest state of each MO is kept.  The oldest pending event
+      is discarded if the limit is still exceeded.
+    """
+    def __init__(self, max_events=EVENT_LIMIT, policy=EVENT_POLICY):
+        if policy not in EVENT_POLICIES:
+            raise ValueError('Unknown event policy %s' % policy)
+        self.max_events = max_events
+        self.policy = policy
+        self.dropped = 0
+        self.coalesced = 0
+        # Ids of the pending events of the objects existing when subscribing
+        self.initial = set()
+        if policy == 'coalesce':
+            self._events = OrderedDict()
+            self._seq = itertools.count()
+        else:
+            self._events = deque()
+
+    def __len__(self):
+        return len(self._events)
+
+    def is_full(self):
+        """
+        Check whether the limit of pending events is reached
+
+        :returns: True or False
+        """
+        return self.max_events is not None and len(self._events) >= self.max_events
+
+    @staticmethod
+    def _get_dn(event):
+        """
+        Get the DN of the MO of an event
+
+        :param event: Dictionary containing the event
+        :returns: String containing the DN or None if not found
+        """
+        try:
+            for mo in event['imdata'][0].values():
+                return mo['attributes']['dn']
+        except (IndexError, KeyError, AttributeError, TypeError):
+            return None
+
+    def put(self, event):
+        """
+        Add an event applying the policy of the bucket
+
+        :param event: Dictionary containing the event
+        """
+        if self.policy == 'coalesce':
+            key = self._get_dn(event)
+            if key is None:
+                key = next(self._seq)
+            elif key in self._events:
+                self.initial.discard(id(self._events.pop(key)))
+                self.coalesced += 1
+            self._events[key] = event
+        else:
+            self._events.append(event)
+        if self.policy != 'block' and self.max_events is not None:
+            while len(self._events) > self.max_events:
+                self.pop()
+                self.dropped += 1
+
+    def pop_initial(self):
+        """
+        Remove the pending events of the objects existing when subscribing
+
+        :returns: list of event dictionaries, oldest first
+        """
+        initial, self.initial = self.initial, set()
+        if not initial:
+            return []
+        if self.policy == 'coalesce':
+            keys = [key for key, event in self._events.items() if id(event) in initial]
+            return [self._events.pop(key) for key in keys]
+        events = [event for event in self._events if id(event) in initial]
+        self._events = deque(event for event in self._events if id(event) not in initial)
+        return events
+
+    def pop(self):
+        """
+        Remove the oldest pending event
+
+        :returns: Dictionary containing the event
+        :raises IndexError: if there are no pending events
+        """
+        if self.policy == 'coalesce':
+            if not self._events:
+                raise IndexError('pop from an empty bucket')
+            event = self._events.popitem(last=False)[1]
+        else:
+            event = self._events.popleft()
+        self.initial.discard(id(event))
+        return event
 
 
 class Subscriber(threading.Thread):
@@ -168,11 +499,27 @@ class Subscriber(threading.Thread):
         threading.Thread.__init__(self)
         self._apic = apic
         self._subscriptions = {}
+        self._subscription_urls = {}
         self._ws = None
-        self._ws_url = None
+        # Additional logins and websockets when the subscriptions are sharded
+        self._shards = []
+        # Shard of each subscription, 0 being the main login
+        self._url_shards = {}
         self._refresh_time = 30
-        self._event_q = Queue()
+        # Time at which each subscription is next refreshed
+        self._refresh_due = {}
+        # Latest modTs seen on each subscription
+        self._last_mod_ts = {}
+        self._refresh_stats = {}
         self._events = {}
+        self._events_lock = threading.Lock()
+        self._event_policy = (EVENT_LIMIT, EVENT_POLICY)
+        self._event_policies = {}
+        # Events that arrived before the response to their subscription
+        self._orphan_events = deque(maxlen=ORPHAN_EVENTS)
+        # Signalled whenever an event is queued or consumed or an event
+        # handler is done
+        self._event_cond = threading.Condition()
         self._exit = False
         self.event_handler_thread = None
 
@@ -181,30 +528,269 @@ class Subscriber(threading.Thread):
         Indicate that the thread should exit.
         """
         self._exit = True
+        for shard in self._shards:
+            shard.login_thread.exit()
+
+    def _queue_event(self, event, block=True):
+        """
+        Put an event into the buckets of its subscriptions and wake up the
+        threads waiting for events.  An event matching several
+        subscriptions is shared rather than copied for each of them.
+
+        :param event: Dictionary containing the event
+        :param block: Boolean indicating whether to wait for the events of\
+                      the subscriptions with the block policy to be consumed
+        """
+        for subscription_id in event['subscriptionId']:
+            subscription_id = str(subscription_id)
+            with self._events_lock:
+                url = self._subscription_urls.get(subscription_id)
+                if url is None:
+                    self._orphan_events.append((subscription_id, event))
+                    continue
+            self._put_event(url, event, block)
+        self.notify_events()
+
+    def _put_event(self, url, event, block=True, initial=False):
+        """
+        Put an event into the bucket of a subscription
+
+        :param url: URL string of the subscription
+        :param event: Dictionary containing the event
+        :param block: Boolean indicating whether to wait for the events to\
+                      be consumed if the bucket has the block policy
+        :param initial: Boolean indicating whether the event is for an\
+                        object existing when subscribing
+        """
+        while True:
+            bucket = self._get_bucket(url)
+            if not block or bucket.policy != 'block' or not bucket.is_full() or self._exit:
+                break
+            with self._event_cond:
+                if bucket.is_full():
+                    # The events already put may not have been signalled yet
+                    self._event_cond.notify_all()
+                    self._event_cond.wait(1)
+        with self._events_lock:
+            dropped, coalesced = bucket.dropped, bucket.coalesced
+            if initial:
+                bucket.initial.add(id(event))
+            bucket.put(event)
+            dropped, coalesced = bucket.dropped - dropped, bucket.coalesced - coalesced
+        if dropped:
+            self._apic.metrics.inc('events_dropped', url, dropped)
+        if coalesced:
+            self._apic.metrics.inc('events_coalesced', url, coalesced)
+        if event.get('imdata'):
+            self._update_mod_ts(url, event['imdata'])
+
+    def _update_mod_ts(self, url, mos):
+        """
+        Remember the latest modTs seen on a subscription
+
+        :param url: URL string of the subscription
+        :param mos: list of dictionaries containing the MOs
+        """
+        latest = None
+        for mo in mos:
+            mod_ts = _get_mod_ts(mo)
+            if mod_ts is not None and (latest is None or mod_ts > latest):
+                latest = mod_ts
+        if latest is None:
+            return
+        # The events of the shards are queued by several threads
+        with self._events_lock:
+            current = self._last_mod_ts.get(url)
+            if current is None or latest > current:
+                self._last_mod_ts[url] = latest
+
+    def _replay_events(self, url, subscription_id, since, mos):
+        """
+        Queue synthetic events for the MOs of a subscription modified while
+        the events could not be received
+
+        :param url: URL string of the subscription
+        :param subscription_id: String containing the subscription id
+        :param since: String containing the latest modTs seen before the outage
+        :param mos: list of dictionaries containing the current MOs
+        """
+        num_events = 0
+        for mo in mos:
+            mod_ts = _get_mod_ts(mo)
+            if mod_ts is None or mod_ts <= since:
+                continue
+            class_name, value = next(iter(mo.items()))
+            attributes = dict(value.get('attributes', {}))
+            attributes.setdefault('status', 'modified')
+            event = {"totalCount": "1",
+                     "subscriptionId": [subscription_id],
+                     "imdata": [{class_name: dict(value, attributes=attributes)}]}
+            self._put_event(url, event, block=False)
+            num_events += 1
+        self._update_mod_ts(url, mos)
+        if num_events:
+            logging.info('Replayed %s events missed by the subscription %s', num_events, url)
+            self._apic.metrics.inc('events_replayed', url, num_events)
+            self.notify_events()
+
+    def _catch_up(self, url):
+        """
+        Query the MOs of a subscription modified after the latest event seen
+        and queue them as events.  Used after the websocket was reconnected.
+
+        :param url: URL string of the subscription
+        """
+        since = self._last_mod_ts.get(url)
+        subscription_id = self._subscriptions.get(url)
+        if since is None or subscription_id is None:
+            return
+        catch_up_url = _get_catch_up_url(url, since)
+        try:
+            resp = self._get_login(url).get(catch_up_url)
+        except ConnectionError:
+            logging.error('Could not catch up on subscription %s due to ConnectionError', url)
+            return
+        if not resp.ok:
+            logging.error('Could not catch up on subscription %s', url)
+            return
+        self._replay_events(url, subscription_id, since, resp.json()['imdata'])
+
+    def _get_bucket(self, url):
+        """
+        Get the bucket holding the events of a subscription
+
+        :param url: URL string of the subscription
+        :returns: _EventBucket instance
+        """
+        bucket = self._events.get(url)
+        if bucket is None:
+            with self._events_lock:
+                bucket = self._events.get(url)
+                if bucket is None:
+                    max_events, policy = self._event_policies.get(url, self._event_policy)
+                    bucket = self._events[url] = _EventBucket(max_events, policy)
+        return bucket
+
+    def set_event_policy(self, url=None, max_events=EVENT_LIMIT, policy=EVENT_POLICY):
+        """
+        Set the limit of the events pending for a subscription and the\
+        policy applied when it is reached.
+
+        :param url: URL string of the subscription or None to set the\
+                    default of the subscriptions without a policy of their own
+        :param max_events: Integer containing the maximum number of pending\
+                           events or None for no limit
+        :param policy: String containing the policy.  One of block,\
+                       drop-oldest or coalesce.
+        """
+        if policy not in EVENT_POLICIES:
+            raise ValueError('Unknown event policy %s' % policy)
+        with self._events_lock:
+            if url is None:
+                self._event_policy = (max_events, policy)
+                urls = [key for key in self._events if key not in self._event_policies]
+            else:
+                self._event_policies[url] = (max_events, policy)
+                urls = [url] if url in self._events else []
+            # Move the pending events to buckets with the new policy
+            for key in urls:
+                old_bucket = self._events[key]
+                bucket = _EventBucket(max_events, policy)
+                bucket.dropped, bucket.coalesced = old_bucket.dropped, old_bucket.coalesced
+                bucket.initial, old_bucket.initial = old_bucket.initial, set()
+                while len(old_bucket):
+                    bucket.put(old_bucket.pop())
+                self._events[key] = bucket
+        self.notify_events()
+
+    def get_event_stats(self):
+        """
+        Get the statistics of the events pending for the subscriptions
 
-    def _send_subscription(self, url, only_new=False):
+        :returns: Dictionary indexed by URL string.  Each value is a\
+                  dictionary containing the number of pending events, the\
+                  limit and policy of the subscription and the number of\
+                  events dropped and coalesced.
+        """
+        with self._events_lock:
+            return dict((url, {'depth': len(bucket),
+                               'max_events': bucket.max_events,
+                               'policy': bucket.policy,
+                               'dropped': bucket.dropped,
+                               'coalesced': bucket.coalesced})
+                        for url, bucket in self._events.items())
+
+    def notify_events(self):
+        """
+        Wake up the threads waiting for events
+        """
+        with self._event_cond:
+            self._event_cond.notify_all()
+
+    def _set_subscription_id(self, url, subscription_id):
+        """
+        Record the subscription id of a URL and keep the index from the
+        subscription ids to the URLs used to route the events up to date.
+
+        :param url: URL string of the subscription
+        :param subscription_id: String containing the subscription id or\
+                                None if the subscription failed
+        """
+        self._remove_subscription_id(url)
+        self._subscriptions[url] = subscription_id
+        # Spread the refreshes of the subscriptions over the refresh interval
+        self._refresh_due[url] = time.time() + self._refresh_time * random.uniform(0.5, 1.0)
+        if subscription_id is None:
+            return
+        subscription_id = str(subscription_id)
+        with self._events_lock:
+            self._subscription_urls[subscription_id] = url
+            if not self._orphan_events:
+                return
+            orphans = [event for orphan_id, event in self._orphan_events if orphan_id == subscription_id]
+            if orphans:
+                self._orphan_events = deque(((orphan_id, event) for orphan_id, event in self._orphan_events
+                                             if orphan_id != subscription_id), maxlen=ORPHAN_EVENTS)
+        for event in orphans:
+            self._put_event(url, event, block=False)
+
+    def _remove_subscription_id(self, url):
+        """
+        Remove a URL from the index of the subscription ids
+
+        :param url: URL string of the subscription
+        """
+        subscription_id = str(self._subscriptions.get(url))
+        if self._subscription_urls.get(subscription_id) == url:
+            del self._subscription_urls[subscription_id]
+
+    def _send_subscription(self, url, only_new=False, since=None):
         """
         Send the subscription for the specified URL.
 
         :param url: URL string to issue the subscription
+        :param only_new: Boolean indicating whether to queue the existing objects
+        :param since: Optional string containing the latest modTs seen on a\
+                      previous subscription of the URL.  The objects modified\
+                      since are queued as events when only_new is True.
         """
         try:
-            resp = self._apic.get(url)
+            resp = self._get_login(url).get(url)
         except ConnectionError:
-            self._subscriptions[url] = None
+            self._set_subscription_id(url, None)
             logging.error('Could not send subscription to APIC for url %s', url)
             resp = requests.Response()
             resp.status_code = 404
             resp._content = '{"error": "Could not send subscription to APIC"}'
             return resp
         if not resp.ok:
-            self._subscriptions[url] = None
+            self._set_subscription_id(url, None)
             logging.error('Could not send subscription to APIC for url %s', url)
             resp = requests.Response()
             resp.status_code = 404
             resp._content = '{"error": "Could not send subscription to APIC"}'
             return resp
-        resp_data = json.loads(resp.text)
+        resp_data = resp.json()
         if 'subscriptionId' not in resp_data:
             logging.error('Did not receive proper subscription response from APIC for url %s response: %s', url, resp_data)
             resp = requests.Response()
@@ -212,127 +798,263 @@ class Subscriber(threading.Thread):
             resp._content = '{"error": "Could not send subscription to APIC"}'
             return resp
         subscription_id = resp_data['subscriptionId']
-        self._subscriptions[url] = subscription_id
-        if not only_new:
-            while len(resp_data['imdata']):
+        self._set_subscription_id(url, subscription_id)
+        if only_new and since is not None:
+            self._replay_events(url, subscription_id, since, resp_data['imdata'])
+        elif only_new:
+            self._update_mod_ts(url, resp_data['imdata'])
+        else:
+            bucket = self._get_bucket(url)
+            with self._events_lock:
+                bucket.initial = set()
+            for mo in resp_data['imdata']:
                 event = {"totalCount": "1",
-                         "subscriptionId": [resp_data['subscriptionId']],
-                         "imdata": [resp_data["imdata"][0]]}
-                self._event_q.put(json.dumps(event))
-                resp_data["imdata"].remove(resp_data["imdata"][0])
+                         "subscriptionId": [subscription_id],
+                         "imdata": [mo]}
+                self._put_event(url, event, initial=True)
+            self.notify_events()
         return resp
 
-    def refresh_subscriptions(self):
+    def _fan_out(self, func, urls):
         """
-        Refresh all of the subscriptions.
+        Call a function for each subscription on a pool of
+        Session.max_subscription_workers threads
+
+        :param func: function called with the URL string of each subscription
+        :param urls: list of URL strings of the subscriptions
+        :returns: list of the values returned by the function
         """
-        # Make a copy of the current subscriptions in case of changes
-        # while we are refreshing
-        current_subscriptions = {}
-        for subscription in self._subscriptions:
-            try:
-                current_subscriptions[subscription] = self._subscriptions[subscription]
-            except KeyError:
-                logging.warning('Subscription removed while copying')
-
-        # Refresh the subscriptions
-        for subscription in current_subscriptions:
-            if self._ws is not None:
-                if not self._ws.connected:
-                    logging.warning('Websocket not established on subscription refresh. Re-establishing websocket')
-                    self._open_web_socket('https://' in subscription)
-            try:
-                subscription_id = self._subscriptions[subscription]
-            except KeyError:
-                logging.warning('Subscription has been removed while trying to refresh')
-                continue
-            if subscription_id is None:
-                self._send_subscription(subscription)
-                continue
+        if len(urls) <= 1:
+            return [func(url) for url in urls]
+        pool = ThreadPool(min(self._apic.max_subscription_workers, len(urls)))
+        try:
+            return pool.map(func, urls)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _get_shard(self, url):
+        """
+        Get the shard of a subscription.  New subscriptions are spread over
+        the shards by hashing the DN or class name in their URL.
+
+        :param url: URL string of the subscription
+        :returns: Integer index of the shard, 0 being the main login
+        """
+        shard = self._url_shards.get(url)
+        if shard is None:
+            shard = zlib.crc32(url.split('?')[0].encode('utf-8')) % (len(self._shards) + 1)
+            self._url_shards[url] = shard
+        return shard
+
+    def _get_login(self, url):
+        """
+        Get the login used to issue and refresh a subscription
+
+        :param url: URL string of the subscription
+        :returns: Session instance
+        """
+        shard = self._get_shard(url)
+        if shard == 0:
+            return self._apic
+        return self._shards[shard - 1]
+
+    def _check_web_socket(self, url):
+        """
+        Re-establish the websocket of the shard of a subscription if it has
+        been disconnected and catch up on the events missed by the
+        subscriptions of the shard meanwhile
+
+        :param url: URL string of a subscription
+        """
+        shard = self._get_shard(url)
+        owner = self if shard == 0 else self._shards[shard - 1]
+        if owner._ws is not None and not owner._ws.connected:
+            logging.warning('Websocket not established. Re-establishing websocket')
+            owner._open_web_socket('https://' in url)
+            self._fan_out(self._catch_up, [key for key in list(self._subscriptions)
+                                           if self._get_shard(key) == shard])
+
+    def _refresh_subscription(self, url):
+        """
+        Refresh a subscription.  The subscription is reissued if the
+        refresh fails.
+
+        :param url: URL string of the subscription
+        :returns: True if the subscription was refreshed
+        """
+        try:
+            subscription_id = self._subscriptions[url]
+        except KeyError:
+            logging.warning('Subscription has been removed while trying to refresh')
+            return True
+        stats = self._refresh_stats.setdefault(url, {'refreshes': 0, 'failures': 0,
+                                                     'consecutive_failures': 0, 'last_refresh': None})
+        ok = False
+        if subscription_id is None:
+            ok = self._send_subscription(url).ok
+        else:
             refresh_url = '/api/subscriptionRefresh.json?id=' + str(subscription_id)
-            resp = self._apic.get(refresh_url)
-            if not resp.ok:
+            try:
+                ok = self._get_login(url).get(refresh_url).ok
+            except ConnectionError:
+                logging.error('Could not refresh subscription %s due to ConnectionError', refresh_url)
+            if ok:
+                self._refresh_due[url] = time.time() + self._refresh_time
+            else:
                 logging.warning('Could not refresh subscription: %s', refresh_url)
-                # Try to resubscribe
-                self._resubscribe()
+                self._send_subscription(url, only_new=True, since=self._last_mod_ts.get(url))
+        stats['refreshes'] += 1
+        if ok:
+            stats['last_refresh'] = time.time()
+            stats['consecutive_failures'] = 0
+        else:
+            stats['failures'] += 1
+            stats['consecutive_failures'] += 1
+        return ok
 
-    def _open_web_socket(self, use_secure=True):
+    def refresh_subscriptions(self, due_only=False):
         """
-        Opens the web socket connection with the APIC.
+        Refresh the subscriptions.  The refreshes are sent concurrently\
+        and a subscription whose refresh fails is reissued.
 
+        :param due_only: Boolean indicating whether to refresh only the\
+                         subscriptions whose refresh time has come
+        """
+        now = time.time()
+        urls = [url for url, due in list(self._refresh_due.items())
+                if url in self._subscriptions and (not due_only or due <= now)]
+        if not urls:
+            return
+        for shard_url in dict((self._get_shard(url), url) for url in urls).values():
+            self._check_web_socket(shard_url)
+        failures = self._fan_out(self._refresh_subscription, urls).count(False)
+        if failures:
+            logging.warning('Could not refresh %s of %s subscriptions', failures, len(urls))
+
+    def get_subscription_stats(self):
+        """
+        Get the refresh statistics of the subscriptions
+
+        :returns: Dictionary indexed by URL string.  Each value is a\
+                  dictionary containing the subscription id, its shard, the\
+                  number of refreshes, failed refreshes and consecutive\
+                  failed refreshes and the time of the last successful\
+                  refresh.
+        """
+        stats = {}
+        for url, subscription_id in list(self._subscriptions.items()):
+            stats[url] = {'id': subscription_id, 'shard': self._url_shards.get(url, 0),
+                          'refreshes': 0, 'failures': 0,
+                          'consecutive_failures': 0, 'last_refresh': None}
+            stats[url].update(self._refresh_stats.get(url, {}))
+        return stats
+
+    def _get_refresh_delay(self):
+        """
+        Get the number of seconds until the next subscription is due to be
+        refreshed
+
+        :returns: Number of seconds
+        """
+        delay = self._refresh_time / 10.0
+        due_times = list(self._refresh_due.values())
+        if due_times:
+            delay = min(delay, min(due_times) - time.time())
+        return max(delay, 0.1)
+
+    def _connect_web_socket(self, apic, ws, handler, use_secure=True):
+        """
+        Open a websocket with the token of a login and start the thread
+        receiving its events.  The previous websocket is closed first.
+
+        :param apic: Session whose token is used to open the websocket
+        :param ws: previous websocket or None
+        :param handler: EventHandler thread of the previous websocket or None
         :param use_secure: Boolean indicating whether the web socket
                            should be secure.  Default is True.
+        :returns: tuple of the websocket and its EventHandler thread.  The\
+                  previous ones are returned if the websocket could not be\
+                  opened.
         """
         sslopt = {}
         if use_secure:
             sslopt['cert_reqs'] = ssl.CERT_NONE
-            self._ws_url = 'wss://%s/socket%s' % (self._apic.ipaddr,
-                                                  self._apic.token)
+            ws_url = 'wss://%s/socket%s' % (apic.ipaddr, apic.token)
         else:
-            self._ws_url = 'ws://%s/socket%s' % (self._apic.ipaddr,
-                                                 self._apic.token)
+            ws_url = 'ws://%s/socket%s' % (apic.ipaddr, apic.token)
 
         kwargs = {}
-        if self._ws is not None:
-            if self._ws.connected:
-                self._ws.close()
-                self.event_handler_thread.exit()
+        if ws is not None:
+            if ws.connected:
+                ws.close()
+                handler.exit()
         try:
-            self._ws = create_connection(self._ws_url, sslopt=sslopt, **kwargs)
-            if not self._ws.connected:
+            connect = getattr(apic._transport, 'create_connection', create_connection)
+            ws = connect(ws_url, sslopt=sslopt, **kwargs)
+            if not ws.connected:
                 logging.error('Unable to open websocket connection')
-            self.event_handler_thread = EventHandler(self)
-            self.event_handler_thread.daemon = True
-            self.event_handler_thread.start()
+            handler = EventHandler(self, ws)
+            handler.daemon = True
+            handler.start()
         except WebSocketException:
             logging.error('Unable to open websocket connection due to WebSocketException')
         except socket.error:
             logging.error('Unable to open websocket connection due to Socket Error')
+        return ws, handler
 
-    def _resubscribe(self):
+    def _open_web_socket(self, use_secure=True):
         """
-        Reissue the subscriptions.
-        Used to when the APIC login timeout occurs and a new subscription
-        must be issued instead of simply a refresh.  Not meant to be called
-        directly by end user applications.
+        Opens the web socket connection with the APIC.  The first time,
+        the additional shards are also logged in and open their own
+        websockets if Session.subscription_shards is more than 1.
+
+        :param use_secure: Boolean indicating whether the web socket
+                           should be secure.  Default is True.
         """
-        self._process_event_q()
-        urls = []
-        for url in self._subscriptions:
-            urls.append(url)
-        self._subscriptions = {}
-        for url in urls:
-            self.subscribe(url, only_new=True)
+        self._ws, self.event_handler_thread = self._connect_web_socket(self._apic, self._ws,
+                                                                       self.event_handler_thread, use_secure)
+        if self._apic.subscription_shards > 1 and not self._shards:
+            self._open_shards()
 
-    def _process_event_q(self):
+    def _open_shards(self):
         """
-        Put the event into correct bucket based on URLs that have been
-        subscribed.
+        Log in the additional shards.  Fewer shards are used if some of
+        the logins fail.
         """
-        if self._event_q.empty():
+        if self._apic.cert_auth:
+            logging.warning('Subscriptions cannot be sharded with certificate authentication')
             return
+        for _ in range(self._apic.subscription_shards - 1):
+            shard = _ShardSession(self)
+            if not shard.login().ok:
+                shard.login_thread.exit()
+                logging.error('Could not log in subscription shard. Using %s shards', len(self._shards) + 1)
+                return
+            self._shards.append(shard)
 
-        while not self._event_q.empty():
-            event = self._event_q.get()
-            orig_event = event
-            try:
-                event = json.loads(event)
-            except ValueError:
-                logging.error('Non-JSON event: %s', orig_event)
-                continue
-            # Find the URL for this event
-            num_subscriptions = len(event['subscriptionId'])
-            for i in range(0, num_subscriptions):
-                url = None
-                for k in self._subscriptions:
-                    if self._subscriptions[k] == str(event['subscriptionId'][i]):
-                        url = k
-                        break
-                if url not in self._events:
-                    self._events[url] = []
-                self._events[url].append(event)
-                if num_subscriptions > 1:
-                    event = copy.deepcopy(event)
+    def _resubscribe(self, shard=0):
+        """
+        Reissue the subscriptions of a shard.
+        Used to when the APIC login timeout occurs and a new subscription
+        must be issued instead of simply a refresh.  Not meant to be called
+        directly by end user applications.
+
+        :param shard: Integer index of the shard whose login timed out,\
+                      0 being the main login
+        """
+        urls = [url for url in list(self._subscriptions) if self._get_shard(url) == shard]
+        since = dict(self._last_mod_ts)
+        for url in urls:
+            self._remove_subscription_id(url)
+            del self._subscriptions[url]
+            self._refresh_due.pop(url, None)
+        if not urls:
+            return
+        self._check_web_socket(urls[0])
+        # The objects modified since the latest events seen are queued so
+        # that no change is lost while the subscriptions had expired
+        self._fan_out(lambda url: self._send_subscription(url, only_new=True, since=since.get(url)), urls)
 
     def subscribe(self, url, only_new=False):
         """
@@ -346,10 +1068,7 @@ class Subscriber(threading.Thread):
         if url in self._subscriptions:
             return
 
-        if self._ws is not None:
-            if not self._ws.connected:
-                self._open_web_socket('https://' in url)
-
+        self._check_web_socket(url)
         resp = self._send_subscription(url, only_new=only_new)
         return resp
 
@@ -368,11 +1087,33 @@ class Subscriber(threading.Thread):
 
         :param url: URL string to check for pending events
         """
-        self._process_event_q()
-        if url not in self._events:
-            return False
-        result = len(self._events[url]) != 0
-        return result
+        bucket = self._events.get(url)
+        return bucket is not None and len(bucket) != 0
+
+    def wait_for_events(self, urls, timeout=None):
+        """
+        Wait until one of the APIC URL subscriptions has events
+
+        :param urls: List of URL strings to wait for
+        :param timeout: Optional number of seconds to wait.  Waits forever\
+                        if None.
+        :returns: List of the URL strings that have events.  Empty if the\
+                  timeout expired.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self._event_cond:
+            while True:
+                ready = [url for url in urls if self.has_events(url)]
+                if ready or self._exit:
+                    return ready
+                if timeout is None:
+                    self._event_cond.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return ready
+                self._event_cond.wait(remaining)
 
     def get_event_count(self, url):
         """
@@ -381,24 +1122,72 @@ class Subscriber(threading.Thread):
         :param url: URL string to check for pending events
         :returns: Interger number of events in event queue
         """
-        self._process_event_q()
-        if url not in self._events:
+        bucket = self._events.get(url)
+        if bucket is None:
             return 0
-        return len(self._events[url])
+        return len(bucket)
+
+    def get_initial_state(self, url):
+        """
+        Get the objects that existed when subscribing to a particular APIC
+        URL in a single step.  Their events are removed from the pending
+        events so that only the changes made since remain.
+
+        :param url: URL string of the subscription
+        :returns: list of dictionaries containing the objects whose events\
+                  had not been consumed yet
+        """
+        with self._events_lock:
+            bucket = self._events.get(url)
+            if bucket is None:
+                return []
+            initial_events = bucket.pop_initial()
+        if initial_events and bucket.policy == 'block' and bucket.max_events is not None:
+            self.notify_events()
+        return [event['imdata'][0] for event in initial_events]
 
     def get_event(self, url):
         """
         Get an event for a particular APIC URL subscription.
         Used internally by the Class and Instance subscriptions.
+        An event matching several subscriptions is shared between them\
+        and should not be modified.
 
         :param url: URL string to get pending event
         """
         if url not in self._events:
             raise ValueError
-        event = self._events[url].pop(0)
+        with self._events_lock:
+            bucket = self._events[url]
+            event = bucket.pop()
+        if bucket.policy == 'block' and bucket.max_events is not None:
+            # Wake up the websocket reader waiting for the events to be consumed
+            self.notify_events()
         logging.debug('Event received %s', event)
         return event
 
+    def drain_events(self, url, max_events=None):
+        """
+        Get the pending events for a particular APIC URL subscription\
+        taking the event lock only once rather than once per event.
+
+        :param url: URL string to get pending events
+        :param max_events: Optional maximum number of events to get.  All\
+                           of the pending events are returned if None.
+        :returns: list of event dictionaries, oldest first
+        """
+        if url not in self._events:
+            raise ValueError
+        events = []
+        with self._events_lock:
+            bucket = self._events[url]
+            while len(bucket) and (max_events is None or len(events) < max_events):
+                events.append(bucket.pop())
+        if events and bucket.policy == 'block' and bucket.max_events is not None:
+            self.notify_events()
+        logging.debug('%s events received for %s', len(events), url)
+        return events
+
     def unsubscribe(self, url):
         """
         Unsubscribe from a particular APIC URL.  Used internally by the
@@ -415,26 +1204,715 @@ class Subscriber(threading.Thread):
             unsubscribe_url = url.split('?subscription=yes')[0] + '?subscription=no'
         else:
             raise ValueError('No subscription string in URL being unsubscribed')
-        resp = self._apic.get(unsubscribe_url)
+        resp = self._get_login(url).get(unsubscribe_url)
         if not resp.ok:
             logging.warning('Could not unsubscribe from url: %s', unsubscribe_url)
         # Chew up any outstanding events
         while self.has_events(url):
             self.get_event(url)
+        self._remove_subscription_id(url)
         del self._subscriptions[url]
+        self._refresh_due.pop(url, None)
+        self._refresh_stats.pop(url, None)
+        self._last_mod_ts.pop(url, None)
+        self._url_shards.pop(url, None)
         if not self._subscriptions:
-            self._ws.close(timeout=0)
+            for owner in [self] + self._shards:
+                if owner._ws is not None:
+                    owner._ws.close(timeout=0)
 
     def run(self):
         while not self._exit:
-            # Sleep for some interval and send subscription list
-            time.sleep(self._refresh_time)
+            # Sleep until the next subscription is due to be refreshed
+            time.sleep(self._get_refresh_delay())
             try:
-                self.refresh_subscriptions()
+                self.refresh_subscriptions(due_only=True)
             except ConnectionError:
                 logging.error('Could not refresh subscriptions due to ConnectionError')
 
 
+_EventCallback = namedtuple('_EventCallback', ['target', 'urls', 'callback'])
+
+
+class EventDispatcher(threading.Thread):
+    """
+    Thread delivering the subscription events to the callbacks registered
+    with Session.add_event_handler.  The callbacks run on a pool of worker
+    threads.  The events of a target are read by a single worker at a time
+    and each event is delivered in order to every callback of the target.
+    """
+    def __init__(self, session, workers=EVENT_WORKERS):
+        threading.Thread.__init__(self)
+        self._session = session
+        self._subscriber = session.subscription_thread
+        self._pool = ThreadPool(workers)
+        self._handlers = []
+        self._busy = set()
+        self._exit = False
+
+    def exit(self):
+        """
+        Indicate that the thread should exit.
+        """
+        self._exit = True
+        self._subscriber.notify_events()
+
+    def add_handler(self, target, urls, callback):
+        """
+        Register a callback
+
+        :param target: toolkit class or URL string the events are read from
+        :param urls: List of URL strings of the subscriptions of the target
+        :param callback: function called with each event
+        """
+        self._handlers.append(_EventCallback(target, tuple(urls), callback))
+        self._subscriber.notify_events()
+
+    def remove_handler(self, target, callback):
+        """
+        Deregister a callback
+
+        :param target: toolkit class or URL string the events are read from
+        :param callback: function registered for the target
+        """
+        self._handlers = [handler for handler in self._handlers
+                          if handler.target != target or handler.callback != callback]
+
+    def _get_ready_targets(self):
+        """
+        Get the idle targets that have pending events
+
+        :returns: list of toolkit classes or URL strings
+        """
+        targets = []
+        for handler in self._handlers:
+            if (handler.target not in self._busy and handler.target not in targets and
+                    any(self._subscriber.has_events(url) for url in handler.urls)):
+                targets.append(handler.target)
+        return targets
+
+    def _dispatch(self, target):
+        """
+        Deliver the pending events of a target to all of its callbacks
+
+        :param target: toolkit class or URL string the events are read from
+        """
+        session = self._session
+        try:
+            while not self._exit:
+                handlers = [handler for handler in self._handlers if handler.target == target]
+                if not handlers:
+                    break
+                if isinstance(target, str):
+                    if not session.has_events(target):
+                        break
+                    event = session.get_event(target)
+                else:
+                    if not target.has_events(session):
+                        break
+                    event = target.get_event(session)
+                    if event is None:
+                        continue
+                for handler in handlers:
+                    try:
+                        handler.callback(event)
+                    except Exception:
+                        logging.exception('Event handler %s failed', handler.callback)
+        finally:
+            self._busy.discard(target)
+            self._subscriber.notify_events()
+
+    def run(self):
+        while not self._exit:
+            with self._subscriber._event_cond:
+                ready = self._get_ready_targets()
+                if not ready:
+                    self._subscriber._event_cond.wait()
+                    continue
+                self._busy.update(ready)
+            for target in ready:
+                self._pool.apply_async(self._dispatch, (target,))
+        self._pool.close()
+
+
+class RateLimiter(object):
+    """
+    Adaptive token bucket limiting the rate of the requests sent to the
+    APIC.  The rate is halved when a response is an error or slower than
+    the target latency and grows back additively with every fast
+    successful response.  Installed with Session.set_rate_limiter.
+
+    Any object with the acquire and record methods can be installed
+    in place of a RateLimiter.
+    """
+    def __init__(self, rate, burst=None, min_rate=None, target_latency=RATE_TARGET_LATENCY):
+        """
+        :param rate: Maximum number of requests per second
+        :param burst: Number of requests that can be sent back to back.\
+                      Default is one second worth of requests.
+        :param min_rate: Rate the limiter never slows down below.\
+                         Default is a tenth of the maximum rate.
+        :param target_latency: Number of seconds above which a response is\
+                               considered slow
+        """
+        self.max_rate = float(rate)
+        self.rate = self.max_rate
+        self.burst = burst or max(1.0, self.max_rate)
+        self.min_rate = min_rate or self.max_rate / 10
+        self.target_latency = target_latency
+        self._tokens = self.burst
+        self._last = time.time()
+        self._last_decrease = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until a request can be sent
+
+        :returns: Number of seconds waited
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve the token even when the bucket is empty so that the
+            # waiting requests are sent in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def record(self, latency, ok):
+        """
+        Adapt the rate to a response
+
+        :param latency: Number of seconds the request took
+        :param ok: Boolean indicating whether the request was successful
+        """
+        with self._lock:
+            now = time.time()
+            if not ok or latency > self.target_latency:
+                # Requests in flight report the same congestion, only slow down once per latency period
+                if now - self._last_decrease > max(latency, 1 / self.rate):
+                    self.rate = max(self.min_rate, self.rate / 2)
+                    self._last_decrease = now
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class ApicResponse(requests.Response):
+    """
+    Response returned by Session.get.  The body is decoded only once and
+    json() returns the same decoded document on every call, so it must not
+    be modified by callers that read it again.  The APIC quirks are handled
+    by the decoder instead of rewriting the body.
+    """
+    _json = None
+
+    @classmethod
+    def from_response(cls, resp):
+        """
+        Get the ApicResponse of a response without copying the body
+
+        :param resp: Response class instance from the requests library
+        :returns: ApicResponse instance
+        """
+        if isinstance(resp, cls):
+            return resp
+        parsed = cls.__new__(cls)
+        parsed.__dict__.update(resp.__dict__)
+        return parsed
+
+    @classmethod
+    def from_json(cls, resp, data):
+        """
+        Get an ApicResponse holding an already decoded document.  The body\
+        is only encoded if it is read.
+
+        :param resp: Response class instance from the requests library\
+                     providing the status and headers
+        :param data: Dictionary containing the decoded document
+        :returns: ApicResponse instance
+        """
+        parsed = cls.from_response(resp)
+        if parsed is resp:
+            parsed = copy.copy(resp)
+        parsed._json = data
+        parsed._content = None
+        parsed._content_consumed = True
+        return parsed
+
+    @property
+    def content(self):
+        if self._content is None and self._json is not None:
+            self._content = acijson.dumpb(self._json)
+        return super(ApicResponse, self).content
+
+    def json(self, **kwargs):
+        """
+        Get the decoded body
+
+        :returns: decoded JSON document
+        """
+        if kwargs:
+            return super(ApicResponse, self).json(**kwargs)
+        if self._json is None:
+            self._json = _decode_apic_json(self.content, self.encoding or 'utf-8')
+        return self._json
+
+    @property
+    def imdata(self):
+        """
+        List of the MOs of the response
+        """
+        return self.json().get('imdata', [])
+
+    @property
+    def total_count(self):
+        """
+        Integer containing the total number of MOs of the query
+        """
+        return int(self.json().get('totalCount', len(self.imdata)))
+
+    def copy(self):
+        """
+        Get a copy of the response that decodes the body again
+
+        :returns: ApicResponse instance
+        """
+        self.content
+        resp = copy.copy(self)
+        resp._json = None
+        return resp
+
+
+class ResponseCache(object):
+    """
+    Least recently used cache of the responses of Session.get and
+    Session.iter_imdata keyed by the normalized URL.  Entries expire after a time to live and are
+    invalidated when an event is received for an MO that the cached
+    query may contain.  The entries are indexed by the class or DN they
+    target so that an event only looks up the entries it may affect.
+    """
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        """
+        :param ttl: Number of seconds a response is kept in the cache
+        :param max_entries: Integer containing the maximum number of\
+                            responses kept in the cache
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        # URLs of the entries that may contain an MO of any class
+        self._any = set()
+        # URLs of the entries indexed by the classes of the MOs they may contain
+        self._by_class = {}
+        # URLs of the MO queries indexed by their target DN and by the
+        # ancestors of their target DN
+        self._by_dn = {}
+        self._below = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_url(url):
+        """
+        Normalize the URL so that the same query with the options in a\
+        different order uses the same cache entry
+
+        :param url: String containing the URL
+        :returns: String containing the normalized URL
+        """
+        path, _, query = url.partition('?')
+        if not query:
+            return path
+        return path + '?' + '&'.join(sorted(query.split('&')))
+
+    @staticmethod
+    def is_cacheable(url):
+        """
+        Check whether the response of the URL can be cached.  Subscriptions\
+        and the login and login refresh requests are never cached.
+
+        :param url: String containing the URL
+        :returns: True or False
+        """
+        return 'subscription' not in url and not url.startswith('/api/aaa')
+
+    @staticmethod
+    def _get_target(url):
+        """
+        Get the target of the query
+
+        :param url: String containing the normalized URL
+        :returns: tuple containing 'mo' and the DN, or 'class', the class name\
+                  and the set of the classes of the MOs the response may contain,\
+                  None for any class.  None if the target is not known.
+        """
+        path, _, query = url.partition('?')
+        path = unquote(path)
+        if path.endswith('.json') or path.endswith('.xml'):
+            path = path.rpartition('.')[0]
+        if '/mo/' in path:
+            return ('mo', path.partition('/mo/')[2], None)
+        if '/class/' not in path:
+            return None
+        class_name = path.rpartition('/')[2]
+        params = dict(option.partition('=')[::2] for option in query.split('&') if option)
+        classes = set([class_name])
+        for scope, scope_classes in (('query-target', 'target-subtree-class'), ('rsp-subtree', 'rsp-subtree-class')):
+            if params.get(scope, 'self' if scope == 'query-target' else 'no') in ('self', 'no'):
+                continue
+            if not params.get(scope_classes):
+                return ('class', class_name, None)
+            classes.update(unquote(params[scope_classes]).split(','))
+        return ('class', class_name, classes)
+
+    @staticmethod
+    def _get_ancestors(dn):
+        """
+        Get the DNs of the ancestors of an MO
+
+        :param dn: String containing the DN of the MO
+        :returns: list of strings containing the DNs
+        """
+        parts = dn.split('/')
+        return ['/'.join(parts[:i]) for i in range(1, len(parts))]
+
+    def _index(self, url, target, add=True):
+        """
+        Add an entry to the indexes, or remove it
+
+        :param url: String containing the normalized URL of the entry
+        :param target: target of the entry returned by _get_target
+        :param add: Boolean indicating whether to add or remove the entry
+        """
+        if target is None or target[0] == 'class' and target[2] is None:
+            keys = [(self._any, None)]
+        elif target[0] == 'class':
+            keys = [(self._by_class, class_name) for class_name in target[2]]
+        else:
+            keys = [(self._by_dn, target[1])] + [(self._below, dn) for dn in self._get_ancestors(target[1])]
+        for index, key in keys:
+            if key is None:
+                urls = index
+            elif add:
+                urls = index.setdefault(key, set())
+            else:
+                urls = index.get(key, set())
+            if add:
+                urls.add(url)
+                continue
+            urls.discard(url)
+            if key is not None and not urls:
+                index.pop(key, None)
+
+    def _remove(self, url):
+        """
+        Remove an entry and its index entries
+
+        :param url: String containing the normalized URL of the entry
+        """
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._index(url, entry[2], add=False)
+
+    def get(self, url):
+        """
+        Get the cached response of the URL
+
+        :param url: String containing the URL
+        :returns: Response class instance from the requests library or None\
+                  if the response is not cached.
+        """
+        url = self.normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    self._remove(url)
+                self.misses += 1
+                return None
+            # Move the entry to the most recently used end
+            del self._entries[url]
+            self._entries[url] = entry
+            self.hits += 1
+        resp = entry[1]
+        if isinstance(resp, ApicResponse):
+            return resp.copy()
+        return copy.copy(resp)
+
+    def put(self, url, resp, generation=None):
+        """
+        Add the response of the URL to the cache
+
+        :param url: String containing the URL
+        :param resp: Response class instance from the requests library
+        :param generation: Optional generation of the cache when the query\
+                           was sent.  The response is not cached if entries\
+                           were invalidated since then.
+        """
+        url = self.normalize_url(url)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remove(url)
+            target = self._get_target(url)
+            self._entries[url] = (time.time() + self.ttl, resp, target)
+            self._index(url, target)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, class_name, dn):
+        """
+        Remove the responses that may contain the MO
+
+        :param class_name: String containing the class of the MO
+        :param dn: String containing the DN of the MO
+        """
+        with self._lock:
+            stale = set(self._any)
+            stale.update(self._by_class.get(class_name, ()))
+            if dn:
+                for target_dn in [dn] + self._get_ancestors(dn):
+                    stale.update(self._by_dn.get(target_dn, ()))
+                stale.update(self._below.get(dn, ()))
+            for url in stale:
+                self._remove(url)
+            self.invalidations += len(stale)
+            self.generation += 1
+
+    def invalidate_event(self, event):
+        """
+        Remove the responses that may contain the MOs of an event
+
+        :param event: Dictionary containing the event received from the APIC
+        """
+        for mo in event.get('imdata', []):
+            for class_name in mo:
+                self.invalidate(class_name, mo[class_name].get('attributes', {}).get('dn', ''))
+
+    def clear(self):
+        """
+        Remove all of the cached responses
+        """
+        with self._lock:
+            self._entries.clear()
+            self._any.clear()
+            self._by_class.clear()
+            self._by_dn.clear()
+            self._below.clear()
+            self.generation += 1
+
+    def get_stats(self):
+        """
+        Get the cache counters
+
+        :returns: Dictionary containing the hits, misses, evictions,\
+                  invalidations and the number of entries
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries)}
+
+
+BatchFailure = namedtuple('BatchFailure', ['url', 'data', 'response'])
+
+
+class BatchWriter(object):
+    """
+    Collects the configuration pushed to ``/api/mo/uni.json`` through
+    Session.push_to_apic and sends it merged into a single polUni tree per
+    POST.  Created by Session.push_batch and used as a context manager.
+    Only the thread that entered the context manager is batched.
+
+    Pending configuration is flushed when the payload or object count
+    limits are reached, before any other request is sent by the thread
+    and when the context manager exits.  If a merged POST fails, its
+    objects are pushed one at a time and the ones that are rejected are
+    recorded in ``failures`` as BatchFailure instances.
+    """
+    url = '/api/mo/uni.json'
+
+    def __init__(self, session, max_objects=BATCH_MAX_OBJECTS, max_bytes=BATCH_MAX_BYTES, timeout=None):
+        """
+        :param session: Session instance used to push the configuration
+        :param max_objects: Integer containing the maximum number of pushed\
+                            objects merged into a single POST
+        :param max_bytes: Integer containing the maximum payload size of a\
+                          single POST
+        :param timeout: Optional number of seconds before a POST times out
+        """
+        self._session = session
+        self._max_objects = max_objects
+        self._max_bytes = max_bytes
+        self._timeout = timeout
+        self._pending = []
+        self._pending_bytes = 0
+        self._deleted = set()
+        self._previous = None
+        self.num_posts = 0
+        self.failures = []
+
+    def __enter__(self):
+        self._previous = getattr(self._session._local, 'batch_writer', None)
+        self._session._local.batch_writer = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._session._local.batch_writer = self._previous
+        if exc_type is None:
+            self.flush()
+
+    def add(self, data):
+        """
+        Add the configuration of a push to the batch.
+
+        :param data: Dictionary containing the JSON objects to be sent\
+                     to the APIC.
+        """
+        size = len(acijson.dumpb(data))
+        paths = []
+        self._get_paths(data, paths)
+        # An MO pushed after its deletion is sent in a later POST so that
+        # the APIC deletes it before creating it again
+        if self._pending and (len(self._pending) >= self._max_objects or
+                              self._pending_bytes + size > self._max_bytes or
+                              any(not deleted and path in self._deleted for path, deleted in paths)):
+            self.flush()
+        self._pending.append(data)
+        self._pending_bytes += size
+        self._deleted.update(path for path, deleted in paths if deleted)
+
+    def has_pending(self):
+        """
+        :returns: True or False.  True if there is configuration waiting\
+                  to be pushed.
+        """
+        return len(self._pending) > 0
+
+    @staticmethod
+    def _get_key(class_name, attributes):
+        """
+        Get the key identifying an MO among its siblings.
+
+        :returns: tuple or None if the MO has no identifying attributes
+        """
+        identity = tuple((attr, attributes[attr]) for attr in IDENTITY_ATTRIBUTES if attr in attributes)
+        # Relations such as fvRsCons are named after their target, e.g. tnVzBrCPName
+        identity += tuple(sorted((attr, value) for attr, value in attributes.items()
+                                 if attr.startswith('tn') and attr.endswith('Name')))
+        if not identity:
+            return None
+        return (class_name,) + identity
+
+    @classmethod
+    def _get_paths(cls, data, paths, path=()):
+        """
+        Get the paths of keys of the MOs that have identifying attributes
+
+        :param data: Dictionary containing the JSON of the MO
+        :param paths: list the (path, deleted) tuples are appended to
+        :param path: tuple of the keys of the parents of the MO
+        """
+        for class_name in data:
+            if class_name == 'polUni':
+                for child in data[class_name].get('children', []):
+                    cls._get_paths(child, paths, path)
+                continue
+            attributes = data[class_name].get('attributes', {})
+            key = cls._get_key(class_name, attributes)
+            if key is None:
+                continue
+            paths.append((path + (key,), attributes.get('status') == 'deleted'))
+            for child in data[class_name].get('children', []):
+                cls._get_paths(child, paths, path + (key,))
+
+    @classmethod
+    def _merge(cls, siblings, data):
+        """
+        Merge an MO into the siblings.  An MO that is pushed again is
+        combined with the previous push, the later attributes winning.
+        A deletion replaces the MO.  A push following a deletion is never
+        merged with it as add() flushes the deletion first.
+
+        :param siblings: OrderedDict of the merged MOs keyed by _get_key
+        :param data: Dictionary containing the JSON of the MO
+        """
+        for class_name in data:
+            if class_name == 'polUni':
+                for child in data[class_name].get('children', []):
+                    cls._merge(siblings, child)
+                continue
+            attributes = data[class_name].get('attributes', {})
+            key = cls._get_key(class_name, attributes)
+            if key is None:
+                key = len(siblings)
+            node = siblings.get(key)
+            if node is None or attributes.get('status') == 'deleted':
+                node = (class_name, dict(attributes), OrderedDict())
+                siblings[key] = node
+            else:
+                node[1].update(attributes)
+            for child in data[class_name].get('children', []):
+                cls._merge(node[2], child)
+
+    @classmethod
+    def _render(cls, siblings):
+        """
+        Get the JSON of the merged MOs
+
+        :param siblings: OrderedDict of the merged MOs
+        :returns: list of dictionaries
+        """
+        return [{class_name: {'attributes': attributes, 'children': cls._render(children)}}
+                for class_name, attributes, children in siblings.values()]
+
+    def get_json(self, pending=None):
+        """
+        Get the merged JSON of the pending configuration
+
+        :returns: Dictionary containing the polUni tree
+        """
+        merged = OrderedDict()
+        for data in self._pending if pending is None else pending:
+            self._merge(merged, data)
+        return {'polUni': {'attributes': {}, 'children': self._render(merged)}}
+
+    def flush(self):
+        """
+        Push the pending configuration to the APIC.
+
+        :returns: Response class instance from the requests library or\
+                  None if nothing was pending.
+        """
+        if not self._pending:
+            return None
+        pending = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        self._deleted = set()
+        self.num_posts += 1
+        resp = self._session._push_to_apic(self.url, self.get_json(pending), timeout=self._timeout)
+        if resp.ok:
+            return resp
+        logging.error('Batched configuration push failed. Pushing %s objects individually', len(pending))
+        for data in pending:
+            self.num_posts += 1
+            obj_resp = self._session._push_to_apic(self.url, data, timeout=self._timeout)
+            if not obj_resp.ok:
+                self.failures.append(BatchFailure(self.url, data, obj_resp))
+        return resp
+
+
 class Session(object):
     """
        Session class
@@ -532,6 +2010,21 @@ class Session(object):
         self._logged_in = False
         self._subscription_enabled = subscription_enabled
         self._proxies = proxies
+        self.page_size = PAGE_SIZE
+        self.max_page_workers = PAGE_WORKERS
+        self.max_subscription_workers = SUBSCRIPTION_WORKERS
+        self.subscription_shards = SUBSCRIPTION_SHARDS
+        self._local = threading.local()
+        self.cache = None
+        self.retry_backoff = RETRY_BACKOFF
+        self._rate_limiters = {}
+        self.metrics = MetricsRegistry()
+        self._transport = None
+        # Sorting the keys of the pushed configuration makes the payloads
+        # reproducible but costs CPU time on large pushes
+        self.sort_keys = True
+        self.event_workers = EVENT_WORKERS
+        self._event_dispatcher = None
         if subscription_enabled:
             self.subscription_thread = Subscriber(self)
             self.subscription_thread.daemon = True
@@ -567,7 +2060,7 @@ class Session(object):
             return {}
 
         if not self.session:
-            self.session = requests.Session()
+            self.session = self._new_http_session()
 
         if self.appcenter_user:
             cert_dn = 'uni/userext/appuser-{0}/usercert-{1}'.format(self.uid, self.cert_name)
@@ -602,6 +2095,34 @@ class Session(object):
         logging.debug('Authentication cookie %s' % cookie)
         return cookie
 
+    def set_transport(self, adapter):
+        """
+        Send the requests of this session through a transport adapter such\
+        as the RecordingAdapter or the ReplayAdapter.  The adapter also opens\
+        the websocket if it has a create_connection method.
+
+        :param adapter: requests transport adapter instance or None to use\
+                        the default transport
+        """
+        self._transport = adapter
+        if isinstance(self.session, requests.Session):
+            # Keep the cookies of the current login
+            adapter = adapter or requests.adapters.HTTPAdapter()
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    def _new_http_session(self):
+        """
+        Create the requests.Session used to communicate with the APIC
+
+        :returns: requests.Session instance
+        """
+        session = requests.Session()
+        if self._transport is not None:
+            session.mount('http://', self._transport)
+            session.mount('https://', self._transport)
+        return session
+
     def _send_login(self, timeout=None):
         """
         Send the actual login request to the APIC and open the web
@@ -612,7 +2133,7 @@ class Session(object):
                 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
             except (AttributeError, NameError):
                 pass
-        self.session = requests.Session()
+        self.session = self._new_http_session()
         self._logged_in = False
 
         if self.appcenter_user and self._subscription_enabled:
@@ -631,10 +2152,11 @@ class Session(object):
         if not ret.ok:
             logging.error('Could not relogin to APIC. Aborting login thread.')
             self.login_thread.exit()
-            self.subscription_thread.exit()
+            if self._subscription_enabled:
+                self.subscription_thread.exit()
             return ret
         self._logged_in = True
-        ret_data = json.loads(ret.text)['imdata'][0]
+        ret_data = _decode_apic_json(ret.content)['imdata'][0]
         timeout = ret_data['aaaLogin']['attributes']['refreshTimeoutSeconds']
         self.token = str(ret_data['aaaLogin']['attributes']['token'])
         if self._subscription_enabled:
@@ -681,7 +2203,7 @@ class Session(object):
         """
         refresh_url = '/api/aaaRefresh.json'
         resp = self.get(refresh_url, timeout=timeout)
-        ret_data = json.loads(resp.text)['imdata'][0]
+        ret_data = resp.json()['imdata'][0]
         self.token = str(ret_data['aaaLogin']['attributes']['token'])
         return resp
 
@@ -689,6 +2211,9 @@ class Session(object):
         """
         Close the session
         """
+        if self._event_dispatcher is not None:
+            self._event_dispatcher.exit()
+            self._event_dispatcher = None
         self.session.close()
 
     def subscribe(self, url, only_new=False):
@@ -731,6 +2256,143 @@ class Session(object):
         """
         return self.subscription_thread.has_events(url)
 
+    @staticmethod
+    def _get_event_urls(cls_or_urls):
+        """
+        Get the subscription URLs of toolkit classes and URL strings
+
+        :param cls_or_urls: toolkit class, URL string or list of them
+        :returns: list of URL strings
+        """
+        if not isinstance(cls_or_urls, (list, tuple, set)):
+            cls_or_urls = [cls_or_urls]
+        urls = []
+        for item in cls_or_urls:
+            if isinstance(item, str):
+                urls.append(item)
+            else:
+                urls.extend(item._get_subscription_urls())
+        return urls
+
+    def wait_for_events(self, cls_or_urls, timeout=None):
+        """
+        Wait until there are events for any of the subscriptions.  Blocks\
+        without polling until an event arrives through the websocket.
+
+        :param cls_or_urls: toolkit class such as Tenant, URL string or a\
+                            list of them
+        :param timeout: Optional number of seconds to wait.  Waits forever\
+                        if None.
+        :returns: List of the URL strings that have events.  Empty if the\
+                  timeout expired.
+        """
+        if not self._subscription_enabled:
+            logging.warning('Waiting for events on a session with subscriptions disabled')
+            return []
+        return self.subscription_thread.wait_for_events(self._get_event_urls(cls_or_urls), timeout)
+
+    def add_event_handler(self, cls_or_url, callback, only_new=False):
+        """
+        Call a function for every event of a subscription.  The subscription\
+        is issued if needed.  The callbacks run on a pool of\
+        Session.event_workers threads and each callback receives the events\
+        of its subscription in order.  Every callback registered for the\
+        same class or URL receives every event.
+
+        :param cls_or_url: toolkit class such as Tenant, whose callback is\
+                           called with the objects returned by its get_event,\
+                           or URL string, whose callback is called with the\
+                           event dictionaries.
+        :param callback: function called with each event
+        :param only_new: Boolean indicating whether to get all events or only\
+                         the new events.
+        """
+        if not self._subscription_enabled:
+            logging.warning('Adding an event handler on a session with subscriptions disabled')
+            return
+        if isinstance(cls_or_url, str):
+            self.subscribe(cls_or_url, only_new=only_new)
+        else:
+            cls_or_url.subscribe(self, only_new=only_new)
+        if self._event_dispatcher is None:
+            self._event_dispatcher = EventDispatcher(self, self.event_workers)
+            self._event_dispatcher.daemon = True
+            self._event_dispatcher.start()
+        self._event_dispatcher.add_handler(cls_or_url, self._get_event_urls(cls_or_url), callback)
+
+    def remove_event_handler(self, cls_or_url, callback):
+        """
+        Stop calling a function registered with add_event_handler.  The\
+        subscription is left in place.
+
+        :param cls_or_url: toolkit class or URL string the callback was\
+                           registered for
+        :param callback: function registered
+        """
+        if self._event_dispatcher is not None:
+            self._event_dispatcher.remove_handler(cls_or_url, callback)
+
+    def set_event_policy(self, url=None, max_events=EVENT_LIMIT, policy=EVENT_POLICY):
+        """
+        Set the limit of the events pending for a subscription and the\
+        policy applied when a consumer falls behind and the limit is reached:\
+        block waits for the events to be consumed, drop-oldest discards the\
+        oldest pending event and coalesce keeps only the latest event of\
+        each DN.  The events of the objects existing when subscribing follow\
+        the policy as well, so with block and a limit lower than their number,\
+        subscribing waits until they are consumed by another thread.
+
+        :param url: URL string of the subscription or None to set the\
+                    default of the subscriptions without a policy of their own
+        :param max_events: Integer containing the maximum number of pending\
+                           events or None for no limit
+        :param policy: String containing the policy.  One of block,\
+                       drop-oldest or coalesce.
+        """
+        if self._subscription_enabled:
+            self.subscription_thread.set_event_policy(url, max_events, policy)
+
+    def get_event_stats(self):
+        """
+        Get the statistics of the events pending for the subscriptions
+
+        :returns: Dictionary indexed by URL string.  Each value is a\
+                  dictionary containing the number of pending events, the\
+                  limit and policy of the subscription and the number of\
+                  events dropped and coalesced.
+        """
+        if not self._subscription_enabled:
+            return {}
+        return self.subscription_thread.get_event_stats()
+
+    def get_subscription_stats(self):
+        """
+        Get the refresh statistics of the subscriptions
+
+        :returns: Dictionary indexed by URL string.  Each value is a\
+                  dictionary containing the subscription id, the number of\
+                  refreshes, failed refreshes and consecutive failed\
+                  refreshes and the time of the last successful refresh.
+        """
+        if not self._subscription_enabled:
+            return {}
+        return self.subscription_thread.get_subscription_stats()
+
+    def get_initial_state(self, url):
+        """
+        Get the objects that existed when subscribing to a particular URL\
+        in a single step rather than as one event per object.  Their events\
+        are removed from the pending events so that only the changes made\
+        since remain.
+
+        :param url:  URL string belonging to subscription
+        :returns: list of dictionaries containing the objects whose events\
+                  had not been consumed yet
+        """
+        if not self._subscription_enabled:
+            return []
+        return self.subscription_thread.get_initial_state(url)
+
     def get_event_count(self, url):
         """
         Check the number of subscription events for a particular APIC URL
@@ -751,6 +2413,21 @@ class Session(object):
         """
         return self.subscription_thread.get_event(url)
 
+    def drain_events(self, url, max_events=None):
+        """
+        Get the pending events for a particular URL in a single call.\
+        Used internally by the class subscriptions to process the events\
+        in bulk.
+
+        :param url:  URL string belonging to subscription
+        :param max_events: Optional maximum number of events to get.  All\
+                           of the pending events are returned if None.
+        :returns: list of event dictionaries, oldest first
+        """
+        if not self._subscription_enabled:
+            return []
+        return self.subscription_thread.drain_events(url, max_events)
+
     def unsubscribe(self, url):
         """
         Unsubscribe from events for a particular URL.  Used internally by the
@@ -761,6 +2438,132 @@ class Session(object):
         if self._subscription_enabled:
             self.subscription_thread.unsubscribe(url)
 
+    def set_rate_limiter(self, limiter, url_prefix=''):
+        """
+        Limit the rate of the requests sent to the APIC.  Each request uses\
+        the limiter with the longest URL prefix matching its URL so that\
+        different kinds of queries can be limited separately::
+
+            session.set_rate_limiter(RateLimiter(20))
+            session.set_rate_limiter(RateLimiter(2), '/api/mo/uni.json')
+
+        :param limiter: RateLimiter instance or None to remove the limiter
+        :param url_prefix: String containing the beginning of the URLs\
+                           the limiter applies to.  Default applies to\
+                           all of the URLs.
+        """
+        if limiter is None:
+            self._rate_limiters.pop(url_prefix, None)
+        else:
+            self._rate_limiters[url_prefix] = limiter
+
+    def _get_rate_limiter(self, url):
+        """
+        Get the rate limiter of a URL
+
+        :param url: String containing the URL relative to the APIC address
+        :returns: RateLimiter instance or None
+        """
+        prefixes = [prefix for prefix in self._rate_limiters if url.startswith(prefix)]
+        if not prefixes:
+            return None
+        return self._rate_limiters[max(prefixes, key=len)]
+
+    def _send_request(self, method, url, **kwargs):
+        """
+        Send a single request to the APIC within the rate limit of the URL\
+        and record it in the metrics.
+
+        :param method: String containing the requests.Session method
+        :param url: String containing the URL relative to the APIC address
+        :returns: Response class instance from the requests library.
+        """
+        limiter = self._get_rate_limiter(url)
+        if limiter is not None:
+            limiter.acquire()
+        start = time.time()
+        try:
+            resp = getattr(self.session, method)(self.api + url, **kwargs)
+        except requests.exceptions.RequestException:
+            latency = time.time() - start
+            if limiter is not None:
+                limiter.record(latency, False)
+            if self.metrics is not None:
+                self.metrics.observe_request(method, url, latency, None, 0)
+            raise
+        latency = time.time() - start
+        if limiter is not None:
+            limiter.record(latency, resp.status_code < 500 and resp.status_code != 429)
+        if self.metrics is not None:
+            # Streamed responses are counted as they are read
+            num_bytes = 0 if kwargs.get('stream') else len(resp.content)
+            self.metrics.observe_request(method, url, latency, resp.status_code, num_bytes)
+        return resp
+
+    def _count(self, name, url):
+        """
+        Increment a counter of the metrics
+
+        :param name: String containing the counter name
+        :param url: String containing the URL relative to the APIC address
+        """
+        if self.metrics is not None:
+            self.metrics.inc(name, url)
+
+    def enable_cache(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        """
+        Cache the successful responses of get() and iter_imdata().  Cached\
+        responses are invalidated when they expire, when an event is received\
+        for an MO they may contain and when configuration is pushed to the\
+        APIC.  The hit and miss counters are available from the cache attribute.
+
+        :param ttl: Number of seconds a response is kept in the cache
+        :param max_entries: Integer containing the maximum number of\
+                            responses kept in the cache
+        :returns: ResponseCache instance
+        """
+        self.cache = ResponseCache(ttl=ttl, max_entries=max_entries)
+        return self.cache
+
+    def disable_cache(self):
+        """
+        Stop caching the responses of get() and iter_imdata()
+        """
+        self.cache = None
+
+    def push_batch(self, max_objects=BATCH_MAX_OBJECTS, max_bytes=BATCH_MAX_BYTES, timeout=None):
+        """
+        Batch the configuration pushed by this thread to ``/api/mo/uni.json``.\
+        Used as a context manager::
+
+            with session.push_batch() as batch:
+                for tenant in tenants:
+                    tenant.push_to_apic(session)
+            for failure in batch.failures:
+                print(failure.response.text)
+
+        While batching, push_to_apic returns a successful response for the\
+        batched configuration.  Errors are reported through the failures of\
+        the BatchWriter once the configuration is actually pushed.
+
+        :param max_objects: Integer containing the maximum number of pushed\
+                            objects merged into a single POST
+        :param max_bytes: Integer containing the maximum payload size of a\
+                          single POST
+        :param timeout: Optional number of seconds before a POST times out
+        :returns: BatchWriter instance
+        """
+        return BatchWriter(self, max_objects=max_objects, max_bytes=max_bytes, timeout=timeout)
+
+    def _flush_batch(self):
+        """
+        Push the configuration batched by this thread, if any, so that it
+        is applied before any other request is sent.
+        """
+        batch_writer = getattr(self._local, 'batch_writer', None)
+        if batch_writer is not None and batch_writer.has_pending():
+            batch_writer.flush()
+
     def push_to_apic(self, url, data, timeout=None):
         """
         Push the object data to the APIC
@@ -772,32 +2575,187 @@ class Session(object):
         :returns: Response class instance from the requests library.\
                   response.ok is True if request is sent successfully.
         """
+        batch_writer = getattr(self._local, 'batch_writer', None)
+        if batch_writer is not None:
+            if url == batch_writer.url:
+                batch_writer.add(data)
+                resp = requests.Response()
+                resp.status_code = 200
+                resp._content = b'{"imdata": []}'
+                return resp
+            self._flush_batch()
+        return self._push_to_apic(url, data, timeout=timeout)
+
+    def _push_to_apic(self, url, data, timeout=None):
+        """
+        Send the object data to the APIC
+
+        :param url: String containing the URL that will be used to\
+                    send the object data to the APIC.
+        :param data: Dictionary containing the JSON objects to be sent\
+                     to the APIC.
+        :returns: Response class instance from the requests library.
+        """
         post_url = self.api + url
         logging.debug('Posting url: %s data: %s', post_url, data)
 
         if self.cert_auth and not (self.appcenter_user and self._subscription_enabled and self._logged_in):
-            data = json.dumps(data, sort_keys=True)
+            data = acijson.dumps(data, sort_keys=self.sort_keys)
             cookies = self._prep_x509_header('POST', url, data)
-            resp = self.session.post(post_url, data=data, verify=self.verify_ssl,
-                                     timeout=timeout, proxies=self._proxies, cookies=cookies)
+            resp = self._send_request('post', url, data=data, verify=self.verify_ssl,
+                                      timeout=timeout, proxies=self._proxies, cookies=cookies)
             if resp.status_code == 403:
                 logging.error('Certificate authentication failed. Please check all settings are correct.')
                 resp.raise_for_status()
         else:
-            resp = self.session.post(post_url, data=json.dumps(data, sort_keys=True), verify=self.verify_ssl,
-                                     timeout=timeout, proxies=self._proxies)
+            data = acijson.dumpb(data, sort_keys=self.sort_keys)
+            resp = self._send_request('post', url, data=data, verify=self.verify_ssl,
+                                      timeout=timeout, proxies=self._proxies)
             if resp.status_code == 403:
                 logging.error(resp.text)
                 logging.error('Trying to login again....')
+                self._count('relogins', url)
                 resp = self._send_login()
                 self.resubscribe()
                 logging.error('Trying post again...')
                 logging.debug(post_url)
-                resp = self.session.post(post_url, data=json.dumps(data, sort_keys=True), verify=self.verify_ssl,
-                                         timeout=timeout, proxies=self._proxies)
-        logging.debug('Response: %s %s', resp, resp.text)
+                resp = self._send_request('post', url, data=data, verify=self.verify_ssl,
+                                          timeout=timeout, proxies=self._proxies)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Response: %s %s', resp, resp.text)
+        if self.cache is not None and resp.ok and not url.startswith('/api/aaa'):
+            self.cache.clear()
+        return resp
+
+    def _send_get(self, url, timeout=None, stream=False):
+        """
+        Send a single GET request to the APIC.
+
+        :param url: String containing the URL relative to the APIC address
+        :param timeout: Optional number of seconds before the request times out
+        :param stream: Boolean indicating whether the response body should\
+                       be read incrementally.  Default is False.
+        :returns: Response class instance from the requests library.
+        """
+        cookies = self._prep_x509_header('GET', url)
+        return self._send_request('get', url, timeout=timeout, verify=self.verify_ssl,
+                                  proxies=self._proxies, cookies=cookies, stream=stream)
+
+    def _relogin_and_get(self, url, resp, timeout=None, stream=False):
+        """
+        Login again after the APIC rejected a GET request and resend it.
+
+        :param url: String containing the URL relative to the APIC address
+        :param resp: Response class instance containing the rejected response
+        :param timeout: Optional number of seconds before the request times out
+        :param stream: Boolean indicating whether the response body should\
+                       be read incrementally.  Default is False.
+        :returns: Response class instance from the requests library.
+        """
+        if self.cert_auth and not (self.appcenter_user and self._subscription_enabled):
+            logging.error('Certificate authentication failed. Please check all settings are correct.')
+            resp.raise_for_status()
+        logging.error(resp.text)
+        logging.error('Trying to login again....')
+        self._count('relogins', url)
+        self._send_login()
+        self.resubscribe()
+        logging.error('Trying get again...')
+        logging.debug(self.api + url)
+        return self._send_request('get', url, timeout=timeout, verify=self.verify_ssl,
+                                  proxies=self._proxies, stream=stream)
+
+    def _retry_get(self, url, resp, timeout=None, stream=False):
+        """
+        Retry a GET request that received an error response.
+
+        :param url: String containing the URL relative to the APIC address
+        :param resp: Response class instance containing the error response
+        :param timeout: Optional number of seconds before the request times out
+        :param stream: Boolean indicating whether the response body should\
+                       be read incrementally.  Default is False.
+        :returns: Response class instance from the requests library.
+        :raises ConnectionError: if none of the retries is successful
+        """
+        logging.debug('Received error: %s %s' % (str(resp.status_code), resp.text))
+        retries = GET_RETRIES
+        while retries > 0:
+            time.sleep(_backoff_delay(GET_RETRIES - retries, base=self.retry_backoff))
+            logging.debug('Retrying query')
+            self._count('retries', url)
+            resp = self._send_get(url, timeout=timeout, stream=stream)
+            if resp.status_code != 200:
+                logging.debug('Retry was not successful.')
+                retries -= 1
+            else:
+                logging.debug('Retry was successful.')
+                break
+        if retries == 0:
+            logging.error('Raising ConnectionError')
+            raise ConnectionError
         return resp
 
+    def _get_page(self, url, page_number, page_size, timeout=None):
+        """
+        Get a single page of a query result.
+
+        :param url: String containing the URL of the query
+        :param page_number: Integer containing the page to get
+        :param page_size: Integer containing the number of objects in a page
+        :param timeout: Optional number of seconds before the request times out
+        :returns: Response class instance from the requests library.
+        """
+        logging.debug('Getting page %s', page_number)
+        self._count('pages', url)
+        separator = '&' if '?' in url else '?'
+        return self._send_get(url + '%spage=%s&page-size=%s' % (separator, page_number, page_size),
+                              timeout=timeout)
+
+    def _get_pages(self, url, timeout=None):
+        """
+        Collect a query result that is too big to be returned by the APIC
+        in a single response.  The first page gives the total number of
+        objects and the remaining pages are then fetched concurrently and
+        reassembled in order.
+
+        :param url: String containing the URL of the query
+        :param timeout: Optional number of seconds before the request times out
+        :returns: Response class instance from the requests library\
+                  containing the objects of all of the pages.
+        """
+        logging.error('Response too big. Need to collect it in pages. Starting collection...')
+        page_size = self.page_size
+        resp = self._get_page(url, 0, page_size, timeout)
+        # Objects with large subtrees may not fit in a single page either
+        while resp.status_code == 400 and TOO_BIG_ERROR in resp.text and page_size // 2 >= MIN_PAGE_SIZE:
+            page_size //= 2
+            logging.debug('Page too big. Reducing page size to %s', page_size)
+            resp = self._get_page(url, 0, page_size, timeout)
+        if not resp.ok:
+            return resp
+        first_page = ApicResponse.from_response(resp)
+        entries = list(first_page.imdata)
+        total_count = first_page.total_count
+        remaining = total_count - page_size
+        if remaining > 0:
+            workers = max(1, self.max_page_workers)
+            fetch_size = _split_page_size(page_size, remaining, workers)
+            first_page = page_size // fetch_size
+            page_numbers = range(first_page, first_page + (remaining + fetch_size - 1) // fetch_size)
+            pool = ThreadPool(min(workers, len(page_numbers)))
+            try:
+                pages = pool.map(lambda page_number: self._get_page(url, page_number, fetch_size, timeout),
+                                 page_numbers)
+            finally:
+                pool.close()
+                pool.join()
+            for page in pages:
+                if not page.ok:
+                    logging.error('Could not collect page %s', page.url)
+                    return page
+                entries += ApicResponse.from_response(page).imdata
+        return ApicResponse.from_json(resp, {'imdata': entries, 'totalCount': str(total_count)})
+
     def get(self, url, timeout=None):
         """
         Perform a REST GET call to the APIC.
@@ -808,71 +2766,174 @@ class Session(object):
         response.ok is True if request is sent successfully.\
         response.json() will return the JSON data sent back by the APIC.
         """
+        self._flush_batch()
+        cache = self.cache
+        if cache is not None and cache.is_cacheable(url):
+            resp = cache.get(url)
+            if resp is not None:
+                return resp
+            generation = cache.generation
+        else:
+            cache = None
         get_url = self.api + url
         logging.debug(get_url)
 
-        cookies = self._prep_x509_header('GET', url)
-        resp = self.session.get(get_url, timeout=timeout, verify=self.verify_ssl, proxies=self._proxies, cookies=cookies)
+        resp = self._send_get(url, timeout=timeout)
         if resp.status_code == 403:
-            if self.cert_auth and not (self.appcenter_user and self._subscription_enabled):
-                logging.error('Certificate authentication failed. Please check all settings are correct.')
-                resp.raise_for_status()
-            else:
-                logging.error(resp.text)
-                logging.error('Trying to login again....')
-                resp = self._send_login()
-                self.resubscribe()
-                logging.error('Trying get again...')
-                logging.debug(get_url)
-                resp = self.session.get(get_url, timeout=timeout, verify=self.verify_ssl, proxies=self._proxies)
-        elif resp.status_code == 400 and 'Unable to process the query, result dataset is too big' in resp.text:
+            resp = self._relogin_and_get(url, resp, timeout=timeout)
+        elif resp.status_code == 400 and TOO_BIG_ERROR in resp.text:
             # Response is too big so we will need to get the response in pages
-            # Get the first chunk of entries
-            logging.error('Response too big. Need to collect it in pages. Starting collection...')
-            page_number = 0
-            logging.debug('Getting first page')
-            cookies = self._prep_x509_header('GET', url + '&page=%s&page-size=10000' % page_number)
-            resp = self.session.get(get_url + '&page=%s&page-size=10000' % page_number,
-                                    timeout=timeout, verify=self.verify_ssl, proxies=self._proxies, cookies=cookies)
-            entries = []
-            if resp.ok:
-                entries += resp.json()['imdata']
-                orig_total_count = int(resp.json()['totalCount'])
-                total_count = orig_total_count - 10000
-                while total_count > 0 and resp.ok:
-                    page_number += 1
-                    logging.debug('Getting page %s' % page_number)
-                    # Get the next chunk
-                    cookies = self._prep_x509_header('GET', url + '&page=%s&page-size=10000' % page_number)
-                    resp = self.session.get(get_url + '&page=%s&page-size=10000' % page_number,
-                                            timeout=timeout, verify=self.verify_ssl,
-                                            proxies=self._proxies, cookies=cookies)
-                    if resp.ok:
-                        entries += resp.json()['imdata']
-                        total_count -= 10000
-                resp_content = {'imdata': entries,
-                                'totalCount': orig_total_count}
-                resp._content = json.dumps(resp_content)
+            resp = self._get_pages(url, timeout=timeout)
         elif 400 < resp.status_code < 600:
-            logging.debug('Received error: %s %s' % (str(resp.status_code), resp.text))
-            retries = 3
-            while retries > 0:
-                logging.debug('Retrying query')
-                cookies = self._prep_x509_header('GET', url)
-                resp = self.session.get(get_url, timeout=timeout, verify=self.verify_ssl, proxies=self._proxies, cookies=cookies)
-                if resp.status_code != 200:
-                    logging.debug('Retry was not successful.')
-                    retries -= 1
-                else:
-                    logging.debug('Retry was successful.')
-                    break
-            if retries == 0:
-                logging.error('Raising ConnectionError')
-                raise ConnectionError
-        logging.debug(resp)
-        logging.debug(resp.text)
+            resp = self._retry_get(url, resp, timeout=timeout)
+        resp = ApicResponse.from_response(resp)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(resp)
+            logging.debug(resp.text)
+        if cache is not None and resp.ok:
+            cache.put(url, resp, generation)
         return resp
 
+    def _iter_content(self, url, resp):
+        """
+        Iterate over the body of a streamed response and record its size
+
+        :param url: String containing the URL of the request
+        :param resp: Response class instance from the requests library
+        :returns: Generator of bytes
+        """
+        num_bytes = 0
+        try:
+            for chunk in resp.iter_content(chunk_size=65536):
+                num_bytes += len(chunk)
+                yield chunk
+        finally:
+            if self.metrics is not None:
+                self.metrics.add_bytes('get', url, num_bytes)
+
+    def iter_imdata(self, url, page_size=None, timeout=None, min_page_size=MIN_PAGE_SIZE):
+        """
+        Perform a REST GET call to the APIC and iterate over the returned\
+        objects one at a time.  The query is always collected in pages and\
+        each page is decoded incrementally as it is received so that the\
+        memory used depends on the page size rather than on the size of\
+        the result.
+
+        :param url: String containing the URL of the query.
+        :param page_size: Optional integer containing the number of objects\
+                          requested per page.  Default is Session.page_size.
+        :param timeout: Optional number of seconds before a request times out
+        :param min_page_size: Optional integer containing the number of objects\
+                              the page size is never reduced below when a page\
+                              is too big.  Queries returning whole subtrees may\
+                              need a smaller page size than the default.
+        :returns: Generator of dictionaries, one per object in the imdata\
+                  of the response.
+        :raises ConnectionError: if a page can not be retrieved
+        """
+        self._flush_batch()
+        cache = self.cache
+        if cache is not None and cache.is_cacheable(url):
+            # The responses of get() and of iter_imdata() share the cache entries
+            resp = cache.get(url)
+            if resp is not None:
+                for mo in resp.imdata:
+                    yield mo
+                return
+            generation = cache.generation
+            pages = []
+        else:
+            cache = None
+        if page_size is None:
+            page_size = self.page_size
+        separator = '&' if '?' in url else '?'
+        offset = 0
+        while True:
+            page_url = url + '%spage=%s&page-size=%s' % (separator, offset // page_size, page_size)
+            logging.debug(self.api + page_url)
+            resp = self._send_get(page_url, timeout=timeout, stream=True)
+            if resp.status_code == 403:
+                resp = self._relogin_and_get(page_url, resp, timeout=timeout, stream=True)
+            elif resp.status_code == 400 and TOO_BIG_ERROR in resp.text and page_size // 2 >= min_page_size:
+                resp.close()
+                page_size //= 2
+                # The offset must stay a whole number of pages
+                while offset % page_size:
+                    page_size -= 1
+                logging.debug('Page too big. Reducing page size to %s', page_size)
+                continue
+            elif 400 < resp.status_code < 600:
+                resp = self._retry_get(page_url, resp, timeout=timeout, stream=True)
+            if not resp.ok:
+                logging.error('Could not get page %s: %s %s', page_url, resp.status_code, resp.text)
+                resp.close()
+                raise ConnectionError
+            self._count('pages', url)
+            num_objects = 0
+            chunks = self._iter_content(page_url, resp)
+            if cache is not None:
+                # The objects yielded may be modified so the page is kept undecoded
+                body = []
+                chunks = _record_chunks(chunks, body)
+            try:
+                for mo in _iter_json_array(chunks):
+                    num_objects += 1
+                    yield mo
+            finally:
+                resp.close()
+            if cache is not None:
+                pages.append(b''.join(body))
+            if num_objects < page_size:
+                break
+            offset += page_size
+        if cache is not None:
+            imdata = []
+            for page in pages:
+                imdata.extend(_decode_apic_json(page).get('imdata', []))
+            cache.put(url, ApicResponse.from_json(resp, {'totalCount': str(len(imdata)), 'imdata': imdata}),
+                      generation)
+
+    def get_changes_since(self, class_names, timestamp, naming_only=False, timeout=None):
+        """
+        Get the MOs of the classes that were modified after a checkpoint.\
+        The classes are queried concurrently using a modTs filter so that\
+        only the modified MOs are transferred.  MOs that were deleted are\
+        not returned.
+
+        :param class_names: list of strings containing the APIC classes
+        :param timestamp: String containing the checkpoint in the APIC\
+                          modTs format such as ``2016-04-05T14:52:06.123-07:00``\
+                          or datetime instance
+        :param naming_only: Boolean indicating whether only the naming\
+                            properties of the MOs are returned.  Default is False.
+        :param timeout: Optional number of seconds before a request times out
+        :returns: list of dictionaries containing the modified MOs
+        :raises ConnectionError: if the APIC cannot be queried
+        """
+        if not isinstance(timestamp, str):
+            timestamp = timestamp.isoformat()
+        # The offset of the timestamp may contain a '+'
+        timestamp = quote(timestamp)
+        class_names = list(class_names)
+        if not class_names:
+            return []
+        self._flush_batch()
+        options = '&rsp-prop-include=naming-only' if naming_only else ''
+
+        def get_class_changes(class_name):
+            url = '/api/class/{0}.json?query-target-filter=gt({0}.modTs,"{1}"){2}'.format(class_name,
+                                                                                        timestamp,
+                                                                                        options)
+            return list(self.iter_imdata(url, timeout=timeout))
+
+        pool = ThreadPool(min(self.max_page_workers, len(class_names)))
+        try:
+            changes = pool.map(get_class_changes, class_names)
+        finally:
+            pool.close()
+            pool.join()
+        return list(itertools.chain.from_iterable(changes))
+
     def register_login_callback(self, callback_fn):
         """
         Register a callback function that will be called when the session performs a
@@ -900,3 +2961,52 @@ class Session(object):
         """
         for callback_fn in self._relogin_callbacks:
             callback_fn(self)
+
+
+class _ShardSession(Session):
+    """
+    Additional login of a Subscriber spreading the subscriptions over
+    several websockets.  The APIC delivers the events of a subscription
+    on the websocket opened with the token used to subscribe, so each
+    websocket needs a login of its own.  The events of all of the shards
+    are placed into the buckets of the Subscriber.
+    """
+    def __init__(self, subscriber):
+        apic = subscriber._apic
+        Session.__init__(self, apic.api, apic.uid, apic.pwd, verify_ssl=apic.verify_ssl,
+                         subscription_enabled=False, proxies=apic._proxies)
+        self._transport = apic._transport
+        self._rate_limiters = apic._rate_limiters
+        self.metrics = apic.metrics
+        self.retry_backoff = apic.retry_backoff
+        self._subscriber = subscriber
+        self._ws = None
+        self.event_handler_thread = None
+
+    def _open_web_socket(self, use_secure=True):
+        """
+        Opens the web socket connection of the shard with the APIC.
+
+        :param use_secure: Boolean indicating whether the web socket
+                           should be secure.  Default is True.
+        """
+        self._ws, self.event_handler_thread = self._subscriber._connect_web_socket(self, self._ws,
+                                                                                   self.event_handler_thread,
+                                                                                   use_secure)
+
+    def _send_login(self, timeout=None):
+        resp = Session._send_login(self, timeout)
+        if resp.ok:
+            self._open_web_socket('https://' in self.api)
+        return resp
+
+    def resubscribe(self):
+        """
+        Reissue the subscriptions of the shard after a re-login
+        """
+        self._subscriber._resubscribe(self._subscriber._shards.index(self) + 1)
+
+
+if sys.version_info >= (3, 5, 0):
+    # AsyncSession relies on the async/await syntax
+    from .aciasyncsession import AsyncSession  # noqa
@@ -32,6 +32,7 @@
 """
 from collections import Sequence
 import logging
+from multiprocessing.pool import ThreadPool
 from operator import attrgetter, itemgetter
 import re
 import sys
@@ -129,10 +130,26 @@ class Tenant(BaseACIObject):
                 'l3extOut': OutsideL3}
 
     @classmethod
-    def get_deep(cls, session, names=(), limit_to=(), subtree='full', config_only=False, parent=None):
+    def get_deep(cls, session, names=(), limit_to=(), subtree='full', config_only=False, parent=None, since=None,
+                 fetch='serial'):
         """
         Get the Tenant objects and all of the children objects.
 
+        When ``since`` is given, the tenants previously collected into ``parent`` are
+        refreshed incrementally.  Only the tenants containing objects modified after
+        the checkpoint, or related to such tenants, are collected again; the other
+        tenants are returned as is.  Deleted tenants are dropped, but deletions that
+        do not modify any other object of the tenant are only picked up by a full
+        collection.
+
+        By default the tenants are fetched one query at a time.  With ``fetch`` set to
+        'concurrent', the tenant queries are sent concurrently, up to
+        Session.max_page_workers at a time.  With ``fetch`` set to 'uni', all of the
+        tenants are fetched with a single query of uni limited to the fvTenant
+        subtrees.  That query is collected in pages decoded as they are received and,
+        unless ``since`` is given, does not need the tenant names to be queried first.  The same objects are
+        returned whichever way the tenants are fetched.
+
         :param session: the instance of Session used for APIC communication
         :param names: list of strings containing the tenant names. If no list is given, all tenants will be collected.
                       It should be noted that if relations extend across tenants, the relation will only be
@@ -142,6 +159,9 @@ class Tenant(BaseACIObject):
         :param subtree: String containing the rsp-subtree option. Default is 'full'.
         :param config_only: Boolean containing whether to collect only configurable parameters
         :param parent: The parent instance to assign to the tenant objects. If None, a Fabric instance will be created.
+        :param since: Optional string containing the APIC modTs, or datetime, of the previous collection.
+        :param fetch: String containing how the tenants are fetched, either 'serial', 'concurrent' or 'uni'.
+                      Default is 'serial'.
         :returns: Requests Response code
         """
         resp = []
@@ -149,7 +169,12 @@ class Tenant(BaseACIObject):
                 not isinstance(names, Sequence) or \
                 not all(isinstance(name, str) for name in names):
             raise TypeError('names should be a Sequence of strings')
-        names = list(names) or [tenant.name for tenant in Tenant.get(session)]
+        if fetch not in ('serial', 'concurrent', 'uni'):
+            raise ValueError("fetch should be one of 'serial', 'concurrent' or 'uni'")
+        names = list(names)
+        all_tenants = not names
+        if not names and (fetch != 'uni' or since is not None):
+            names = [tenant.name for tenant in Tenant.get(session)]
         if isinstance(limit_to, str) or \
                 not isinstance(limit_to, Sequence) or \
                 not all(isinstance(class_name, str) for class_name in limit_to):
@@ -164,24 +189,35 @@ class Tenant(BaseACIObject):
             params['rsp-subtree-class'] = ','.join(limit_to)
         if config_only:
             params['rsp-prop-include'] = 'config-only'
-        query = urlencode(params)
         objs = []
         full_data = []
         if parent is None:
             parent = Fabric()
-        for name in names:
-            query_url = '/api/mo/uni/tn-{}.json?{}'.format(name, query)
-            ret = session.get(query_url)
-
-            # the following works around a bug encountered in the json returned from the APIC
-            # Python3 throws an error 'TypeError: 'str' does not support the buffer interface'
-            # This error gets catched and the replace is done with byte code in a Python3 compatible way
-            try:
-                ret._content = ret._content.replace("\\\'", "'")
-            except TypeError:
-                ret._content = ret._content.replace(b"\\\'", b"'")
-
-            data = ret.json()['imdata']
+        unchanged = {}
+        if since is not None:
+            # A deleted tenant has no modified objects but is no longer on the APIC
+            current = set(names if all_tenants else [tenant.name for tenant in Tenant.get(session)])
+            existing = [name for name in names if name in current]
+            unchanged = cls._get_unchanged(session, parent, existing, limit_to, since)
+        if fetch == 'uni':
+            tenants_data = cls._get_deep_data_from_uni(session, names, unchanged, params)
+        else:
+            tenants_data = cls._get_deep_data_by_tenant(session, names, unchanged, params,
+                                                        concurrent=fetch == 'concurrent')
+        if since is not None and all_tenants:
+            # The tenants deleted from the APIC are not collected again
+            collected = set(name for name, data in tenants_data)
+            for old_tenant in parent.get_children(only_class=Tenant):
+                if old_tenant.name not in collected:
+                    parent.remove_child(old_tenant)
+        for name, data in tenants_data:
+            if name in unchanged:
+                resp.append(unchanged[name])
+                continue
+            if since is not None:
+                for old_tenant in parent.get_children(only_class=Tenant):
+                    if old_tenant.name == name:
+                        parent.remove_child(old_tenant)
             if len(data):
                 full_data.append(data[0])
                 obj = super(Tenant, cls).get_deep(full_data=data,
@@ -195,11 +231,142 @@ class Tenant(BaseACIObject):
                     resp.append(obj)
                 else:
                     print(name, 'resulted in a null object')
-        obj_dict = build_object_dictionary(objs)
+        obj_dict = build_object_dictionary(objs + list(unchanged.values()))
         for obj in objs:
             obj._extract_relationships(full_data, obj_dict)
         return resp
 
+    @classmethod
+    def _get_deep_data_by_tenant(cls, session, names, unchanged, params, concurrent=False):
+        """
+        Get the configuration of the tenants with one query per tenant
+
+        :param session: the instance of Session used for APIC communication
+        :param names: list of strings containing the tenant names
+        :param unchanged: dictionary of the unchanged Tenant instances indexed by name, which are not queried
+        :param params: dictionary containing the query parameters of a tenant query
+        :param concurrent: Boolean indicating whether the queries are sent concurrently,
+                           up to Session.max_page_workers at a time
+        :returns: list of (name, imdata) tuples in the order of the names.  The imdata is None for the
+                  unchanged tenants.
+        """
+        query = urlencode(params)
+
+        def get_tenant_data(name):
+            if name in unchanged:
+                return None
+            query_url = '/api/mo/uni/tn-{}.json?{}'.format(name, query)
+            return session.get(query_url).json()['imdata']
+
+        if not concurrent or len(names) < 2:
+            return [(name, get_tenant_data(name)) for name in names]
+        pool = ThreadPool(min(session.max_page_workers, len(names)))
+        try:
+            tenants_data = pool.map(get_tenant_data, names)
+        finally:
+            pool.close()
+            pool.join()
+        return list(zip(names, tenants_data))
+
+    @classmethod
+    def _get_deep_data_from_uni(cls, session, names, unchanged, params):
+        """
+        Get the configuration of the tenants with a single query of uni limited to the fvTenant subtrees.
+        The query is collected in pages that are decoded as they are received.  The page
+        size is reduced down to a single tenant if a page is too big.
+
+        :param session: the instance of Session used for APIC communication
+        :param names: list of strings containing the tenant names.  If empty, all of the tenants are returned.
+        :param unchanged: dictionary of the unchanged Tenant instances indexed by name, which are not queried
+        :param params: dictionary containing the query parameters of a tenant query
+        :returns: list of (name, imdata) tuples in the order of the names, or in the order of the
+                  response with tenant common first if no names are given.  The imdata is None for the
+                  unchanged tenants.
+        """
+        class_name = cls._get_apic_classes()[0]
+        params = dict(params)
+        params['query-target'] = 'children'
+        params['target-subtree-class'] = class_name
+        queried = [name for name in names if name not in unchanged]
+        if names and not queried:
+            return [(name, None) for name in names]
+        if queried:
+            filters = ['eq({}.name,"{}")'.format(class_name, name) for name in queried]
+            params['query-target-filter'] = filters[0] if len(filters) == 1 else 'or({})'.format(','.join(filters))
+        wanted = set(names)
+        found = {}
+        order = []
+        for mo in session.iter_imdata('/api/mo/uni.json?{}'.format(urlencode(params)), min_page_size=1):
+            if class_name not in mo:
+                continue
+            name = mo[class_name]['attributes']['name']
+            if (wanted and name not in wanted) or name in found:
+                continue
+            found[name] = [mo]
+            order.append(name)
+        if not names:
+            names = order
+            if 'common' in names:
+                names.remove('common')
+                names.insert(0, 'common')
+        return [(name, None if name in unchanged else found.get(name, [])) for name in names]
+
+    @classmethod
+    def _get_unchanged(cls, session, parent, names, limit_to, since):
+        """
+        Get the previously collected tenants that have no objects modified since the checkpoint
+
+        :param session: the instance of Session used for APIC communication
+        :param parent: The parent instance holding the previously collected tenants
+        :param names: list of strings containing the tenant names
+        :param limit_to: list of strings containing the APIC classes the collection is limited to
+        :param since: String containing the APIC modTs, or datetime, of the previous collection
+        :returns: dictionary of Tenant instances indexed by name
+        """
+        existing = {}
+        for tenant in parent.get_children(only_class=Tenant):
+            if tenant.name in names:
+                existing[tenant.name] = tenant
+        if not existing:
+            return {}
+        class_names = limit_to or cls.get_deep_apic_classes()
+        for mo in session.get_changes_since(class_names, since, naming_only=True):
+            for class_name in mo:
+                dn = mo[class_name]['attributes']['dn']
+                if dn.startswith('uni/tn-'):
+                    existing.pop(dn.split('/')[1][len('tn-'):], None)
+        # The objects of an unchanged tenant related to the objects of a tenant
+        # collected again would keep referring to the replaced objects
+        related = True
+        while related:
+            related = False
+            for name, tenant in list(existing.items()):
+                if any(other not in existing for other in cls._get_related_tenant_names(tenant)):
+                    del existing[name]
+                    related = True
+        return existing
+
+    @staticmethod
+    def _get_related_tenant_names(tenant):
+        """
+        Get the names of the other tenants holding objects related to the objects of a tenant
+
+        :param tenant: Tenant instance
+        :returns: set of strings containing the tenant names
+        """
+        names = set()
+        objs = [tenant]
+        while objs:
+            obj = objs.pop()
+            objs.extend(obj.get_children())
+            for relation in obj._relations + obj._attachments:
+                item = relation.item
+                while item is not None and not isinstance(item, Tenant):
+                    item = getattr(item, '_parent', None)
+                if item is not None and item is not tenant:
+                    names.add(item.name)
+        return names
+
     @classmethod
     def get(cls, session, parent=None):
         """
@@ -455,6 +622,7 @@ class CommonEPG(BaseACIObject):
     Base class for EPG and OutsideEPG.
     Not meant to be instantiated directly
     """
+    __slots__ = ()
 
     def __init__(self, epg_name, parent=None):
         """
@@ -827,6 +995,8 @@ class AttributeCriterion(BaseACIObject):
 
 class EPG(CommonEPG):
     """ EPG :  roughly equivalent to fvAEPg """
+    __slots__ = ('_leaf_bindings', 'match_type', 'class_id', 'scope', '_deployment_immediacy', '_intra_epg_isolation',
+                 '_dom_deployment_immediacy', '_dom_resolution_immediacy', '_is_attribute_based', '_base_epg')
 
     def __init__(self, epg_name, parent=None):
         """
@@ -2875,6 +3045,7 @@ class BaseSubnet(BaseACIObject):
     """
     Base class for Subnet and OutsideNetwork
     """
+    __slots__ = ('_addr', '_scope')
 
     def __init__(self, name, parent=None):
         """
@@ -2993,6 +3164,7 @@ class BaseSubnet(BaseACIObject):
 
 class Subnet(BaseSubnet):
     """ Subnet :  roughly equivalent to fvSubnet """
+    __slots__ = ()
 
     def __init__(self, subnet_name, parent=None):
         """
@@ -4180,6 +4352,8 @@ class Taboo(BaseContract):
 
 class FilterEntry(BaseACIObject):
     """ FilterEntry :  roughly equivalent to vzEntry """
+    __slots__ = ('applyToFrag', 'arpOpc', 'dFromPort', 'dToPort', 'etherT', 'prot', 'sFromPort', 'sToPort',
+                 'tcpRules', 'stateful', 'icmpv4T', 'icmpv6T')
 
     def __init__(self, name, parent, applyToFrag='0', arpOpc='0',
                  dFromPort='0', dToPort='0', etherT='0', prot='0',
@@ -4905,6 +5079,7 @@ class Endpoint(BaseACIObject):
     """
     Endpoint class
     """
+    __slots__ = ('mac', 'ip', 'encap', 'if_name', 'if_dn', 'secondary_ip', 'life_cycle', 'type', 'timestamp')
 
     def __init__(self, name, parent):
         if not isinstance(parent, EPG):
@@ -5147,9 +5322,7 @@ class Endpoint(BaseACIObject):
                                   '&rsp-subtree=full' % (apic_endpoint_class,
                                                          apic_endpoint_class,
                                                          endpoint_name))
-        ret = session.get(endpoint_query_url)
-        ep_data = ret.json()['imdata']
-        for ep in ep_data:
+        for ep in session.iter_imdata(endpoint_query_url):
             if ep[apic_endpoint_class]['attributes']['lcC'] == 'static':
                 continue
             if 'children' in ep[apic_endpoint_class]:
@@ -5317,6 +5490,7 @@ class IPEndpoint(BaseACIObject):
     """
     Endpoint class
     """
+    __slots__ = ('ip', 'mac')
 
     def __init__(self, name, parent):
         # if not isinstance(parent, EPG):
@@ -7083,6 +7257,8 @@ class Tag(_Tag):
     """
     Tag class.
     """
+    __slots__ = ()
+
     @staticmethod
     def _get_parent_class():
         """
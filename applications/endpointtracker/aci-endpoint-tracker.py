@@ -207,8 +207,8 @@ def tracker(args):
                                         VALUES (%s)""" % insert_data
                         c.execute(insert_cmd)
             cnx.commit()
-        # Sleep or else the endpointtracker will take 100% cpu
-        time.sleep(0.1)
+        # Block until the next event rather than polling
+        session.wait_for_events(aci.Endpoint)
 
 
 class Daemonize(Daemon):
@@ -155,6 +155,7 @@ class EventMonitor(threading.Thread):
         TableRow = namedtuple('TableRow', ('cls', 'name', 'timestamp', 'json', 'url'))
         while True:
             try:
+                session.wait_for_events(selected_classes)
                 for cls in selected_classes:
                     if cls.has_events(session):
                         event_object = cls.get_event(session)
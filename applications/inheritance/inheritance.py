@@ -848,6 +848,13 @@ class Monitor(threading.Thread):
                         tenants = self.remove_inherited_relation(tenants, EPGPolicy(json.loads(old_epg)), old_relation)
 
         # Push the necessary config to the APIC
+        with self.apic.push_batch() as batch:
+            self._push_tenants(tenants)
+        for failure in batch.failures:
+            logging.error('Error pushing to APIC %s', failure.response.text)
+        return new_relations
+
+    def _push_tenants(self, tenants):
         for tenant in tenants:
             tenant_json = tenant.get_json()
             # Check that the tenant actually has the contracts since they may actually be tenant common contracts.
@@ -861,12 +868,7 @@ class Monitor(threading.Thread):
                     if not self.does_tenant_have_contract_if(tenant.name, child['vzCPIf']['attributes']['name']):
                         tenant_json['fvTenant']['children'].remove(child)
             logging.debug('Pushing tenant configuration to the APIC: %s', tenant_json)
-            resp = self.apic.push_to_apic(tenant.get_url(), tenant_json)
-            if resp.ok:
-                logging.debug('Pushed to APIC successfully')
-            else:
-                logging.error('Error pushing to APIC', resp.text)
-        return new_relations
+            self.apic.push_to_apic(tenant.get_url(), tenant_json)
 
     def run(self):
         loop_count = 0
@@ -601,10 +601,8 @@ class EndpointMonitor(threading.Thread):
             raise RuntimeError('Playbook failed')
 
     def handle_endpoint_event(self):
-        num_eps = MAX_ENDPOINTS
         dirty_epgs = {}
-        while IPEndpoint.has_events(self.session) and num_eps:
-            ep = IPEndpoint.get_event(self.session)
+        for ep in IPEndpoint.get_events(self.session, max_events=MAX_ENDPOINTS):
             logging.info('for Endpoint: %s', ep.name)
             epg = ep.get_parent()
             app = epg.get_parent()
@@ -626,7 +624,6 @@ class EndpointMonitor(threading.Thread):
                     dirty_epgs[(tenant.name, app.name, epg.name)] = []
                 if not ep.is_deleted():
                     dirty_epgs[(tenant.name, app.name, epg.name)].append(ep)
-            num_eps -= 1
         start_time = time.time()
         for epg in dirty_epgs:
             (tenant_name, app_name, epg_name) = epg
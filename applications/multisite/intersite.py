@@ -416,14 +416,20 @@ class EndpointHandler(object):
             remote_site_obj = collector.get_site(remote_site)
             assert remote_site_obj is not None
             remote_session = remote_site_obj.session
-            for tenant_json in self.db[remote_site]:
+            # Push the endpoints in as few requests as possible and only
+            # retry the configuration that was rejected
+            try:
+                with remote_session.push_batch() as batch:
+                    for tenant_json in self.db[remote_site]:
+                        remote_session.push_to_apic(Tenant.get_url(), tenant_json)
+            except Timeout:
+                logging.error('Timeout error when attempting configuration push')
+                return
+            for failure in batch.failures:
+                tenant_json = failure.data
+                resp = failure.response
                 keep_trying = True
                 while keep_trying:
-                    try:
-                        resp = remote_session.push_to_apic(Tenant.get_url(), tenant_json)
-                    except Timeout:
-                        logging.error('Timeout error when attempting configuration push')
-                        return
                     keep_trying = False
                     if not resp.ok:
                         logging.warning('Could not push to remote site: %s %s', resp, resp.text)
@@ -431,6 +437,12 @@ class EndpointHandler(object):
                             keep_trying = self.check_and_remove_duplicate(remote_session,
                                                                           tenant_json,
                                                                           resp.json())
+                    if keep_trying:
+                        try:
+                            resp = remote_session.push_to_apic(Tenant.get_url(), tenant_json)
+                        except Timeout:
+                            logging.error('Timeout error when attempting configuration push')
+                            return
         self.db = {}
         self.addresses = {}
 
@@ -536,12 +548,9 @@ class MultisiteMonitor(threading.Thread):
                 num_eps = MAX_ENDPOINTS
 
     def handle_endpoint_event(self):
-        num_eps = MAX_ENDPOINTS
-        while IPEndpoint.has_events(self._session) and num_eps:
-            ep = IPEndpoint.get_event(self._session)
+        for ep in IPEndpoint.get_events(self._session, max_events=MAX_ENDPOINTS):
             logging.info('for Endpoint: %s', ep.name)
             self._endpoints.add_endpoint(ep, self._local_site)
-            num_eps -= 1
         self._endpoints.push_to_remote_sites(self._my_collector)
 
     def run(self):
@@ -555,7 +564,8 @@ class MultisiteMonitor(threading.Thread):
                 except ConnectionError:
                     logging.error('Could not handle endpoint event due to ConnectionError')
             else:
-                time.sleep(0.05)
+                # Wake up periodically to check whether to exit
+                self._session.wait_for_events(IPEndpoint, timeout=1)
 
 
 class SiteLoginCredentials(object):
@@ -14,6 +14,7 @@ args = creds.get()
 
 # Login to APIC
 session = ACI.Session(args.url, args.login, args.password)
+session.enable_cache()
 
 object_type = 'mo'
 mo = 'topology'
@@ -129,7 +130,6 @@ def get_attributes(dn):
     """
     mo_query_url = '/api/mo/' + dn + '.json?query-target=self'
     ret = session.get(mo_query_url)
-    ret._content = ret._content.replace('\n', '')
     data = ret.json()['imdata']
     result = []
     key = 'error'
@@ -141,7 +141,6 @@ def get_attributes(dn):
                 print 'attempting re-login'
                 login(session)
                 ret = session.get(mo_query_url)
-                ret._content = ret._content.replace('\n', '')
                 data = ret.json()['imdata']
 
     for node in data:
@@ -172,7 +171,6 @@ def get_children(dn):
     result = []
     mo_query_url = '/api/mo/' + dn + '.json?query-target=children'
     ret = session.get(mo_query_url)
-    ret._content = ret._content.replace('\n', '')
     mo_data = ret.json()['imdata']
     for child in mo_data:
         for objectName in child:
@@ -192,7 +190,6 @@ def get_counters(dn):
     result = []
     mo_query_url = '/api/mo/' + dn + '.json?query-target=self&rsp-subtree-include=stats'
     ret = session.get(mo_query_url)
-    ret._content = ret._content.replace('\n', '')
     mo_data = ret.json()['imdata']
     for node in mo_data:
         for key in node:
@@ -213,7 +210,6 @@ def get_objects(aci_class):
     """
     class_query_url = '/api/node/class/' + aci_class + '.json?query-target=self'
     ret = session.get(class_query_url)
-    ret._content = ret._content.replace('\n', '')
     data = ret.json()['imdata']
     result = []
     for node in data:
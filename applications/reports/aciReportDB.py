@@ -309,6 +309,7 @@ class ReportDB(object):
             if self.args is not None:
                 if self.args.login is not None:
                     self._session = ACI.Session(self.args.url, self.args.login, self.args.password)
+                    self._session.enable_cache()
                     resp = self.session.login(self.timeout)
                 else:
                     raise LoginError
@@ -1004,6 +1004,7 @@ class SearchSession(object):
             if self.args is not None:
                 if self.args.login is not None:
                     self._session = Session(self.args.url, self.args.login, self.args.password)
+                    self._session.enable_cache()
                     resp = self.session.login(self.timeout)
                 else:
                     raise LoginError
@@ -1104,7 +1105,8 @@ class Update_db_on_event(threading.Thread):
 
     def run(self):
         while not self._exit:
-            time.sleep(10)
+            # Wake up periodically to check whether to exit
+            self.session.wait_for_events(self.subscribed_classes, timeout=10)
             for cls in self.subscribed_classes:
                 if cls.has_events(self.session):
                     event = cls.get_event(self.session)
@@ -34,12 +34,12 @@
 import os
 import git
 import time
-import json
 import threading
 import datetime
 import sys
 
 import acitoolkit as ACI
+from acitoolkit import acijson
 from requests import Timeout, ConnectionError
 try:
     from paramiko import SSHClient, AutoAddPolicy
@@ -240,8 +240,6 @@ class ConfigDB(object):
         :returns: JSON dictionary of returned data
         """
         ret = self.session.get(url)
-        ret._content = ret.content.replace('\n', '')
-        ret._content = ret.content.replace("\\\'", "'")
         data = ret.json()
         return data
 
@@ -266,7 +264,7 @@ class ConfigDB(object):
 
         # Write the config to a file
         config_file = open(filename, 'w')
-        config_file.write(json.dumps(data, indent=4, separators=(',', ':')))
+        config_file.write(acijson.dumps(data, indent=4, separators=(',', ':')))
         config_file.close()
 
         # Add the file to Git
@@ -429,9 +427,9 @@ class ConfigDB(object):
                         print 'renaming', json_filename, 'to', new_filename
                         json_filename = os.path.join(self.repo_dir, json_filename)
                         with open(json_filename, 'r') as old_file:
-                            config = json.loads(old_file.read())
+                            config = acijson.loads(old_file.read())
                         with open(new_filename, 'w') as new_file:
-                            new_file.write(json.dumps(config, indent=4, separators=(',', ':')))
+                            new_file.write(acijson.dumps(config, indent=4, separators=(',', ':')))
                         os.remove(json_filename)
                         # Add the file to Git
                         self.repo.index.add([new_filename])
@@ -828,7 +826,7 @@ class ConfigDB(object):
         for filename in filenames:
             # Get the rollback version from the repo
             old_version = self.get_file(filename, version)
-            old_version = json.loads(old_version)
+            old_version = acijson.loads(old_version)
 
             # Push it to the APIC
             url = self._get_url_for_file(filename)
@@ -854,9 +852,9 @@ class ConfigDB(object):
         tar = tarfile.open('ce2_snapback.tar.gz', 'w:gz')
         for filename in filenames:
             content = self.get_file(filename, version)
-            content = json.loads(content)
+            content = acijson.loads(content)
             output = StringIO.StringIO()
-            output.write(json.dumps(content))
+            output.write(acijson.dumps(content))
             output.seek(0)
             info = tarfile.TarInfo(name=filename)
             info.size = len(output.buf)
@@ -0,0 +1,380 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""AsyncSession Test module
+
+These tests run the AsyncSession against a local stub APIC server and
+do not communicate with a real APIC.
+"""
+import asyncio
+import json
+import unittest
+
+from requests.exceptions import ConnectionError
+from aiohttp import web, WSMsgType
+from aiohttp.test_utils import TestServer
+
+from acitoolkit.acisession import AsyncSession, PAGE_SIZE, TOO_BIG_ERROR
+from acitoolkit.acitoolkit import Tenant
+
+
+class StubAPIC(object):
+    """
+    Minimal APIC answering the login, class query, paging, subscription
+    and websocket requests used by the tests
+    """
+    def __init__(self, num_tenants=3):
+        self.num_tenants = num_tenants
+        self.logins = 0
+        self.token = None
+        self.expire_next_get = False
+        self.failures_left = 0
+        self.refresh_ok = True
+        self.requests = []
+        self.sockets = []
+        self.subscription_id = 1000
+        self.app = web.Application()
+        self.app.router.add_route('*', '/{tail:.*}', self.handle)
+
+    def tenants(self):
+        return [{'fvTenant': {'attributes': {'name': 'tenant%s' % i,
+                                             'dn': 'uni/tn-tenant%s' % i}}}
+                for i in range(self.num_tenants)]
+
+    @staticmethod
+    def reply(data, status=200):
+        return web.Response(text=json.dumps(data), status=status,
+                            content_type='application/json')
+
+    async def handle(self, request):
+        path = request.path
+        self.requests.append(request.path_qs)
+        if path.startswith('/socket'):
+            return await self.handle_socket(request)
+        if path == '/api/aaaLogin.json':
+            self.logins += 1
+            self.token = 'token%s' % self.logins
+            resp = self.reply({'imdata': [{'aaaLogin': {'attributes': {'token': self.token,
+                                                                       'refreshTimeoutSeconds': '600'}}}]})
+            resp.set_cookie('APIC-cookie', self.token)
+            return resp
+        if request.cookies.get('APIC-cookie') != self.token:
+            return self.reply({'imdata': []}, status=403)
+        if self.expire_next_get:
+            self.expire_next_get = False
+            return self.reply({'imdata': []}, status=403)
+        if self.failures_left:
+            self.failures_left -= 1
+            return self.reply({'imdata': []}, status=500)
+        if path == '/api/class/fvTenant.json':
+            imdata = self.tenants()
+            if 'page' not in request.query:
+                if len(imdata) > PAGE_SIZE:
+                    return self.reply({'imdata': [{'error': {'attributes': {'text': TOO_BIG_ERROR}}}]},
+                                      status=400)
+            else:
+                page = int(request.query['page'])
+                page_size = int(request.query['page-size'])
+                imdata = imdata[page * page_size:(page + 1) * page_size]
+            resp = {'totalCount': str(self.num_tenants), 'imdata': imdata}
+            if request.query.get('subscription') == 'yes':
+                self.subscription_id += 1
+                resp['subscriptionId'] = str(self.subscription_id)
+            return self.reply(resp)
+        if path == '/api/aaaRefresh.json':
+            if not self.refresh_ok:
+                return self.reply({'imdata': [{'error': {'attributes': {'text': 'Refresh failed'}}}]},
+                                  status=400)
+            return self.reply({'imdata': [{'aaaLogin': {'attributes': {'token': self.token}}}]})
+        if path == '/api/subscriptionRefresh.json':
+            return self.reply({'imdata': []})
+        if path == '/api/mo/uni.json':
+            return self.reply({'imdata': []})
+        return self.reply({'imdata': []}, status=404)
+
+    async def handle_socket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        async for msg in ws:
+            if msg.type == WSMsgType.CLOSE:
+                break
+        return ws
+
+    async def send_event(self, subscription_id, mo):
+        event = {'subscriptionId': [str(subscription_id)], 'imdata': [mo]}
+        for ws in self.sockets:
+            if not ws.closed:
+                await ws.send_str(json.dumps(event))
+
+
+class TestAsyncSession(unittest.TestCase):
+    """
+    Tests for the AsyncSession class
+    """
+    def run_test(self, coro_fn, num_tenants=3):
+        async def runner():
+            apic = StubAPIC(num_tenants)
+            server = TestServer(apic.app)
+            await server.start_server()
+            session = AsyncSession('http://%s:%s' % (server.host, server.port), 'admin', 'password')
+            session.retry_backoff = 0.01
+            try:
+                await coro_fn(apic, session)
+            finally:
+                await session.close()
+                await server.close()
+        asyncio.run(runner())
+
+    def test_login(self):
+        """
+        Test logging in to the APIC
+        """
+        async def check(apic, session):
+            resp = await session.login()
+            self.assertTrue(resp.ok)
+            self.assertTrue(session.logged_in())
+            self.assertEqual(session.token, 'token1')
+        self.run_test(check)
+
+    def test_refresh_login_error(self):
+        """
+        Test that the login is renewed when refreshing it returns an error
+        """
+        async def check(apic, session):
+            await session.login()
+            apic.refresh_ok = False
+            resp = await session.refresh_login()
+            self.assertFalse(resp.ok)
+            session._login_timeout = 0.01
+            login_loop = asyncio.ensure_future(session._login_loop())
+            for _ in range(500):
+                if apic.logins == 2:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(apic.logins, 2)
+            self.assertFalse(login_loop.done())
+            login_loop.cancel()
+        self.run_test(check)
+
+    def test_relogin_replaces_ws_reader(self):
+        """
+        Test that logging in again replaces the task reading the websocket
+        """
+        async def check(apic, session):
+            await session.login()
+            tasks = len(session._tasks)
+            for _ in range(3):
+                apic.expire_next_get = True
+                await session.get('/api/class/fvTenant.json')
+            self.assertEqual(apic.logins, 4)
+            self.assertEqual(len(session._tasks), tasks)
+            self.assertEqual(len([task for task in session._tasks if not task.done()]), tasks)
+        self.run_test(check)
+
+    def test_get(self):
+        """
+        Test a basic get() call
+        """
+        async def check(apic, session):
+            await session.login()
+            resp = await session.get('/api/class/fvTenant.json')
+            self.assertTrue(resp.ok)
+            self.assertEqual(len(resp.json()['imdata']), 3)
+            self.assertEqual(session.metrics.get_stats()['/api/class/{}']['status'], {'200': 1})
+        self.run_test(check)
+
+    def test_concurrent_gets(self):
+        """
+        Test many concurrent get() calls sharing the same session
+        """
+        async def check(apic, session):
+            await session.login()
+            resps = await asyncio.gather(*[session.get('/api/class/fvTenant.json')
+                                           for _ in range(50)])
+            self.assertTrue(all(resp.ok for resp in resps))
+        self.run_test(check)
+
+    def test_get_relogin(self):
+        """
+        Test that a 403 response causes a relogin and the query is retried
+        """
+        async def check(apic, session):
+            await session.login()
+            apic.expire_next_get = True
+            resp = await session.get('/api/class/fvTenant.json')
+            self.assertTrue(resp.ok)
+            self.assertEqual(apic.logins, 2)
+        self.run_test(check)
+
+    def test_get_retry(self):
+        """
+        Test that server errors are retried
+        """
+        async def check(apic, session):
+            await session.login()
+            apic.failures_left = 2
+            resp = await session.get('/api/class/fvTenant.json')
+            self.assertTrue(resp.ok)
+        self.run_test(check)
+
+    def test_get_retry_exhausted(self):
+        """
+        Test that ConnectionError is raised when all of the retries fail
+        """
+        async def check(apic, session):
+            await session.login()
+            apic.failures_left = 10
+            with self.assertRaises(ConnectionError):
+                await session.get('/api/class/fvTenant.json')
+        self.run_test(check)
+
+    def test_get_paged(self):
+        """
+        Test that a response too big for a single query is collected in pages
+        """
+        async def check(apic, session):
+            await session.login()
+            resp = await session.get('/api/class/fvTenant.json?query-target=self')
+            self.assertTrue(resp.ok)
+            names = [mo['fvTenant']['attributes']['name'] for mo in resp.json()['imdata']]
+            self.assertEqual(names, ['tenant%s' % i for i in range(PAGE_SIZE + 5)])
+        self.run_test(check, num_tenants=PAGE_SIZE + 5)
+
+    def test_push_to_apic(self):
+        """
+        Test push_to_apic including the relogin on a 403 response
+        """
+        async def check(apic, session):
+            await session.login()
+            apic.expire_next_get = True
+            resp = await session.push_to_apic('/api/mo/uni.json', {'fvTenant': {'attributes': {'name': 'a'}}})
+            self.assertTrue(resp.ok)
+            self.assertEqual(apic.logins, 2)
+        self.run_test(check)
+
+    def test_subscribe(self):
+        """
+        Test subscribing and receiving the initial and the websocket events
+        """
+        async def check(apic, session):
+            await session.login()
+            url = '/api/class/fvTenant.json?subscription=yes'
+            resp = await session.subscribe(url)
+            self.assertTrue(resp.ok)
+            self.assertTrue(session.is_subscribed(url))
+            self.assertEqual(session.get_event_count(url), 3)
+            for _ in range(3):
+                await session.get_event(url)
+            self.assertFalse(session.has_events(url))
+            mo = {'fvTenant': {'attributes': {'dn': 'uni/tn-new', 'status': 'created'}}}
+            await apic.send_event(session._subscriptions[url], mo)
+            event = await session.get_event(url, timeout=5)
+            self.assertEqual(event['imdata'][0], mo)
+            await session.unsubscribe(url)
+            self.assertFalse(session.is_subscribed(url))
+        self.run_test(check)
+
+    def test_events(self):
+        """
+        Test iterating over the events as toolkit objects and dictionaries
+        """
+        async def check(apic, session):
+            await session.login()
+            url = '/api/class/fvTenant.json?subscription=yes'
+            events = session.events(Tenant, only_new=True)
+            mo = {'fvTenant': {'attributes': {'dn': 'uni/tn-new', 'name': 'new', 'status': 'created'}}}
+
+            async def send():
+                while not session.is_subscribed(url):
+                    await asyncio.sleep(0.01)
+                await apic.send_event(session._subscriptions[url], mo)
+            sender = asyncio.ensure_future(send())
+            tenant = await asyncio.wait_for(events.__anext__(), 5)
+            await sender
+            self.assertIsInstance(tenant, Tenant)
+            self.assertEqual(tenant.name, 'new')
+            await events.aclose()
+
+            events = session.events(url, only_new=True)
+            await apic.send_event(session._subscriptions[url], mo)
+            event = await asyncio.wait_for(events.__anext__(), 5)
+            self.assertEqual(event['imdata'][0], mo)
+            await events.aclose()
+        self.run_test(check)
+
+    def test_events_not_consumed(self):
+        """
+        Test that the events not consumed stay queued and that closing the
+        session stops an iterator that is never closed
+        """
+        async def check(apic, session):
+            await session.login()
+            url = '/api/class/fvTenant.json?subscription=yes'
+            tasks = list(session._tasks)
+            events = session.events(url, only_new=True)
+            first = asyncio.ensure_future(events.__anext__())
+            while not session.is_subscribed(url):
+                await asyncio.sleep(0.01)
+            for i in range(5):
+                mo = {'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % i, 'status': 'created'}}}
+                await apic.send_event(session._subscriptions[url], mo)
+            event = await asyncio.wait_for(first, 5)
+            self.assertEqual(event['imdata'][0]['fvTenant']['attributes']['dn'], 'uni/tn-0')
+            # One event is in the merged queue and another one is waiting to be put in it
+            for _ in range(500):
+                if session.get_event_count(url) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            self.assertEqual(session.get_event_count(url), 2)
+            forwarders = [task for task in session._tasks if task not in tasks and not task.done()]
+            self.assertTrue(forwarders)
+            await session.close()
+            self.assertTrue(all(forwarder.done() for forwarder in forwarders))
+        self.run_test(check)
+
+    def test_resubscribe_on_relogin(self):
+        """
+        Test that the subscriptions are reissued after a relogin
+        """
+        async def check(apic, session):
+            await session.login()
+            url = '/api/class/fvTenant.json?subscription=yes'
+            await session.subscribe(url, only_new=True)
+            old_id = session._subscriptions[url]
+            apic.expire_next_get = True
+            await session.get('/api/class/fvTenant.json')
+            self.assertTrue(session.is_subscribed(url))
+            self.assertNotEqual(session._subscriptions[url], old_id)
+        self.run_test(check)
+
+
+if __name__ == '__main__':
+    unittest.main()
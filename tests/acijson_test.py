@@ -0,0 +1,138 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""JSON codec Test module
+"""
+from collections import OrderedDict
+import json
+import unittest
+
+from acitoolkit import acijson
+from acitoolkit.acisession import ApicResponse, _decode_apic_json
+import requests
+
+
+class TestCodec(unittest.TestCase):
+    """
+    Tests for the codec selection and the encode/decode helpers
+    """
+    def setUp(self):
+        self.codec = acijson.get_codec()
+
+    def tearDown(self):
+        acijson.set_codec(self.codec)
+
+    def test_set_codec_by_name(self):
+        """
+        Test selecting the standard library codec by name
+        """
+        codec = acijson.set_codec('json')
+        self.assertEqual(codec.name, 'json')
+        self.assertIs(acijson.get_codec(), codec)
+
+    def test_set_codec_unknown(self):
+        """
+        Test that selecting an unknown codec raises ImportError
+        """
+        with self.assertRaises(ImportError):
+            acijson.set_codec('nosuchjson')
+
+    def test_set_codec_default(self):
+        """
+        Test that a codec is always found when none is named
+        """
+        self.assertIn(acijson.set_codec().name, [codec.name for codec in acijson.CODECS])
+
+    def check_codec(self, codec):
+        data = {'fvTenant': {'attributes': {'name': 'tn1', 'dn': 'uni/tn-tn1', 'descr': u'caf\u00e9'},
+                             'children': [{'fvBD': {'attributes': {'name': 'bd'}}}]}}
+        self.assertEqual(json.loads(codec.dumps(data)), data)
+        self.assertEqual(codec.loads(codec.dumps(data)), data)
+        self.assertEqual(codec.loads(codec.dumpb(data)), data)
+        self.assertIn('uni/tn-tn1', codec.dumps(data))
+        text = codec.dumps(data, sort_keys=True)
+        self.assertTrue(text.index('"descr"') < text.index('"dn"') < text.index('"name"'))
+        self.assertEqual(codec.dumps(data, indent=4, separators=(',', ':')),
+                         json.dumps(data, indent=4, separators=(',', ':')))
+
+    def test_codecs(self):
+        """
+        Test each installed codec encodes and decodes the same documents
+        """
+        for codec_class in acijson.CODECS:
+            try:
+                codec = codec_class()
+            except ImportError:
+                continue
+            self.check_codec(codec)
+
+    def test_sort_keys(self):
+        """
+        Test that the keys are only sorted when asked to
+        """
+        data = OrderedDict([('b', 1), ('a', 2)])
+        self.assertTrue(acijson.dumps(data, sort_keys=True).index('"a"') <
+                        acijson.dumps(data, sort_keys=True).index('"b"'))
+        self.assertTrue(acijson.dumps(data).index('"b"') < acijson.dumps(data).index('"a"'))
+
+
+class TestApicDecode(unittest.TestCase):
+    """
+    Tests for decoding the APIC responses with the codec
+    """
+    def test_decode_bytes(self):
+        """
+        Test decoding a UTF-8 encoded response
+        """
+        self.assertEqual(_decode_apic_json(b'{"imdata": []}'), {'imdata': []})
+
+    def test_decode_quirks(self):
+        """
+        Test that the APIC quirks fall back to the lenient decoder
+        """
+        self.assertEqual(_decode_apic_json(b'{"descr": "a\nb"}'), {'descr': 'a\nb'})
+        self.assertEqual(_decode_apic_json(b'{"descr": "it\\\'s"}'), {'descr': "it's"})
+
+    def test_decode_invalid(self):
+        """
+        Test that invalid documents still raise ValueError
+        """
+        with self.assertRaises(ValueError):
+            _decode_apic_json(b'{"imdata": ')
+
+    def test_response_content(self):
+        """
+        Test the content of a response built from decoded data
+        """
+        resp = ApicResponse.from_json(requests.Response(), {'imdata': [], 'totalCount': '0'})
+        self.assertEqual(json.loads(resp.content.decode('utf-8')), {'imdata': [], 'totalCount': '0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
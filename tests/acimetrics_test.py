@@ -0,0 +1,157 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""Metrics Test module
+"""
+import unittest
+
+from acitoolkit.acimetrics import MetricsRegistry, url_template
+from acitoolkit.acisession import Session
+from acisession_test import StubHTTPSession
+
+
+class TestUrlTemplate(unittest.TestCase):
+    """
+    Tests for grouping the URLs of similar requests
+    """
+    def test_mo(self):
+        """
+        Test that the naming values of the DN are replaced
+        """
+        self.assertEqual(url_template('/api/mo/uni/tn-a/ap-b.json?query-target=subtree'), '/api/mo/uni/tn-{}/ap-{}')
+        self.assertEqual(url_template('/api/mo/uni.json'), '/api/mo/uni')
+
+    def test_class(self):
+        """
+        Test that the class name is replaced
+        """
+        self.assertEqual(url_template('/api/node/class/fvTenant.json'), '/api/node/class/{}')
+        self.assertEqual(url_template('/api/node/class/topology/pod-1/node-101/l1PhysIf.json'),
+                         '/api/node/class/topology/pod-{}/node-{}/{}')
+
+    def test_brackets(self):
+        """
+        Test that the '/' within the brackets of a DN do not split the path
+        """
+        self.assertEqual(url_template('/api/mo/topology/pod-1/node-101/sys/phys-[eth1/1].json'),
+                         '/api/mo/topology/pod-{}/node-{}/sys/phys-{}')
+
+    def test_api_method(self):
+        """
+        Test that the API methods are kept
+        """
+        self.assertEqual(url_template('/api/subscriptionRefresh.json?id=1234'), '/api/subscriptionRefresh')
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Tests for recording the requests
+    """
+    def test_observe_request(self):
+        """
+        Test that requests are grouped by URL template
+        """
+        registry = MetricsRegistry()
+        registry.observe_request('get', '/api/mo/uni/tn-a.json', 0.02, 200, 100)
+        registry.observe_request('get', '/api/mo/uni/tn-b.json', 3, 500, 10)
+        registry.inc('retries', '/api/mo/uni/tn-b.json')
+        stats = registry.get_stats()['/api/mo/uni/tn-{}']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['bytes'], 110)
+        self.assertEqual(stats['status'], {'200': 1, '500': 1})
+        self.assertEqual(stats['retries'], 1)
+        self.assertEqual(sum(stats['histogram']), 2)
+        registry.reset()
+        self.assertEqual(registry.get_stats(), {})
+
+    def test_openmetrics(self):
+        """
+        Test the OpenMetrics exposition
+        """
+        registry = MetricsRegistry(buckets=(0.1, 1.0, float('inf')))
+        registry.observe_request('get', '/api/class/fvTenant.json', 0.05, 200, 100)
+        registry.observe_request('get', '/api/class/fvBD.json', 0.5, 200, 50)
+        registry.inc('pages', '/api/class/fvCEp.json')
+        lines = registry.to_openmetrics().splitlines()
+        labels = 'method="GET",url="/api/class/{}"'
+        self.assertIn('acitoolkit_request_duration_seconds_bucket{%s,le="0.1"} 1' % labels, lines)
+        self.assertIn('acitoolkit_request_duration_seconds_bucket{%s,le="1.0"} 2' % labels, lines)
+        self.assertIn('acitoolkit_request_duration_seconds_bucket{%s,le="+Inf"} 2' % labels, lines)
+        self.assertIn('acitoolkit_request_duration_seconds_count{%s} 2' % labels, lines)
+        self.assertIn('acitoolkit_response_bytes_total{%s} 150' % labels, lines)
+        self.assertIn('acitoolkit_responses_total{%s,status="200"} 2' % labels, lines)
+        self.assertIn('acitoolkit_pages_total{url="/api/class/{}"} 1', lines)
+        self.assertEqual(lines[-1], '# EOF')
+
+    def test_wsgi_app(self):
+        """
+        Test serving the exposition from a WSGI application
+        """
+        registry = MetricsRegistry()
+        registry.observe_request('get', '/api/class/fvTenant.json', 0.05, 200, 100)
+        headers = []
+        body = registry.wsgi_app({}, lambda status, response_headers: headers.extend(response_headers))
+        self.assertEqual(b''.join(body).decode('utf-8'), registry.to_openmetrics())
+        self.assertTrue(dict(headers)['Content-Type'].startswith('application/openmetrics-text'))
+
+
+class TestSessionMetrics(unittest.TestCase):
+    """
+    Tests for the metrics recorded by the Session
+    """
+    def test_paged_query(self):
+        """
+        Test that the requests and the pages of a paged query are recorded
+        """
+        stub = StubHTTPSession(2500, max_objects=1000)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        session.get('/api/class/fvCEp.json?query-target=self')
+        stats = session.metrics.get_stats()['/api/class/{}']
+        self.assertEqual(stats['requests'], len(stub.requests))
+        self.assertEqual(stats['pages'], len(stub.requests) - 1)
+        self.assertEqual(stats['status'], {'400': 1, '200': len(stub.requests) - 1})
+        self.assertTrue(stats['bytes'] > 0)
+
+    def test_iter_imdata(self):
+        """
+        Test that the size of the streamed pages is recorded
+        """
+        stub = StubHTTPSession(1500, max_objects=100000)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        mos = list(session.iter_imdata('/api/class/fvCEp.json', page_size=1000))
+        stats = session.metrics.get_stats()['/api/class/{}']
+        self.assertEqual(len(mos), 1500)
+        self.assertEqual(stats['pages'], 2)
+        self.assertTrue(stats['bytes'] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""Record and replay Test module
+
+These tests record the exchanges with a canned transport adapter and do
+not communicate with the APIC.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+from requests.adapters import BaseAdapter
+
+from acitoolkit.acireplay import RecordingAdapter, ReplayAdapter, _RecordingWebSocket
+from acitoolkit.acisession import Session
+
+SUBSCRIPTION_URL = '/api/class/fvTenant.json?subscription=yes'
+
+
+class CannedAdapter(BaseAdapter):
+    """
+    Transport adapter answering the login, subscription and tenant queries
+    """
+    def __init__(self, delay=0):
+        super(CannedAdapter, self).__init__()
+        self.delay = delay
+
+    def send(self, request, **kwargs):
+        time.sleep(self.delay)
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.request = request
+        resp.url = request.url
+        if 'aaaLogin' in request.url:
+            data = {'imdata': [{'aaaLogin': {'attributes': {'token': 'token1',
+                                                            'refreshTimeoutSeconds': '600'}}}]}
+        else:
+            data = {'totalCount': '1',
+                    'imdata': [{'fvTenant': {'attributes': {'name': 'a', 'dn': 'uni/tn-a'}}}]}
+            if 'subscription=yes' in request.url:
+                data['subscriptionId'] = '1001'
+        resp._content = json.dumps(data).encode()
+        resp.headers['Content-Type'] = 'application/json'
+        return resp
+
+    def close(self):
+        pass
+
+
+class FakeWebSocket(object):
+    """
+    Websocket returning a single event
+    """
+    connected = True
+
+    def recv(self):
+        return json.dumps({'subscriptionId': ['1001'],
+                           'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-b', 'status': 'created'}}}]})
+
+    def close(self):
+        pass
+
+
+class TestRecordReplay(unittest.TestCase):
+    """
+    Tests for recording the exchanges of a Session and replaying them
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = os.path.join(self.directory, 'session.json.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, delay=0):
+        recorder = RecordingAdapter(self.archive, adapter=CannedAdapter(delay))
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.set_transport(recorder)
+        self.assertTrue(session.login().ok)
+        session.get(SUBSCRIPTION_URL)
+        _RecordingWebSocket(FakeWebSocket(), recorder).recv()
+        session.get('/api/class/fvTenant.json')
+        recorder.close()
+
+    def test_replay(self):
+        """
+        Test that the recorded responses are replayed
+        """
+        self.record()
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.set_transport(ReplayAdapter(self.archive))
+        self.assertTrue(session.login().ok)
+        self.assertEqual(session.token, 'token1')
+        resp = session.get('/api/class/fvTenant.json')
+        self.assertEqual(resp.json()['imdata'][0]['fvTenant']['attributes']['name'], 'a')
+        # Responses are reused once exhausted
+        self.assertTrue(session.get('/api/class/fvTenant.json').ok)
+
+    def test_not_recorded(self):
+        """
+        Test that a request that was not recorded is answered with a 404
+        """
+        self.record()
+        replayer = ReplayAdapter(self.archive)
+        resp = requests.Session()
+        resp.mount('http://', replayer)
+        self.assertEqual(resp.get('http://1.2.3.4/api/class/fvBD.json').status_code, 404)
+
+    def test_timing(self):
+        """
+        Test that the recorded response times are reproduced
+        """
+        self.record(delay=0.1)
+        replayer = ReplayAdapter(self.archive, timing=True, speed=2)
+        http = requests.Session()
+        http.mount('http://', replayer)
+        start = time.time()
+        http.get('http://1.2.3.4/api/class/fvTenant.json')
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+    def test_replay_events(self):
+        """
+        Test that the websocket frames are delivered after the exchanges preceding them
+        """
+        self.record()
+        session = Session('http://1.2.3.4', 'admin', 'password')
+        session.set_transport(ReplayAdapter(self.archive))
+        try:
+            self.assertTrue(session.login().ok)
+            self.assertFalse(session.subscription_thread._events)
+            session.subscribe(SUBSCRIPTION_URL, only_new=True)
+            for _ in range(50):
+                if session.has_events(SUBSCRIPTION_URL):
+                    break
+                time.sleep(0.1)
+            event = session.get_event(SUBSCRIPTION_URL)
+            self.assertEqual(event['imdata'][0]['fvTenant']['attributes']['dn'], 'uni/tn-b')
+        finally:
+            session.subscription_thread._ws.close()
+            session.subscription_thread.exit()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1445 @@
+################################################################################
+#                                  _    ____ ___                               #
+#                                 / \  / ___|_ _|                              #
+#                                / _ \| |    | |                               #
+#                               / ___ \ |___ | |                               #
+#                         _____/_/   \_\____|___|_ _                           #
+#                        |_   _|__   ___ | | | _(_) |_                         #
+#                          | |/ _ \ / _ \| | |/ / | __|                        #
+#                          | | (_) | (_) | |   <| | |_                         #
+#                          |_|\___/ \___/|_|_|\_\_|\__|                        #
+#                                                                              #
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations   #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""Session Test module
+
+These tests replace the HTTP client of the Session with a stub and do not
+communicate with the APIC.
+"""
+from collections import OrderedDict
+import json
+import threading
+import time
+import unittest
+
+try:
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from urlparse import urlparse, parse_qs
+
+import requests
+
+from acitoolkit.acisession import (ApicResponse, BatchWriter, EventHandler, RateLimiter, ResponseCache, Session,
+                                   Subscriber, TOO_BIG_ERROR, _ShardSession, _backoff_delay, _get_catch_up_url,
+                                   _iter_json_array, _split_page_size)
+from acitoolkit.acitoolkit import Tenant
+
+
+def make_response(data, status_code=200, url=None):
+    """
+    Build a requests.Response instance
+
+    :param data: Dictionary containing the JSON body
+    :param status_code: Integer containing the HTTP status code
+    :param url: String containing the URL of the request
+    :returns: Instance of requests.Response
+    """
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = json.dumps(data).encode()
+    resp._content_consumed = True
+    resp.encoding = 'utf-8'
+    resp.url = url
+    return resp
+
+
+class StubHTTPSession(object):
+    """
+    Stub of the requests.Session used by the Session class.  Serves a
+    number of fvCEp objects and enforces a maximum response size the same
+    way as the APIC does.
+    """
+    def __init__(self, num_objects, max_objects=1000, max_page_size=None):
+        self.num_objects = num_objects
+        self.objects = [{'fvCEp': {'attributes': {'dn': 'uni/tn-a/ap-b/epg-c/cep-%s' % i}}}
+                        for i in range(num_objects)]
+        self.max_objects = max_objects
+        self.max_page_size = max_page_size
+        self.requests = []
+        self.failing_pages = set()
+        self.failing_status = 500
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self.posts = []
+        self.rejected_names = set()
+        self._lock = threading.Lock()
+
+    def post(self, url, data=None, **kwargs):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        self.posts.append(json.loads(data, object_pairs_hook=OrderedDict))
+        if any(name in data for name in self.rejected_names):
+            return make_response({'imdata': [{'error': {'attributes': {'text': 'rejected'}}}]}, 400, url)
+        return make_response({'imdata': []}, url=url)
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.requests.append(url)
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            return self._get(url)
+        finally:
+            with self._lock:
+                self.concurrent -= 1
+
+    def _get(self, url):
+        query = parse_qs(urlparse(url).query)
+        objects = self.objects
+        too_big = make_response({'imdata': [{'error': {'attributes': {'text': TOO_BIG_ERROR}}}]},
+                                400, url)
+        if 'page' not in query:
+            if self.num_objects > self.max_objects:
+                return too_big
+            return make_response({'totalCount': str(self.num_objects), 'imdata': objects}, url=url)
+        page = int(query['page'][0])
+        page_size = int(query['page-size'][0])
+        if self.max_page_size is not None and page_size > self.max_page_size:
+            return too_big
+        if page in self.failing_pages:
+            return make_response({'imdata': [{'error': {'attributes': {'text': 'failed'}}}]},
+                                 self.failing_status, url)
+        return make_response({'totalCount': str(self.num_objects),
+                              'imdata': objects[page * page_size:(page + 1) * page_size]}, url=url)
+
+
+class TestSessionPaging(unittest.TestCase):
+    """
+    Tests for collecting responses that are too big in pages
+    """
+    def create_session(self, stub):
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        return session
+
+    def get_dns(self, resp):
+        return [mo['fvCEp']['attributes']['dn'] for mo in resp.json()['imdata']]
+
+    def test_split_page_size(self):
+        """
+        Test that the page size is reduced to keep the workers busy
+        """
+        self.assertEqual(_split_page_size(10000, 100000, 4), 10000)
+        self.assertEqual(_split_page_size(10000, 15000, 4), 2500)
+        self.assertEqual(_split_page_size(10000, 1000, 4), 625)
+        self.assertEqual(_split_page_size(600, 1000, 4), 600)
+
+    def test_not_paged(self):
+        """
+        Test that a small response is returned directly
+        """
+        stub = StubHTTPSession(10)
+        session = self.create_session(stub)
+        resp = session.get('/api/class/fvCEp.json?query-target=self')
+        self.assertTrue(resp.ok)
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(len(resp.json()['imdata']), 10)
+
+    def test_paged_in_order(self):
+        """
+        Test that the pages are reassembled in order
+        """
+        stub = StubHTTPSession(45000)
+        session = self.create_session(stub)
+        resp = session.get('/api/class/fvCEp.json?query-target=self')
+        self.assertTrue(resp.ok)
+        self.assertEqual(self.get_dns(resp), ['uni/tn-a/ap-b/epg-c/cep-%s' % i for i in range(45000)])
+        self.assertEqual(int(resp.json()['totalCount']), 45000)
+
+    def test_paged_concurrently(self):
+        """
+        Test that the number of concurrent page requests is bounded
+        """
+        stub = StubHTTPSession(100000)
+        session = self.create_session(stub)
+        session.max_page_workers = 3
+        resp = session.get('/api/class/fvCEp.json?query-target=self')
+        self.assertEqual(len(resp.json()['imdata']), 100000)
+        self.assertLessEqual(stub.max_concurrent, 3)
+        # Initial query, first page and 9 remaining pages
+        self.assertEqual(len(stub.requests), 11)
+
+    def test_page_size_reduced(self):
+        """
+        Test that the page size is reduced when a page is still too big
+        """
+        stub = StubHTTPSession(12000, max_page_size=2500)
+        session = self.create_session(stub)
+        resp = session.get('/api/class/fvCEp.json?query-target=self')
+        self.assertTrue(resp.ok)
+        self.assertEqual(self.get_dns(resp), ['uni/tn-a/ap-b/epg-c/cep-%s' % i for i in range(12000)])
+
+    def test_failed_page(self):
+        """
+        Test that a failed page is returned as the response
+        """
+        stub = StubHTTPSession(45000)
+        stub.failing_pages.add(2)
+        session = self.create_session(stub)
+        resp = session.get('/api/class/fvCEp.json?query-target=self')
+        self.assertFalse(resp.ok)
+
+
+
+class TestIterImdata(unittest.TestCase):
+    """
+    Tests for iterating over the objects of a query
+    """
+    def test_iter_json_array(self):
+        """
+        Test decoding a document split in chunks of a single byte
+        """
+        data = {'totalCount': '3',
+                'imdata': [{'fvTenant': {'attributes': {'name': 't%s' % i, 'descr': u'caf\u00e9 [x], {y}'}}}
+                           for i in range(3)]}
+        text = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        chunks = [text[i:i + 1] for i in range(len(text))]
+        self.assertEqual(list(_iter_json_array(iter(chunks))), data['imdata'])
+
+    def test_iter_json_array_control_characters(self):
+        """
+        Test decoding strings containing unescaped newlines
+        """
+        text = b'{"imdata": [{"fabricNode": {"attributes": {"descr": "a\nb"}}}], "totalCount": "1"}'
+        mos = list(_iter_json_array(iter([text])))
+        self.assertEqual(mos[0]['fabricNode']['attributes']['descr'], 'a\nb')
+
+    def test_iter_json_array_empty(self):
+        """
+        Test decoding an empty imdata
+        """
+        self.assertEqual(list(_iter_json_array(iter([b'{"totalCount":"0","imdata":[]}']))), [])
+
+    def test_iter_imdata(self):
+        """
+        Test that iter_imdata yields all of the objects in order one page at a time
+        """
+        stub = StubHTTPSession(2500, max_objects=100000)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        dns = [mo['fvCEp']['attributes']['dn'] for mo in
+               session.iter_imdata('/api/class/fvCEp.json?query-target=self', page_size=1000)]
+        self.assertEqual(dns, ['uni/tn-a/ap-b/epg-c/cep-%s' % i for i in range(2500)])
+        self.assertEqual(len(stub.requests), 3)
+
+    def test_iter_imdata_page_too_big(self):
+        """
+        Test that the page size is reduced when a page is too big
+        """
+        stub = StubHTTPSession(2500, max_page_size=1000)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        mos = list(session.iter_imdata('/api/class/fvCEp.json', page_size=4000))
+        self.assertEqual(len(mos), 2500)
+
+    def test_iter_imdata_min_page_size(self):
+        """
+        Test that the page size is reduced below the default minimum when allowed
+        """
+        stub = StubHTTPSession(30, max_page_size=3)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            list(session.iter_imdata('/api/mo/uni.json', page_size=1000))
+        mos = list(session.iter_imdata('/api/mo/uni.json', page_size=1000, min_page_size=1))
+        self.assertEqual([mo['fvCEp']['attributes']['dn'] for mo in mos],
+                         ['uni/tn-a/ap-b/epg-c/cep-%s' % i for i in range(30)])
+
+    def test_iter_imdata_failed_page(self):
+        """
+        Test that a page still failing after a new login raises ConnectionError
+        rather than yielding the error
+        """
+        stub = StubHTTPSession(2500)
+        stub.failing_pages.add(1)
+        stub.failing_status = 403
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        session._send_login = lambda: None
+        mos = []
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            for mo in session.iter_imdata('/api/class/fvCEp.json', page_size=1000):
+                mos.append(mo)
+        self.assertEqual(len(mos), 1000)
+
+    def test_iter_imdata_bad_request(self):
+        """
+        Test that a bad request is not retried, the same as with Session.get
+        """
+        stub = StubHTTPSession(2500)
+        stub.failing_pages.add(0)
+        stub.failing_status = 400
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            list(session.iter_imdata('/api/class/fvCEp.json', page_size=1000))
+        self.assertEqual(len(stub.requests), 1)
+
+
+class TestSubscriberRouting(unittest.TestCase):
+    """
+    Tests for routing the subscription events to the subscribed URLs
+    """
+    def setUp(self):
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.subscriber = Subscriber(session)
+        self.urls = ['/api/mo/uni/tn-%s.json?subscription=yes' % i for i in range(1000)]
+        for i, url in enumerate(self.urls):
+            self.subscriber._set_subscription_id(url, str(10000 + i))
+
+    def send_event(self, *subscription_ids):
+        event = {'subscriptionId': list(subscription_ids),
+                 'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-a', 'status': 'modified'}}}]}
+        self.subscriber._queue_event(event)
+
+    def test_route(self):
+        """
+        Test that the events are delivered in order to the subscribed URL
+        """
+        for i in range(5):
+            self.send_event('10999')
+        self.send_event('10000')
+        self.assertEqual(self.subscriber.get_event_count(self.urls[-1]), 5)
+        self.assertEqual(self.subscriber.get_event_count(self.urls[0]), 1)
+        self.assertEqual(self.subscriber.get_event_count(self.urls[1]), 0)
+
+    def test_route_shared(self):
+        """
+        Test that an event matching several subscriptions is shared
+        """
+        self.send_event('10001', '10002')
+        first = self.subscriber.get_event(self.urls[1])
+        second = self.subscriber.get_event(self.urls[2])
+        self.assertIs(first, second)
+
+    def test_route_unknown(self):
+        """
+        Test that events arriving before the response to their subscription
+        are delivered once the subscription id is known
+        """
+        self.send_event('1')
+        self.assertEqual(sum(len(events) for events in self.subscriber._events.values()), 0)
+        self.subscriber._set_subscription_id('/api/mo/uni/tn-b.json?subscription=yes', '1')
+        self.assertEqual(self.subscriber.get_event_count('/api/mo/uni/tn-b.json?subscription=yes'), 1)
+        self.assertFalse(self.subscriber._orphan_events)
+
+    def test_resubscribed(self):
+        """
+        Test that the events are routed with the id of a new subscription
+        """
+        self.subscriber._set_subscription_id(self.urls[0], '20000')
+        self.send_event('10000')
+        self.send_event('20000')
+        self.assertEqual(self.subscriber.get_event_count(self.urls[0]), 1)
+        self.subscriber._set_subscription_id(self.urls[0], None)
+        self.send_event('20000')
+        self.assertEqual(self.subscriber.get_event_count(self.urls[0]), 1)
+
+
+class StubSubscriptionHTTPSession(StubHTTPSession):
+    """
+    Stub of the requests.Session answering the subscriptions and their refreshes
+    """
+    def __init__(self):
+        super(StubSubscriptionHTTPSession, self).__init__(0)
+        self.next_id = 1000
+        self.failing_ids = set()
+        self.mos = []
+
+    def _get(self, url):
+        time.sleep(0.01)
+        query = parse_qs(urlparse(url).query)
+        if 'subscriptionRefresh' in url:
+            if query['id'][0] in self.failing_ids:
+                return make_response({'imdata': [{'error': {'attributes': {'text': 'unknown id'}}}]}, 400, url)
+            return make_response({'imdata': []}, url=url)
+        if 'subscription=yes' not in url:
+            return make_response({'totalCount': str(len(self.mos)), 'imdata': self.mos}, url=url)
+        with self._lock:
+            self.next_id += 1
+            subscription_id = str(self.next_id)
+        return make_response({'totalCount': str(len(self.mos)), 'imdata': self.mos,
+                              'subscriptionId': subscription_id}, url=url)
+
+
+class TestSubscriptionRefresh(unittest.TestCase):
+    """
+    Tests for refreshing and reissuing the subscriptions
+    """
+    def setUp(self):
+        self.stub = StubSubscriptionHTTPSession()
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session.session = self.stub
+        self.subscriber = Subscriber(self.session)
+        self.urls = ['/api/mo/uni/tn-%s.json?subscription=yes' % i for i in range(20)]
+        for url in self.urls:
+            self.subscriber.subscribe(url)
+        del self.stub.requests[:]
+        self.stub.max_concurrent = 0
+
+    def refreshes(self):
+        return [url for url in self.stub.requests if 'subscriptionRefresh' in url]
+
+    def test_spread(self):
+        """
+        Test that the refresh times are spread over the refresh interval
+        """
+        now = time.time()
+        due_times = [self.subscriber._refresh_due[url] - now for url in self.urls]
+        self.assertTrue(all(14 < due <= 30 for due in due_times))
+        self.assertGreater(len(set(due_times)), 1)
+        self.assertLessEqual(self.subscriber._get_refresh_delay(), 3)
+
+    def test_refresh(self):
+        """
+        Test that the subscriptions are refreshed concurrently
+        """
+        self.subscriber.refresh_subscriptions()
+        self.assertEqual(len(self.refreshes()), 20)
+        self.assertGreater(self.stub.max_concurrent, 1)
+        self.assertLessEqual(self.stub.max_concurrent, self.session.max_subscription_workers)
+        stats = self.subscriber.get_subscription_stats()
+        self.assertTrue(all(entry['refreshes'] == 1 and entry['failures'] == 0 for entry in stats.values()))
+
+    def test_refresh_due_only(self):
+        """
+        Test that only the subscriptions due are refreshed
+        """
+        self.subscriber._refresh_due[self.urls[0]] = time.time() - 1
+        self.subscriber.refresh_subscriptions(due_only=True)
+        self.assertEqual(len(self.refreshes()), 1)
+        self.assertGreater(self.subscriber._refresh_due[self.urls[0]], time.time() + 29)
+
+    def test_refresh_failure(self):
+        """
+        Test that only the subscription whose refresh fails is reissued
+        """
+        old_id = self.subscriber._subscriptions[self.urls[3]]
+        self.stub.failing_ids.add(old_id)
+        self.subscriber.refresh_subscriptions()
+        resubscribes = [url for url in self.stub.requests if 'subscriptionRefresh' not in url]
+        self.assertEqual(resubscribes, ['http://1.2.3.4' + self.urls[3]])
+        self.assertNotEqual(self.subscriber._subscriptions[self.urls[3]], old_id)
+        stats = self.subscriber.get_subscription_stats()
+        self.assertEqual(stats[self.urls[3]]['failures'], 1)
+        self.assertEqual(stats[self.urls[3]]['consecutive_failures'], 1)
+        self.assertEqual(stats[self.urls[4]]['failures'], 0)
+
+    def test_resubscribe(self):
+        """
+        Test that the subscriptions are reissued concurrently
+        """
+        old_ids = dict(self.subscriber._subscriptions)
+        self.subscriber._resubscribe()
+        self.assertEqual(len(self.stub.requests), 20)
+        self.assertGreater(self.stub.max_concurrent, 1)
+        self.assertEqual(sorted(self.subscriber._subscriptions), sorted(self.urls))
+        self.assertTrue(all(self.subscriber._subscriptions[url] != old_ids[url] for url in self.urls))
+
+
+class StubWebSocket(object):
+    """
+    Stub of a websocket delivering a list of events and then closing
+    """
+    def __init__(self, events):
+        self.events = list(events)
+        self.connected = True
+
+    def recv(self):
+        if not self.events:
+            self.connected = False
+            raise IOError('closed')
+        return self.events.pop(0)
+
+
+class TestSubscriptionShards(unittest.TestCase):
+    """
+    Tests for spreading the subscriptions over several logins and websockets
+    """
+    def setUp(self):
+        self.stubs = [StubSubscriptionHTTPSession() for _ in range(3)]
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session.subscription_shards = 3
+        self.session.session = self.stubs[0]
+        self.subscriber = Subscriber(self.session)
+        for i, stub in enumerate(self.stubs[1:]):
+            shard = _ShardSession(self.subscriber)
+            shard.session = stub
+            stub.next_id = 2000 + 1000 * i
+            self.subscriber._shards.append(shard)
+        self.urls = ['/api/mo/uni/tn-%s.json?subscription=yes' % i for i in range(30)]
+        for url in self.urls:
+            self.subscriber.subscribe(url)
+
+    def test_spread(self):
+        """
+        Test that the subscriptions are issued through the login of their shard
+        """
+        shards = [self.subscriber._get_shard(url) for url in self.urls]
+        self.assertEqual(set(shards), set([0, 1, 2]))
+        for shard, stub in enumerate(self.stubs):
+            issued = [url for url in stub.requests if 'subscription=yes' in url]
+            self.assertEqual(issued, ['http://1.2.3.4' + url for url, url_shard in zip(self.urls, shards)
+                                      if url_shard == shard])
+        stats = self.subscriber.get_subscription_stats()
+        self.assertEqual([stats[url]['shard'] for url in self.urls], shards)
+
+    def test_refresh(self):
+        """
+        Test that the subscriptions are refreshed through the login of their shard
+        """
+        self.subscriber.refresh_subscriptions()
+        for shard, stub in enumerate(self.stubs):
+            refreshes = [url for url in stub.requests if 'subscriptionRefresh' in url]
+            self.assertEqual(len(refreshes), len([url for url in self.urls
+                                                  if self.subscriber._get_shard(url) == shard]))
+
+    def test_resubscribe_shard(self):
+        """
+        Test that only the subscriptions of a shard are reissued after its re-login
+        """
+        old_ids = dict(self.subscriber._subscriptions)
+        self.subscriber._shards[0].resubscribe()
+        for url in self.urls:
+            if self.subscriber._get_shard(url) == 1:
+                self.assertNotEqual(self.subscriber._subscriptions[url], old_ids[url])
+            else:
+                self.assertEqual(self.subscriber._subscriptions[url], old_ids[url])
+
+    def test_merged_events(self):
+        """
+        Test that the events received on every websocket reach the same buckets
+        """
+        handlers = []
+        for shard in range(3):
+            url = [url for url in self.urls if self.subscriber._get_shard(url) == shard][0]
+            event = {'subscriptionId': [self.subscriber._subscriptions[url]],
+                     'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-a', 'status': 'modified'}}}]}
+            handlers.append((url, EventHandler(self.subscriber, StubWebSocket([json.dumps(event)]))))
+        for _, handler in handlers:
+            handler.start()
+        for url, handler in handlers:
+            handler.join()
+            self.assertEqual(self.subscriber.get_event_count(url), 1)
+
+
+class TestSubscriptionCatchUp(unittest.TestCase):
+    """
+    Tests for replaying the changes missed while the events could not be received
+    """
+    url = '/api/class/fvTenant.json?subscription=yes'
+
+    def setUp(self):
+        self.stub = StubSubscriptionHTTPSession()
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session.session = self.stub
+        self.subscriber = Subscriber(self.session)
+        self.stub.mos = [self.tenant('a', '2016-04-05T10:00:00.000+00:00'),
+                         self.tenant('b', '2016-04-05T11:00:00.000+00:00')]
+        self.subscriber.subscribe(self.url, only_new=True)
+
+    @staticmethod
+    def tenant(name, mod_ts):
+        return {'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % name, 'name': name, 'modTs': mod_ts}}}
+
+    def get_events(self):
+        events = []
+        while self.subscriber.has_events(self.url):
+            attributes = self.subscriber.get_event(self.url)['imdata'][0]['fvTenant']['attributes']
+            events.append((attributes['name'], attributes.get('status')))
+        return events
+
+    def test_catch_up_url(self):
+        """
+        Test the URL of the query for the modified MOs
+        """
+        timestamp = '2016-04-05T10:00:00.000+00:00'
+        self.assertEqual(_get_catch_up_url(self.url, timestamp),
+                         '/api/class/fvTenant.json?query-target-filter='
+                         'gt(fvTenant.modTs,"2016-04-05T10%3A00%3A00.000%2B00%3A00")')
+        self.assertEqual(_get_catch_up_url('/api/mo/uni/tn-a.json?query-target=subtree&'
+                                           'target-subtree-class=fvBD,fvAEPg&subscription=yes', '1'),
+                         '/api/mo/uni/tn-a.json?query-target=subtree&target-subtree-class=fvBD,fvAEPg&'
+                         'query-target-filter=or(gt(fvBD.modTs,"1"),gt(fvAEPg.modTs,"1"))')
+        self.assertEqual(_get_catch_up_url('/api/class/fvBD.json?query-target-filter=eq(fvBD.name,"x")&'
+                                           'subscription=yes', '1'),
+                         '/api/class/fvBD.json?query-target-filter=and(eq(fvBD.name,"x"),gt(fvBD.modTs,"1"))')
+        self.assertEqual(_get_catch_up_url('/api/mo/uni/tn-a.json?subscription=yes', '1'), '/api/mo/uni/tn-a.json')
+
+    def test_resubscribe_replay(self):
+        """
+        Test that the changes made while the subscription had expired are queued
+        """
+        self.assertFalse(self.subscriber.has_events(self.url))
+        self.stub.mos = [self.tenant('a', '2016-04-05T10:00:00.000+00:00'),
+                         self.tenant('b', '2016-04-05T12:00:00.000+00:00'),
+                         self.tenant('c', '2016-04-05T12:30:00.000+00:00')]
+        self.subscriber._resubscribe()
+        self.assertEqual(self.get_events(), [('b', 'modified'), ('c', 'modified')])
+        self.assertEqual(self.session.metrics.get_stats()['/api/class/{}']['events_replayed'], 2)
+        self.subscriber._resubscribe()
+        self.assertEqual(self.get_events(), [])
+
+    def test_refresh_failure_replay(self):
+        """
+        Test that the changes made before a subscription whose refresh failed is reissued are queued
+        """
+        self.stub.failing_ids.add(self.subscriber._subscriptions[self.url])
+        self.stub.mos = [self.tenant('a', '2016-04-05T10:00:00.000+00:00'),
+                         self.tenant('b', '2016-04-05T12:00:00.000+00:00')]
+        self.assertFalse(self.subscriber._refresh_subscription(self.url))
+        self.assertEqual(self.get_events(), [('b', 'modified')])
+        self.assertEqual(self.subscriber._last_mod_ts[self.url], '2016-04-05T12:00:00.000+00:00')
+
+    def test_reconnect_catch_up(self):
+        """
+        Test that the changes missed while the websocket was down are queued
+        """
+        self.subscriber._queue_event({'subscriptionId': [self.subscriber._subscriptions[self.url]],
+                                      'imdata': [self.tenant('a', '2016-04-05T11:30:00.000+00:00')]})
+        self.get_events()
+        self.stub.mos = [self.tenant('c', '2016-04-05T12:30:00.000+00:00')]
+        del self.stub.requests[:]
+        self.subscriber._catch_up(self.url)
+        self.assertIn('gt(fvTenant.modTs,"2016-04-05T11%3A30%3A00.000%2B00%3A00")', self.stub.requests[0])
+        self.assertEqual(self.get_events(), [('c', 'modified')])
+        self.assertEqual(self.subscriber._last_mod_ts[self.url], '2016-04-05T12:30:00.000+00:00')
+
+    def test_concurrent_mod_ts(self):
+        """
+        Test that the latest modTs seen is not lowered by an older event
+        queued at the same time by another thread
+        """
+        subscriber = self.subscriber
+        newer = [self.tenant('b', '2016-04-05T12:00:00.000+00:00')]
+        threads = []
+
+        class LastModTs(dict):
+            def get(self, key, default=None):
+                value = dict.get(self, key, default)
+                if not threads:
+                    # Another thread updates the modTs while this one compares it
+                    threads.append(threading.Thread(target=subscriber._update_mod_ts, args=(key, newer)))
+                    threads[0].start()
+                    threads[0].join(0.2)
+                return value
+
+        subscriber._last_mod_ts = LastModTs(subscriber._last_mod_ts)
+        subscriber._update_mod_ts(self.url, [self.tenant('a', '2016-04-05T11:30:00.000+00:00')])
+        threads[0].join()
+        self.assertEqual(subscriber._last_mod_ts[self.url], '2016-04-05T12:00:00.000+00:00')
+
+
+class TestInitialState(unittest.TestCase):
+    """
+    Tests for getting the objects existing when subscribing in a single step
+    """
+    url = '/api/class/fvTenant.json?subscription=yes'
+
+    def setUp(self):
+        self.stub = StubSubscriptionHTTPSession()
+        self.stub.mos = [{'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % i, 'name': str(i)}}} for i in range(100)]
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session.session = self.stub
+        self.session._subscription_enabled = True
+        self.subscriber = self.session.subscription_thread = Subscriber(self.session)
+        self.session.subscribe(self.url)
+
+    def send_event(self, name):
+        self.subscriber._queue_event({'subscriptionId': [self.subscriber._subscriptions[self.url]],
+                                      'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % name,
+                                                                              'status': 'created'}}}]})
+
+    def test_initial_state(self):
+        """
+        Test that the snapshot is returned and only the later events remain
+        """
+        self.assertEqual(self.session.get_event_count(self.url), 100)
+        self.send_event('new')
+        self.assertEqual(self.session.get_initial_state(self.url), self.stub.mos)
+        self.assertEqual(self.session.get_event_count(self.url), 1)
+        event = self.session.get_event(self.url)
+        self.assertEqual(event['imdata'][0]['fvTenant']['attributes']['dn'], 'uni/tn-new')
+        self.assertEqual(self.session.get_initial_state(self.url), [])
+
+    def test_partially_consumed(self):
+        """
+        Test that the objects whose events were consumed are not returned
+        """
+        for _ in range(10):
+            self.session.get_event(self.url)
+        self.assertEqual(self.session.get_initial_state(self.url), self.stub.mos[10:])
+        self.assertFalse(self.session.has_events(self.url))
+
+    def test_coalesced(self):
+        """
+        Test that the objects replaced by a later event are left to the event
+        """
+        self.session.set_event_policy(self.url, policy='coalesce')
+        self.send_event('5')
+        state = self.session.get_initial_state(self.url)
+        self.assertEqual(len(state), 99)
+        self.assertEqual(self.session.get_event_count(self.url), 1)
+
+    def test_dropped_released(self):
+        """
+        Test that the snapshot events discarded or consumed are no longer held
+        """
+        self.session.set_event_policy(self.url, 10, 'drop-oldest')
+        bucket = self.subscriber._events[self.url]
+        self.assertEqual(len(bucket.initial), 10)
+        self.session.get_event(self.url)
+        self.assertEqual(len(bucket.initial), 9)
+        self.assertEqual(self.session.get_initial_state(self.url), self.stub.mos[91:])
+        self.assertEqual(len(bucket.initial), 0)
+
+    def test_block_snapshot(self):
+        """
+        Test that the snapshot events wait to be consumed with the block policy
+        """
+        self.session.get_initial_state(self.url)
+        self.session.set_event_policy(self.url, 10, 'block')
+        subscriber = threading.Thread(target=self.subscriber._send_subscription, args=(self.url,))
+        subscriber.daemon = True
+        subscriber.start()
+        time.sleep(0.2)
+        self.assertTrue(subscriber.is_alive())
+        self.assertEqual(self.session.get_event_count(self.url), 10)
+        received = []
+        deadline = time.time() + 5
+        while len(received) < 100 and time.time() < deadline:
+            if self.session.wait_for_events(self.url, timeout=1):
+                received.append(self.session.get_event(self.url))
+        subscriber.join(5)
+        self.assertEqual([event['imdata'][0] for event in received], self.stub.mos)
+
+
+class TestEventPolicy(unittest.TestCase):
+    """
+    Tests for the limits and policies of the subscription events
+    """
+    def setUp(self):
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session._subscription_enabled = True
+        self.subscriber = self.session.subscription_thread = Subscriber(self.session)
+        self.url = '/api/class/fvTenant.json?subscription=yes'
+        self.subscriber._set_subscription_id(self.url, '100')
+
+    def tearDown(self):
+        self.subscriber.exit()
+
+    def send_event(self, name, status='modified'):
+        self.subscriber._queue_event({'subscriptionId': ['100'],
+                                      'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % name,
+                                                                              'status': status}}}]})
+
+    def get_events(self):
+        events = []
+        while self.session.has_events(self.url):
+            events.append(self.session.get_event(self.url)['imdata'][0]['fvTenant']['attributes'])
+        return [(attributes['dn'], attributes['status']) for attributes in events]
+
+    def test_unlimited(self):
+        """
+        Test that all of the events are kept by default
+        """
+        for i in range(100):
+            self.send_event(str(i))
+        self.assertEqual(self.session.get_event_count(self.url), 100)
+        self.assertEqual(self.session.get_event_stats()[self.url],
+                         {'depth': 100, 'max_events': None, 'policy': 'block', 'dropped': 0, 'coalesced': 0})
+
+    def test_drop_oldest(self):
+        """
+        Test that the oldest events are discarded when the limit is reached
+        """
+        self.session.set_event_policy(self.url, 3, 'drop-oldest')
+        for i in range(5):
+            self.send_event(str(i))
+        self.assertEqual(self.get_events(), [('uni/tn-2', 'modified'), ('uni/tn-3', 'modified'),
+                                             ('uni/tn-4', 'modified')])
+        self.assertEqual(self.session.get_event_stats()[self.url]['dropped'], 2)
+        self.assertEqual(self.session.metrics.get_stats()['/api/class/{}']['events_dropped'], 2)
+
+    def test_coalesce(self):
+        """
+        Test that only the latest event of each DN is kept
+        """
+        self.session.set_event_policy(max_events=10, policy='coalesce')
+        self.send_event('a', 'created')
+        self.send_event('b', 'created')
+        self.send_event('a', 'modified')
+        self.send_event('b', 'deleted')
+        self.send_event('c', 'created')
+        self.assertEqual(self.get_events(), [('uni/tn-a', 'modified'), ('uni/tn-b', 'deleted'),
+                                             ('uni/tn-c', 'created')])
+        self.assertEqual(self.session.get_event_stats()[self.url]['coalesced'], 2)
+
+    def test_set_policy_pending(self):
+        """
+        Test that the pending events are kept when the policy changes
+        """
+        for i in range(5):
+            self.send_event(str(i))
+        self.session.set_event_policy(self.url, 2, 'drop-oldest')
+        self.assertEqual(self.get_events(), [('uni/tn-3', 'modified'), ('uni/tn-4', 'modified')])
+
+    def test_unknown_policy(self):
+        """
+        Test that an unknown policy is rejected
+        """
+        with self.assertRaises(ValueError):
+            self.session.set_event_policy(self.url, 2, 'drop-newest')
+
+    def test_block(self):
+        """
+        Test that the websocket reader waits for the events to be consumed
+        """
+        self.session.set_event_policy(self.url, 2, 'block')
+        sender = threading.Thread(target=lambda: [self.send_event(str(i)) for i in range(5)])
+        sender.start()
+        time.sleep(0.2)
+        self.assertTrue(sender.is_alive())
+        self.assertEqual(self.session.get_event_count(self.url), 2)
+        received = []
+        deadline = time.time() + 5
+        while len(received) < 5 and time.time() < deadline:
+            if self.session.wait_for_events(self.url, timeout=1):
+                received.append(self.session.get_event(self.url))
+        sender.join(5)
+        self.assertEqual(len(received), 5)
+        self.assertEqual(self.session.get_event_stats()[self.url]['dropped'], 0)
+
+
+class EventTenant(object):
+    """
+    Minimal toolkit class returning the name of the tenant of each event
+    """
+    @classmethod
+    def _get_subscription_urls(cls):
+        return ['/api/class/fvTenant.json?subscription=yes']
+
+    @classmethod
+    def subscribe(cls, session, only_new=False):
+        return True
+
+    @classmethod
+    def has_events(cls, session):
+        return any(session.has_events(url) for url in cls._get_subscription_urls())
+
+    @classmethod
+    def get_event(cls, session):
+        event = session.get_event(cls._get_subscription_urls()[0])
+        return event['imdata'][0]['fvTenant']['attributes']['name']
+
+
+class TestEventDelivery(unittest.TestCase):
+    """
+    Tests for waiting for the subscription events and the event handlers
+    """
+    def setUp(self):
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session._subscription_enabled = True
+        self.subscriber = self.session.subscription_thread = Subscriber(self.session)
+        self.url = EventTenant._get_subscription_urls()[0]
+        self.subscriber._set_subscription_id(self.url, '100')
+
+    def tearDown(self):
+        if self.session._event_dispatcher is not None:
+            self.session._event_dispatcher.exit()
+
+    def send_event(self, name, delay=0):
+        event = {'subscriptionId': ['100'],
+                 'imdata': [{'fvTenant': {'attributes': {'name': name, 'status': 'created'}}}]}
+        if delay:
+            timer = threading.Timer(delay, self.subscriber._queue_event, (event,))
+            timer.start()
+        else:
+            self.subscriber._queue_event(event)
+
+    def wait_for(self, condition):
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_wait_timeout(self):
+        """
+        Test that wait_for_events returns an empty list on timeout
+        """
+        self.assertEqual(self.session.wait_for_events(self.url, timeout=0.05), [])
+
+    def test_wait_wakeup(self):
+        """
+        Test that wait_for_events returns as soon as an event arrives
+        """
+        self.send_event('t1', delay=0.1)
+        start = time.time()
+        self.assertEqual(self.session.wait_for_events([EventTenant], timeout=5), [self.url])
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(self.session.wait_for_events(self.url, timeout=0), [self.url])
+
+    def test_url_handler(self):
+        """
+        Test that a URL callback receives the events in order
+        """
+        names = []
+        self.session.add_event_handler(self.url, lambda event: names.append(
+            event['imdata'][0]['fvTenant']['attributes']['name']))
+        for i in range(20):
+            self.send_event('t%s' % i)
+        self.wait_for(lambda: len(names) == 20)
+        self.assertEqual(names, ['t%s' % i for i in range(20)])
+
+    def test_class_handler(self):
+        """
+        Test that a class callback receives the objects returned by get_event
+        """
+        names = []
+        self.session.add_event_handler(EventTenant, names.append)
+        self.send_event('t1')
+        self.wait_for(lambda: names)
+        self.assertEqual(names, ['t1'])
+
+    def test_several_handlers(self):
+        """
+        Test that every callback of a target receives every event
+        """
+        first = []
+        second = []
+        self.session.add_event_handler(EventTenant, first.append)
+        self.session.add_event_handler(EventTenant, second.append)
+        for i in range(20):
+            self.send_event('t%s' % i)
+        self.wait_for(lambda: len(first) == 20 and len(second) == 20)
+        self.assertEqual(first, ['t%s' % i for i in range(20)])
+        self.assertEqual(second, first)
+
+    def test_remove_handler(self):
+        """
+        Test that a removed callback is no longer called
+        """
+        names = []
+        self.session.add_event_handler(EventTenant, names.append)
+        self.session.remove_event_handler(EventTenant, names.append)
+        self.send_event('t1')
+        self.assertEqual(self.session.wait_for_events(self.url, timeout=1), [self.url])
+        self.assertEqual(names, [])
+
+    def test_handler_failure(self):
+        """
+        Test that a failing callback does not stop the delivery of the events
+        """
+        names = []
+
+        def callback(name):
+            names.append(name)
+            raise ValueError
+        self.session.add_event_handler(EventTenant, callback)
+        self.send_event('t1')
+        self.send_event('t2')
+        self.wait_for(lambda: len(names) == 2)
+        self.assertEqual(names, ['t1', 't2'])
+
+
+class TestEventDrain(unittest.TestCase):
+    """
+    Tests for getting the subscription events in bulk
+    """
+    def setUp(self):
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session._subscription_enabled = True
+        self.subscriber = self.session.subscription_thread = Subscriber(self.session)
+        self.url = Tenant._get_subscription_urls()[0]
+        self.subscriber._set_subscription_id(self.url, '100')
+
+    def send_event(self, name, status='created'):
+        self.subscriber._queue_event({'subscriptionId': ['100'],
+                                      'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % name,
+                                                                              'name': name,
+                                                                              'status': status}}}]})
+
+    def test_drain_events(self):
+        """
+        Test that the events are returned in order up to max_events
+        """
+        for i in range(5):
+            self.send_event(str(i))
+        events = self.session.drain_events(self.url, max_events=3)
+        self.assertEqual([event['imdata'][0]['fvTenant']['attributes']['name'] for event in events],
+                         ['0', '1', '2'])
+        self.assertEqual(len(self.session.drain_events(self.url)), 2)
+        self.assertFalse(self.session.has_events(self.url))
+        self.assertEqual(self.session.drain_events(self.url), [])
+
+    def test_get_events(self):
+        """
+        Test that the drained events are turned into objects
+        """
+        for i in range(5):
+            self.send_event(str(i))
+        self.send_event('0', 'deleted')
+        tenants = Tenant.get_events(self.session, max_events=4)
+        self.assertEqual([tenant.name for tenant in tenants], ['0', '1', '2', '3'])
+        self.assertTrue(all(isinstance(tenant, Tenant) for tenant in tenants))
+        tenants = Tenant.get_events(self.session)
+        self.assertEqual([tenant.name for tenant in tenants], ['4', '0'])
+        self.assertTrue(tenants[1].is_deleted())
+        self.assertEqual(Tenant.get_events(self.session), [])
+
+
+class TestBatchWriter(unittest.TestCase):
+    """
+    Tests for batching the configuration pushed to the APIC
+    """
+    def setUp(self):
+        self.stub = StubHTTPSession(10)
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session.session = self.stub
+
+    @staticmethod
+    def tenant(name, *children, **attributes):
+        attributes['name'] = name
+        return {'fvTenant': {'attributes': attributes, 'children': list(children)}}
+
+    @staticmethod
+    def bd(name, **attributes):
+        attributes['name'] = name
+        return {'fvBD': {'attributes': attributes, 'children': []}}
+
+    def test_push_sort_keys(self):
+        """
+        Test that the pushed keys are sorted unless disabled on the session
+        """
+        data = {'fvTenant': OrderedDict([('children', []), ('attributes', {'name': 't1', 'descr': 'd'})])}
+        self.session.push_to_apic('/api/mo/uni.json', data)
+        self.assertEqual(list(self.stub.posts[-1]['fvTenant']), ['attributes', 'children'])
+        self.session.sort_keys = False
+        self.session.push_to_apic('/api/mo/uni.json', data)
+        self.assertEqual(list(self.stub.posts[-1]['fvTenant']), ['children', 'attributes'])
+
+    def test_merge(self):
+        """
+        Test that pushes to the same tenant are merged into a single POST
+        """
+        with self.session.push_batch() as batch:
+            resp = self.session.push_to_apic('/api/mo/uni.json', self.tenant('t1', self.bd('bd1')))
+            self.assertTrue(resp.ok)
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t1', self.bd('bd1', descr='x'),
+                                                                       self.bd('bd2')))
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t2'))
+            self.assertEqual(len(self.stub.posts), 0)
+        self.assertEqual(batch.num_posts, 1)
+        self.assertEqual(self.stub.posts, [{'polUni': {'attributes': {}, 'children': [
+            self.tenant('t1', self.bd('bd1', descr='x'), self.bd('bd2')),
+            self.tenant('t2')]}}])
+
+    def test_merge_deleted(self):
+        """
+        Test that a deleted MO replaces the previously pushed one
+        """
+        writer = BatchWriter(self.session)
+        writer.add(self.tenant('t1', self.bd('bd1')))
+        writer.add(self.tenant('t1', self.bd('bd1', status='deleted')))
+        writer.add(self.tenant('t2', status='deleted'))
+        self.assertEqual(writer.get_json()['polUni']['children'], [
+            self.tenant('t1', self.bd('bd1', status='deleted')),
+            self.tenant('t2', status='deleted')])
+
+    def test_create_after_delete(self):
+        """
+        Test that an MO pushed after its deletion is sent in a later POST
+        """
+        with self.session.push_batch() as batch:
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t1', self.bd('bd1', status='deleted')))
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t2', status='deleted'))
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t1', self.bd('bd2')))
+            self.assertEqual(len(self.stub.posts), 0)
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t2', self.bd('bd2')))
+            self.assertEqual(len(self.stub.posts), 1)
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t1', self.bd('bd1')))
+        self.assertEqual(batch.num_posts, 2)
+        self.assertEqual([post['polUni']['children'] for post in self.stub.posts], [
+            [self.tenant('t1', self.bd('bd1', status='deleted'), self.bd('bd2')), self.tenant('t2', status='deleted')],
+            [self.tenant('t2', self.bd('bd2')), self.tenant('t1', self.bd('bd1'))]])
+
+    def test_merge_relations(self):
+        """
+        Test that the pushes of a relation are merged the same way as named MOs
+        """
+        def epg(*children):
+            return self.tenant('t1', {'fvAp': {'attributes': {'name': 'app'}, 'children': [
+                {'fvAEPg': {'attributes': {'name': 'epg'}, 'children': list(children)}}]}})
+
+        def cons(contract, **attributes):
+            attributes['tnVzBrCPName'] = contract
+            return {'fvRsCons': {'attributes': attributes, 'children': []}}
+
+        writer = BatchWriter(self.session)
+        writer.add(epg(cons('c1'), cons('c2')))
+        writer.add(epg(cons('c1', status='deleted')))
+        writer.add(epg(cons('c2')))
+        self.assertEqual(writer.get_json()['polUni']['children'], [
+            epg(cons('c1', status='deleted'), cons('c2'))])
+
+    def test_max_objects(self):
+        """
+        Test that the pending configuration is flushed when the limit is reached
+        """
+        with self.session.push_batch(max_objects=2) as batch:
+            for i in range(5):
+                self.session.push_to_apic('/api/mo/uni.json', self.tenant('t%s' % i))
+        self.assertEqual(batch.num_posts, 3)
+        self.assertEqual(len(self.stub.posts[0]['polUni']['children']), 2)
+
+    def test_flush_before_get(self):
+        """
+        Test that the batched configuration is pushed before a query
+        """
+        with self.session.push_batch():
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('t1'))
+            self.session.get('/api/class/fvCEp.json')
+            self.assertEqual(len(self.stub.posts), 1)
+
+    def test_failure(self):
+        """
+        Test that the objects are pushed individually when the batch fails
+        """
+        self.stub.rejected_names.add('bad')
+        with self.session.push_batch() as batch:
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('good1'))
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('bad'))
+            self.session.push_to_apic('/api/mo/uni.json', self.tenant('good2'))
+        self.assertEqual(batch.num_posts, 4)
+        self.assertEqual(len(batch.failures), 1)
+        self.assertEqual(batch.failures[0].data, self.tenant('bad'))
+        self.assertEqual(batch.failures[0].response.status_code, 400)
+
+    def test_other_thread_not_batched(self):
+        """
+        Test that only the thread using the batch is batched
+        """
+        with self.session.push_batch():
+            thread = threading.Thread(target=self.session.push_to_apic,
+                                      args=('/api/mo/uni.json', self.tenant('t1')))
+            thread.start()
+            thread.join()
+            self.assertEqual(len(self.stub.posts), 1)
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Tests for caching the responses of Session.get
+    """
+    def setUp(self):
+        self.stub = StubHTTPSession(10)
+        self.session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        self.session.session = self.stub
+        self.session.retry_backoff = 0
+        self.cache = self.session.enable_cache(ttl=60, max_entries=3)
+
+    def test_hit(self):
+        """
+        Test that the same query with the options in a different order is a hit
+        """
+        resp = self.session.get('/api/class/fvCEp.json?query-target=self&rsp-prop-include=naming-only')
+        cached = self.session.get('/api/class/fvCEp.json?rsp-prop-include=naming-only&query-target=self')
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(cached.json(), resp.json())
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_expired(self):
+        """
+        Test that an expired response is fetched again
+        """
+        self.cache.ttl = 0
+        self.session.get('/api/class/fvCEp.json')
+        time.sleep(0.01)
+        self.session.get('/api/class/fvCEp.json')
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used response is evicted
+        """
+        for name in ['a', 'b', 'c']:
+            self.session.get('/api/mo/uni/tn-%s.json' % name)
+        self.session.get('/api/mo/uni/tn-a.json')
+        self.session.get('/api/mo/uni/tn-d.json')
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertIsNone(self.cache.get('/api/mo/uni/tn-b.json'))
+        self.assertIsNotNone(self.cache.get('/api/mo/uni/tn-a.json'))
+
+    def test_not_cached(self):
+        """
+        Test that subscriptions, login refreshes and failed responses are not cached
+        """
+        self.session.get('/api/class/fvCEp.json?subscription=yes')
+        self.session.get('/api/aaaRefresh.json')
+        self.stub.failing_pages.add(0)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.session.get('/api/class/fvCEp.json?page=0&page-size=5')
+        self.assertEqual(self.cache.get_stats()['entries'], 0)
+
+    def test_invalidate_event(self):
+        """
+        Test that an event only invalidates the responses that may contain the MO
+        """
+        urls = ['/api/mo/uni/tn-a.json?query-target=subtree',
+                '/api/mo/uni/tn-b.json',
+                '/api/class/fvCEp.json',
+                '/api/class/fvTenant.json',
+                '/api/class/fvAEPg.json?rsp-subtree=full']
+        self.cache.max_entries = 10
+        for url in urls:
+            self.session.get(url)
+        event = {'subscriptionId': ['1'],
+                 'imdata': [{'fvCEp': {'attributes': {'dn': 'uni/tn-a/ap-b/epg-c/cep-1',
+                                                      'status': 'deleted'}}}]}
+        self.cache.invalidate_event(event)
+        self.assertEqual([url for url in urls if self.cache.get(url) is not None],
+                         ['/api/mo/uni/tn-b.json', '/api/class/fvTenant.json'])
+
+    def test_invalidate_subtree_classes(self):
+        """
+        Test that a subtree query limited to some classes is only invalidated by the events of these classes
+        """
+        url = '/api/class/fvTenant.json?query-target=subtree&target-subtree-class=fvTenant,fvBD'
+        self.session.get(url)
+        self.cache.invalidate('fvCEp', 'uni/tn-a/ap-b/epg-c/cep-1')
+        self.assertIsNotNone(self.cache.get(url))
+        self.cache.invalidate('fvBD', 'uni/tn-a/BD-b')
+        self.assertIsNone(self.cache.get(url))
+
+    def test_index(self):
+        """
+        Test that the entries removed from the cache are removed from its indexes
+        """
+        for url in ['/api/mo/uni/tn-a/ap-b.json', '/api/mo/uni/tn-b.json', '/api/class/fvCEp.json',
+                    '/api/class/fvTenant.json?rsp-subtree=full', '/api/mo/uni/tn-c.json']:
+            self.session.get(url)
+        self.cache.invalidate('fvAp', 'uni/tn-a/ap-b')
+        self.assertEqual(self.cache.get_stats()['entries'], 2)
+        self.cache.clear()
+        self.assertEqual((self.cache._any, self.cache._by_class, self.cache._by_dn, self.cache._below),
+                         (set(), {}, {}, {}))
+        self.session.get('/api/mo/uni/tn-a/ap-b.json')
+        self.cache.invalidate('fvTenant', 'uni/tn-a')
+        self.assertEqual((self.cache._by_dn, self.cache._below), ({}, {}))
+
+    def test_iter_imdata(self):
+        """
+        Test that iter_imdata shares the cached responses with get
+        """
+        url = '/api/class/fvCEp.json?query-target=self'
+        mos = list(self.session.iter_imdata(url, page_size=4))
+        self.assertEqual(len(self.stub.requests), 3)
+        mos[0]['fvCEp']['attributes']['dn'] = 'modified'
+        self.assertEqual(list(self.session.iter_imdata(url)), self.stub.objects)
+        self.assertEqual(self.session.get(url).json()['imdata'], self.stub.objects)
+        self.assertEqual(len(self.stub.requests), 3)
+        other_url = '/api/class/fvCEp.json?query-target=children'
+        next(self.session.iter_imdata(other_url, page_size=4))
+        self.assertIsNone(self.cache.get(other_url))
+
+    def test_push_clears(self):
+        """
+        Test that pushing configuration clears the cache
+        """
+        self.session.get('/api/class/fvCEp.json')
+        self.session.push_to_apic('/api/mo/uni.json', {'fvTenant': {'attributes': {'name': 'a'}}})
+        self.session.get('/api/class/fvCEp.json')
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_stale_response_not_cached(self):
+        """
+        Test that a response is not cached if an event arrived during the query
+        """
+        cache = ResponseCache()
+        generation = cache.generation
+        cache.invalidate('fvTenant', 'uni/tn-a')
+        cache.put('/api/mo/uni/tn-a.json', object(), generation)
+        self.assertIsNone(cache.get('/api/mo/uni/tn-a.json'))
+
+
+class TestGetChangesSince(unittest.TestCase):
+    """
+    Tests for collecting the MOs modified after a checkpoint
+    """
+    def test_get_changes_since(self):
+        """
+        Test that each class is queried with a modTs filter
+        """
+        stub = StubHTTPSession(10)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        mos = session.get_changes_since(['fvCEp', 'fvBD'], '2016-04-05T14:52:06.123+00:00', naming_only=True)
+        self.assertEqual(len(mos), 20)
+        queries = sorted(parse_qs(urlparse(url).query)['query-target-filter'][0] for url in stub.requests)
+        self.assertEqual(queries, ['gt(fvBD.modTs,"2016-04-05T14:52:06.123+00:00")',
+                                   'gt(fvCEp.modTs,"2016-04-05T14:52:06.123+00:00")'])
+        self.assertTrue(all('rsp-prop-include=naming-only' in url for url in stub.requests))
+        self.assertEqual(session.get_changes_since([], '2016-04-05T14:52:06.123+00:00'), [])
+
+
+class RecordingLimiter(object):
+    """
+    Rate limiter recording the requests it is asked to limit
+    """
+    def __init__(self):
+        self.acquired = 0
+        self.recorded = []
+
+    def acquire(self):
+        self.acquired += 1
+        return 0
+
+    def record(self, latency, ok):
+        self.recorded.append(ok)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Tests for limiting the rate of the requests sent to the APIC
+    """
+    def test_acquire_waits(self):
+        """
+        Test that requests beyond the burst are spread at the rate
+        """
+        limiter = RateLimiter(50, burst=1)
+        start = time.time()
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+    def test_adapt(self):
+        """
+        Test that the rate is halved once on congestion and grows back on success
+        """
+        limiter = RateLimiter(100)
+        limiter.record(0.1, False)
+        limiter.record(0.1, False)
+        self.assertEqual(limiter.rate, 50)
+        limiter.record(0.1, True)
+        self.assertEqual(limiter.rate, 55)
+        limiter._last_decrease = 0
+        limiter.record(limiter.target_latency + 1, True)
+        self.assertEqual(limiter.rate, 27.5)
+        for _ in range(100):
+            limiter.record(0.1, True)
+        self.assertEqual(limiter.rate, 100)
+
+    def test_min_rate(self):
+        """
+        Test that the rate never goes below the minimum rate
+        """
+        limiter = RateLimiter(100, min_rate=40)
+        for _ in range(3):
+            limiter._last_decrease = 0
+            limiter.record(0.1, False)
+        self.assertEqual(limiter.rate, 40)
+
+    def test_backoff_delay(self):
+        """
+        Test that the backoff grows exponentially up to the cap
+        """
+        for attempt in range(10):
+            delay = _backoff_delay(attempt, base=0.5, cap=10)
+            self.assertTrue(0 <= delay <= min(10, 0.5 * 2 ** attempt))
+
+    def test_url_prefix(self):
+        """
+        Test that the limiter with the longest matching prefix is used
+        """
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = StubHTTPSession(10)
+        default = RecordingLimiter()
+        config = RecordingLimiter()
+        session.set_rate_limiter(default)
+        session.set_rate_limiter(config, '/api/mo/uni.json')
+        session.get('/api/class/fvCEp.json')
+        session.push_to_apic('/api/mo/uni.json', {'fvTenant': {'attributes': {'name': 'a'}}})
+        self.assertEqual((default.acquired, config.acquired), (1, 1))
+        self.assertEqual(default.recorded, [True])
+        session.set_rate_limiter(None)
+        session.get('/api/class/fvCEp.json')
+        self.assertEqual(default.acquired, 1)
+
+
+class TestApicResponse(unittest.TestCase):
+    """
+    Tests for the responses decoded only once
+    """
+    def test_decoded_once(self):
+        """
+        Test that the decoded body is kept
+        """
+        stub = StubHTTPSession(10)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        resp = session.get('/api/class/fvCEp.json')
+        self.assertTrue(isinstance(resp, ApicResponse))
+        self.assertTrue(resp.json() is resp.json())
+        self.assertEqual(resp.total_count, 10)
+        self.assertEqual(len(resp.imdata), 10)
+
+    def test_apic_quirks(self):
+        """
+        Test that unescaped control characters and escaped single quotes are decoded
+        """
+        resp = ApicResponse.from_response(make_response({}))
+        resp._content = b'{"totalCount": "1", "imdata": [{"fvTenant": {"attributes": {"descr": "a\nb \\\'c\\\'"}}}]}'
+        self.assertEqual(resp.imdata[0]['fvTenant']['attributes']['descr'], "a\nb 'c'")
+
+    def test_paged_body_encoded_on_demand(self):
+        """
+        Test that the reassembled pages are only encoded when the body is read
+        """
+        stub = StubHTTPSession(1500)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        resp = session.get('/api/class/fvCEp.json')
+        self.assertTrue(resp._content is None)
+        self.assertEqual(resp.total_count, 1500)
+        self.assertEqual(json.loads(resp.text)['imdata'], resp.imdata)
+
+    def test_cache_copy(self):
+        """
+        Test that a cache hit does not share the decoded body
+        """
+        stub = StubHTTPSession(10)
+        session = Session('http://1.2.3.4', 'admin', 'password', subscription_enabled=False)
+        session.session = stub
+        session.enable_cache()
+        resp = session.get('/api/class/fvCEp.json')
+        del resp.json()['imdata'][:]
+        self.assertEqual(len(session.get('/api/class/fvCEp.json').imdata), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+################################################################################
+#                                                                              #
+# Copyright (c) 2015 Cisco Systems                                             #
+# All Rights Reserved.                                                         #
+#                                                                              #
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may   #
+#    not use this file except in compliance with the License. You may obtain   #
+#    a copy of the License at                                                  #
+#                                                                              #
+#         http://www.apache.org/licenses/LICENSE-2.0                           #
+#                                                                              #
+#    Unless required by applicable law or agreed to in writing, software       #
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT #
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the  #
+#    License for the specific language governing permissions and limitations  #
+#    under the License.                                                        #
+#                                                                              #
+################################################################################
+"""ACI Toolkit Benchmark module
+
+Measures the toolkit offline with Python 3.  Run it on two revisions of
+the toolkit to compare them::
+
+    python acitoolkit_benchmark.py memory [--count N]
+    python acitoolkit_benchmark.py relations [--count N]
+    python acitoolkit_benchmark.py get_deep [--tenants N] [--latency SECONDS]
+    python acitoolkit_benchmark.py events [--events N] [--subscriptions N [N ...]]
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from acitoolkit import (AppProfile, BridgeDomain, Contract, Endpoint, EPG, FakeSession, Filter, FilterEntry,
+                        Subnet, Tenant)
+from acitoolkit.aciConcreteLib import ConcreteEp
+from acitoolkit.acisession import Session, Subscriber
+
+
+def _create_endpoint(parents, i):
+    return Endpoint('ep-%s' % i, parents['epg'])
+
+
+def _create_epg(parents, i):
+    return EPG('epg-%s' % i, parents['app'])
+
+
+def _create_filter_entry(parents, i):
+    return FilterEntry('entry-%s' % i, parents['filter'], etherT='ip', prot='tcp',
+                       dFromPort=str(i), dToPort=str(i))
+
+
+def _create_subnet(parents, i):
+    return Subnet('subnet-%s' % i, parents['bd'])
+
+
+def _create_concrete_ep(parents, i):
+    return ConcreteEp()
+
+
+MEMORY_BENCHMARKS = [('Endpoint', _create_endpoint),
+                     ('EPG', _create_epg),
+                     ('FilterEntry', _create_filter_entry),
+                     ('Subnet', _create_subnet),
+                     ('ConcreteEp', _create_concrete_ep)]
+
+
+def measure_memory(create, count):
+    """
+    Measure the memory held by the objects of a class
+
+    :param create: function creating an object given its parents and index
+    :param count: Integer containing the number of objects created
+    :returns: Integer containing the number of bytes per object
+    """
+    tenant = Tenant('tenant')
+    parents = {'epg': EPG('epg', AppProfile('app', tenant)),
+               'app': AppProfile('app2', tenant),
+               'filter': Filter('filter', tenant),
+               'bd': BridgeDomain('bd', tenant)}
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [create(parents, i) for i in range(count)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return used // count
+
+
+def measure_relations(count):
+    """
+    Measure the time taken to relate EPGs and contracts and to look the
+    relations up in both directions
+
+    :param count: Integer containing the number of contracts provided and
+                  consumed by a single EPG
+    :returns: list of (step, seconds) tuples
+    """
+    tenant = Tenant('tenant')
+    app = AppProfile('app', tenant)
+    epgs = [EPG('epg-%s' % i, app) for i in range(10)]
+    contracts = [Contract('contract-%s' % i, tenant) for i in range(count)]
+    timings = []
+
+    start = time.time()
+    for contract in contracts:
+        epgs[0].provide(contract)
+        for epg in epgs:
+            epg.consume(contract)
+    timings.append(('provide/consume', time.time() - start))
+
+    start = time.time()
+    for contract in contracts:
+        epgs[0].does_provide(contract)
+        epgs[-1].does_consume(contract)
+    timings.append(('does_provide/consume', time.time() - start))
+
+    start = time.time()
+    for contract in contracts[:100]:
+        contract.get_all_consuming_epgs()
+    for epg in epgs:
+        epg.get_all_consumed()
+    timings.append(('get_all', time.time() - start))
+    return timings
+
+
+def _mo(class_name, dn, children=(), **attributes):
+    attributes['dn'] = dn
+    return {class_name: {'attributes': attributes, 'children': list(children)}}
+
+
+def create_fabric(num_tenants, num_epgs=10):
+    """
+    Create the configuration of a synthetic fabric.  Every tenant holds a
+    context, bridge domains, contracts and EPGs, and the EPGs also consume
+    a contract of tenant common.
+
+    :param num_tenants: Integer containing the number of tenants besides common
+    :param num_epgs: Integer containing the number of EPGs per tenant
+    :returns: list of fvTenant dictionaries
+    """
+    tenants = []
+    for name in ['common'] + ['tenant-%s' % i for i in range(num_tenants)]:
+        tn = 'uni/tn-%s' % name
+        children = [_mo('fvCtx', tn + '/ctx-ctx', name='ctx'),
+                    _mo('vzBrCP', tn + '/brc-contract', name='contract')]
+        if name == 'common':
+            children.append(_mo('vzBrCP', tn + '/brc-shared', name='shared'))
+        epgs = []
+        for i in range(num_epgs):
+            bd = 'bd-%s' % i
+            children.append(_mo('fvBD', '%s/BD-%s' % (tn, bd),
+                                [_mo('fvRsCtx', '%s/BD-%s/rsctx' % (tn, bd), tnFvCtxName='ctx', tRn='ctx-ctx'),
+                                 _mo('fvSubnet', '%s/BD-%s/subnet-[10.%s.0.1/24]' % (tn, bd, i),
+                                     ip='10.%s.0.1/24' % i, name='subnet')],
+                                name=bd))
+            epg_dn = '%s/ap-app/epg-epg-%s' % (tn, i)
+            epgs.append(_mo('fvAEPg', epg_dn,
+                            [_mo('fvRsBd', epg_dn + '/rsbd', tnFvBDName=bd),
+                             _mo('fvRsProv', epg_dn + '/rsprov-contract', tnVzBrCPName='contract'),
+                             _mo('fvRsCons', epg_dn + '/rscons-shared', tnVzBrCPName='shared')],
+                            name='epg-%s' % i))
+        children.append(_mo('fvAp', tn + '/ap-app', epgs, name='app'))
+        tenants.append(_mo('fvTenant', tn, children, name=name))
+    return tenants
+
+
+class LatencyFakeSession(FakeSession):
+    """
+    FakeSession taking a fixed time to answer each GET, standing in for the
+    round trip to the APIC
+    """
+    def __init__(self, filenames, latency):
+        super(LatencyFakeSession, self).__init__(filenames)
+        self.latency = latency
+        self.num_gets = 0
+
+    def get(self, url):
+        self.num_gets += 1
+        time.sleep(self.latency)
+        return super(LatencyFakeSession, self).get(url)
+
+
+def measure_get_deep(num_tenants, latency):
+    """
+    Measure the time taken by Tenant.get_deep to collect a synthetic fabric
+    with each way of fetching the tenants, and check they give the same
+    objects
+
+    :param num_tenants: Integer containing the number of tenants of the fabric
+    :param latency: Number of seconds taken by the fake APIC to answer a GET
+    :returns: list of (fetch, GETs, seconds) tuples
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'fabric.json')
+        with open(filename, 'w') as config_file:
+            json.dump({'imdata': create_fabric(num_tenants)}, config_file)
+        session = LatencyFakeSession([filename], latency)
+    finally:
+        shutil.rmtree(directory)
+    timings = []
+    expected = None
+    for fetch in ('serial', 'concurrent', 'uni'):
+        session.num_gets = 0
+        start = time.time()
+        tenants = Tenant.get_deep(session, fetch=fetch)
+        timings.append((fetch, session.num_gets, time.time() - start))
+        result = [tenant.get_json() for tenant in tenants]
+        if expected is None:
+            expected = result
+        elif result != expected:
+            raise ValueError('get_deep with fetch=%s returned different objects' % fetch)
+    return timings
+
+
+def measure_events(num_subscriptions, num_events):
+    """
+    Measure the rate at which subscription events are routed to their
+    subscriptions and read back.  Every event matches two subscriptions.
+
+    :param num_subscriptions: Integer containing the number of subscriptions
+    :param num_events: Integer containing the number of events
+    :returns: Number of events per second
+    """
+    session = Session('http://127.0.0.1', 'admin', 'password', subscription_enabled=False)
+    subscriber = Subscriber(session)
+    urls = ['/api/mo/uni/tn-%s.json?subscription=yes' % i for i in range(num_subscriptions)]
+    for i, url in enumerate(urls):
+        subscriber._set_subscription_id(url, str(10000 + i))
+    events = []
+    for i in range(num_events):
+        ids = [str(10000 + (i + offset) % num_subscriptions) for offset in (0, num_subscriptions // 2)]
+        events.append({'subscriptionId': ids,
+                       'imdata': [{'fvTenant': {'attributes': {'dn': 'uni/tn-%s' % i, 'status': 'modified'}}}]})
+    start = time.time()
+    for event in events:
+        subscriber._queue_event(event)
+    for url in urls:
+        while subscriber.has_events(url):
+            subscriber.get_event(url)
+    return num_events / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ACI Toolkit offline benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark')
+    memory_parser = subparsers.add_parser('memory', help='Bytes per object of the most common classes')
+    memory_parser.add_argument('--count', type=int, default=2000, help='Number of objects created per class')
+    relations_parser = subparsers.add_parser('relations', help='Relating EPGs and contracts and looking them up')
+    relations_parser.add_argument('--count', type=int, default=1000, help='Number of contracts related to each EPG')
+    get_deep_parser = subparsers.add_parser('get_deep', help='Tenant.get_deep of a synthetic fabric')
+    get_deep_parser.add_argument('--tenants', type=int, default=200, help='Number of tenants of the fabric')
+    get_deep_parser.add_argument('--latency', type=float, default=0.02, help='Seconds taken to answer each GET')
+    events_parser = subparsers.add_parser('events', help='Subscription events per second by subscription count')
+    events_parser.add_argument('--events', type=int, default=100000, help='Number of events routed')
+    events_parser.add_argument('--subscriptions', type=int, nargs='+', default=[10, 1000, 5000],
+                               help='Numbers of subscriptions measured')
+    args = parser.parse_args()
+
+    if args.benchmark == 'memory':
+        print('{0:<16} {1:>14}'.format('Class', 'Bytes/object'))
+        for name, create in MEMORY_BENCHMARKS:
+            print('{0:<16} {1:>14}'.format(name, measure_memory(create, args.count)))
+    elif args.benchmark == 'relations':
+        print('{0:<24} {1:>10}'.format('Step', 'Seconds'))
+        for step, seconds in measure_relations(args.count):
+            print('{0:<24} {1:>10.3f}'.format(step, seconds))
+    elif args.benchmark == 'get_deep':
+        print('{0:<12} {1:>6} {2:>10}'.format('Fetch', 'GETs', 'Seconds'))
+        for fetch, num_gets, seconds in measure_get_deep(args.tenants, args.latency):
+            print('{0:<12} {1:>6} {2:>10.3f}'.format(fetch, num_gets, seconds))
+    elif args.benchmark == 'events':
+        print('{0:>14} {1:>14}'.format('Subscriptions', 'Events/second'))
+        for num_subscriptions in args.subscriptions:
+            print('{0:>14} {1:>14.0f}'.format(num_subscriptions, measure_events(num_subscriptions, args.events)))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -47,6 +47,8 @@ import time
 import json
 import sys
 
+import requests
+
 try:
     from credentials import URL, LOGIN, PASSWORD, CERT_NAME, KEY
 except ImportError:
@@ -350,6 +352,182 @@ class TestBaseACIObject(unittest.TestCase):
         self.assertEqual(test_dic[obj1], 10)
         self.assertEqual(test_dic[obj2], 10)
 
+    def test_identity_cached(self):
+        """
+        Test that the identity key of an object is computed once
+        """
+        epg = EPG('epg', AppProfile('app', Tenant('tenant')))
+        hash(epg)
+        key = epg._get_identity()[0]
+        self.assertIs(epg._get_identity()[0], key)
+        self.assertEqual(epg, EPG('epg', AppProfile('app', Tenant('tenant'))))
+        self.assertNotEqual(epg, EPG('epg', AppProfile('app', Tenant('tenant2'))))
+
+    def test_identity_parent_subclass(self):
+        """
+        Test that the objects whose parents are of a class and of one of its
+        subclasses are identical, and those of two sibling subclasses are not
+        """
+        class SubTenant(Tenant):
+            pass
+
+        class OtherTenant(Tenant):
+            pass
+
+        app = AppProfile('app', Tenant('tenant'))
+        sub_app = AppProfile('app', SubTenant('tenant'))
+        self.assertEqual(app, sub_app)
+        self.assertEqual(sub_app, app)
+        self.assertEqual(hash(app), hash(sub_app))
+        self.assertEqual(len(set([app, sub_app])), 1)
+        self.assertNotEqual(AppProfile('app', OtherTenant('tenant')), sub_app)
+        self.assertEqual(EPG('epg', app), EPG('epg', sub_app))
+
+    def test_identity_rename(self):
+        """
+        Test that renaming or moving an ancestor changes the identity of
+        the objects below it
+        """
+        tenant = Tenant('tenant')
+        app = AppProfile('app', tenant)
+        epg = EPG('epg', app)
+        epgs = set([epg])
+        tenant.name = 'renamed'
+        self.assertNotIn(EPG('epg', AppProfile('app', Tenant('tenant'))), epgs)
+        self.assertEqual(epg, EPG('epg', AppProfile('app', Tenant('renamed'))))
+        app.set_parent(Tenant('other'))
+        self.assertEqual(epg, EPG('epg', AppProfile('app', Tenant('other'))))
+        self.assertIn(EPG('epg', AppProfile('app', Tenant('other'))), set([epg]))
+
+    def test_child_index(self):
+        """
+        Test looking up the children by class and by name
+        """
+        tenant = Tenant('tenant')
+        bds = [BridgeDomain('bd%s' % i, tenant) for i in range(5)]
+        contexts = [Context('ctx%s' % i, tenant) for i in range(5)]
+        self.assertEqual(tenant.get_children(BridgeDomain), bds)
+        self.assertEqual(tenant.get_children((BridgeDomain, Context)), tenant.get_children())
+        self.assertIs(tenant.get_child(Context, 'ctx3'), contexts[3])
+        self.assertIsNone(tenant.get_child(Context, 'bd3'))
+        self.assertTrue(tenant.has_child(BridgeDomain('bd4', Tenant('tenant'))))
+        self.assertFalse(tenant.has_child(Context('bd4', Tenant('tenant'))))
+        tenant.remove_child(bds[1])
+        self.assertEqual(tenant.get_children(BridgeDomain), [bds[0]] + bds[2:])
+        self.assertIsNone(tenant.get_child(BridgeDomain, 'bd1'))
+
+    def test_child_index_rename(self):
+        """
+        Test that the children are found by their new name after a rename
+        """
+        tenant = Tenant('tenant')
+        bd = BridgeDomain('bd', tenant)
+        self.assertIs(tenant.get_child(BridgeDomain, 'bd'), bd)
+        bd.name = 'renamed'
+        self.assertIsNone(tenant.get_child(BridgeDomain, 'bd'))
+        self.assertIs(tenant.get_child(BridgeDomain, 'renamed'), bd)
+        tenant._children = []
+        self.assertIsNone(tenant.get_child(BridgeDomain, 'renamed'))
+        self.assertEqual(tenant.get_children(BridgeDomain), [])
+
+    def test_relation_index(self):
+        """
+        Test looking up the relations and attachments by class, relation
+        type and item
+        """
+        tenant = Tenant('tenant')
+        app = AppProfile('app', tenant)
+        epgs = [EPG('epg%s' % i, app) for i in range(3)]
+        contracts = [Contract('contract%s' % i, tenant) for i in range(4)]
+        taboo = Taboo('taboo', tenant)
+        for contract in contracts:
+            epgs[0].provide(contract)
+        epgs[0].consume(contracts[2])
+        epgs[2].consume(contracts[2])
+        epgs[0].protect(taboo)
+        self.assertEqual(epgs[0].get_all_provided(), contracts)
+        self.assertEqual(epgs[0].get_all_consumed(), [contracts[2]])
+        self.assertTrue(epgs[0].does_provide(Contract('contract3', Tenant('tenant'))))
+        self.assertFalse(epgs[0].does_consume(contracts[3]))
+        self.assertEqual(contracts[2].get_all_consuming_epgs(), [epgs[0], epgs[2]])
+        self.assertEqual(contracts[2].get_all_providing_epgs(), [epgs[0]])
+        epgs[0].dont_provide(contracts[1])
+        self.assertEqual(epgs[0].get_all_provided(), [contracts[0]] + contracts[2:])
+        self.assertEqual(epgs[0].get_all_provided(deleted=True), [contracts[1]])
+        self.assertEqual(epgs[0].get_all_attached(BaseContract, relation_type='provided'),
+                         epgs[0].get_all_provided())
+        self.assertEqual(epgs[0].get_all_attached((Contract, Taboo)),
+                         [contracts[0]] + contracts[2:] + [contracts[2], taboo])
+
+    def test_relation_index_rename(self):
+        """
+        Test that the relations are found by the new name of their item
+        after a rename, and that attach and detach keep the index current
+        """
+        tenant = Tenant('tenant')
+        epg = EPG('epg', AppProfile('app', tenant))
+        contract = Contract('contract', tenant)
+        epg.consume(contract)
+        self.assertTrue(epg.does_consume(contract))
+        contract.name = 'renamed'
+        self.assertTrue(epg.does_consume(Contract('renamed', Tenant('tenant'))))
+        self.assertFalse(epg.does_consume(Contract('contract', Tenant('tenant'))))
+        bd = BridgeDomain('bd', tenant)
+        epg.attach(bd)
+        self.assertTrue(epg.is_attached(bd))
+        self.assertTrue(bd.has_attachment(epg))
+        epg.detach(bd)
+        self.assertTrue(epg.is_detached(bd))
+        self.assertFalse(epg.is_attached(bd))
+        self.assertTrue(bd.has_detachment(epg))
+        epg._relations = []
+        self.assertFalse(epg.does_consume(contract))
+        self.assertEqual(epg.get_all_consumed(), [])
+
+    def test_slots_attributes(self):
+        """
+        Test that the attributes held in __slots__ are listed the same
+        way as those held in the instance __dict__
+        """
+        tenant = Tenant('tenant')
+        app = AppProfile('app', tenant)
+        epg = EPG('epg', app)
+        endpoint = Endpoint('ep', epg)
+        endpoint.mac = '00:11:22:33:44:55'
+        self.assertEqual(endpoint.infoList()[0], ('name', 'ep'))
+        attributes = endpoint.get_attributes()
+        self.assertEqual(attributes['mac'], '00:11:22:33:44:55')
+        self.assertNotIn('timestamp', attributes)
+        endpoint.timestamp = '2016-04-05T10:00:00.000+00:00'
+        self.assertIn('timestamp', endpoint.get_attributes())
+        self.assertEqual(tenant.find(Endpoint('ep', EPG('epg', AppProfile('app', Tenant('tenant'))))), [endpoint])
+
+    def test_slots_attributes_order(self):
+        """
+        Test that the attributes are listed in the order they are set,
+        including those set before BaseACIObject.__init__ is called
+        """
+        def check_names(obj, names):
+            names += ['name', '_deleted', '_children', '_relations', '_attachments', '_tags', '_parent', 'descr',
+                      'dn', '_session']
+            self.assertEqual([name for name, _ in obj.infoList()], [name for name in names if name[0] != '_'])
+
+        tenant = Tenant('tenant')
+        for _ in range(2):
+            check_names(FilterEntry('entry', Filter('filter', tenant)),
+                        ['applyToFrag', 'arpOpc', 'dFromPort', 'dToPort', 'etherT', 'prot', 'sFromPort', 'sToPort',
+                         'tcpRules', 'stateful', 'icmpv4T', 'icmpv6T'])
+        check_names(OutsideL3('out', tenant), ['context_name', 'networks'])
+
+    def test_slots_other_attributes(self):
+        """
+        Test that attributes not declared in __slots__ can still be set
+        """
+        epg = EPG('epg', AppProfile('app', Tenant('tenant')))
+        epg.custom = 'value'
+        self.assertEqual(epg.get_attributes()['custom'], 'value')
+        self.assertEqual(epg.infoList()[-1], ('custom', 'value'))
+
 
 class TestTenant(unittest.TestCase):
     """
@@ -394,6 +572,174 @@ class TestTenant(unittest.TestCase):
         tenant = Tenant('mytenant', parent=fabric)
         self.assertRaises(TypeError, Tenant, 'badtenant', tenant)
 
+    def test_get_deep_since(self):
+        """
+        Test that only the tenants modified since the checkpoint are collected again
+        """
+        session = ModTsSession()
+        fabric = Fabric()
+        old_tenants = Tenant.get_deep(session, names=['a', 'b'], parent=fabric)
+        session.urls = []
+        session.changed_dns = ['uni/tn-b/BD-bd1']
+        tenants = Tenant.get_deep(session, names=['a', 'b'], parent=fabric, since='2016-04-05T14:52:06.123+00:00')
+        self.assertTrue(tenants[0] is old_tenants[0])
+        self.assertFalse(tenants[1] is old_tenants[1])
+        self.assertEqual(len(session.urls), 1)
+        self.assertTrue(session.urls[0].startswith('/api/mo/uni/tn-b.json'))
+        self.assertEqual(len(fabric.get_children(only_class=Tenant)), 2)
+        self.assertEqual(tenants[1].get_children(only_class=BridgeDomain)[0].name, 'bd1')
+
+    def test_get_deep_since_uni(self):
+        """
+        Test that the single query of uni is limited to the tenants modified since the checkpoint
+        """
+        session = FabricSession()
+        fabric = Fabric()
+        old_tenants = Tenant.get_deep(session, parent=fabric, fetch='uni')
+        session.changed_dns = ['uni/tn-a/BD-bd']
+        session.urls = []
+        tenants = Tenant.get_deep(session, parent=fabric, since='2016-04-05T14:52:06.123+00:00', fetch='uni')
+        self.assertEqual([tenant.name for tenant in tenants], ['common', 'a', 'b'])
+        self.assertIs(tenants[0], old_tenants[0])
+        self.assertIsNot(tenants[1], old_tenants[1])
+        self.assertIs(tenants[2], old_tenants[2])
+        self.assertEqual(len(session.urls), 1)
+        self.assertIn('query-target-filter=eq(fvTenant.name,"a")', requests.utils.unquote(session.urls[0]))
+
+    def test_get_deep_since_deleted(self):
+        """
+        Test that a tenant deleted since the checkpoint is dropped whichever way the tenants are fetched
+        """
+        results = {}
+        for fetch in ('serial', 'concurrent', 'uni'):
+            session = FabricSession()
+            fabric = Fabric()
+            Tenant.get_deep(session, parent=fabric, fetch=fetch)
+            session.tenants = [tenant for tenant in session.tenants if tenant['fvTenant']['attributes']['name'] != 'a']
+            tenants = Tenant.get_deep(session, parent=fabric, since='2016-04-05T14:52:06.123+00:00', fetch=fetch)
+            self.assertEqual([tenant.name for tenant in tenants], ['common', 'b'])
+            self.assertEqual(sorted(tenant.name for tenant in fabric.get_children(only_class=Tenant)), ['b', 'common'])
+            results[fetch] = [tenant.get_json() for tenant in tenants]
+        self.assertEqual(results['concurrent'], results['serial'])
+        self.assertEqual(results['uni'], results['serial'])
+
+    def test_get_deep_since_related(self):
+        """
+        Test that the unchanged tenants related to a modified tenant are collected again
+        """
+        for fetch in ('serial', 'concurrent', 'uni'):
+            session = FabricSession()
+            fabric = Fabric()
+            old_tenants = Tenant.get_deep(session, parent=fabric, fetch=fetch)
+            session.changed_dns = ['uni/tn-common/BD-bd']
+            tenants = Tenant.get_deep(session, parent=fabric, since='2016-04-05T14:52:06.123+00:00', fetch=fetch)
+            self.assertEqual([tenant.name for tenant in tenants], ['common', 'a', 'b'])
+            self.assertIsNot(tenants[0], old_tenants[0])
+            self.assertIs(tenants[1], old_tenants[1])
+            self.assertIsNot(tenants[2], old_tenants[2])
+            epg = tenants[2].get_child(AppProfile, 'app').get_child(EPG, 'epg')
+            self.assertIs(epg.get_all_consumed()[0].get_parent(), tenants[0])
+
+    def test_get_deep_fetch(self):
+        """
+        Test that the tenants fetched concurrently or with a single query of uni give the same objects
+        """
+        results = {}
+        for fetch in ('serial', 'concurrent', 'uni'):
+            session = FabricSession()
+            tenants = Tenant.get_deep(session, fetch=fetch)
+            results[fetch] = [tenant.get_json() for tenant in tenants]
+            self.assertEqual([tenant.name for tenant in tenants], ['common', 'a', 'b'])
+            epg = tenants[2].get_child(AppProfile, 'app').get_child(EPG, 'epg')
+            self.assertEqual(epg.get_bd().name, 'bd')
+            self.assertIs(epg.get_all_consumed()[0].get_parent(), tenants[0])
+            if fetch == 'uni':
+                self.assertEqual(len(session.urls), 1)
+                self.assertTrue(session.urls[0].startswith('/api/mo/uni.json?'))
+            else:
+                self.assertEqual(len(session.urls), 3)
+        self.assertEqual(results['concurrent'], results['serial'])
+        self.assertEqual(results['uni'], results['serial'])
+        session = FabricSession()
+        tenants = Tenant.get_deep(session, names=['b', 'common'], fetch='uni')
+        self.assertEqual([tenant.name for tenant in tenants], ['common', 'b'])
+        self.assertIn('query-target-filter', session.urls[0])
+        self.assertRaises(ValueError, Tenant.get_deep, session, fetch='bulk')
+
+
+class FabricSession(object):
+    """
+    Session stub serving a fabric of three tenants where the EPG of tenant b
+    consumes a contract of tenant common
+    """
+    max_page_workers = 4
+
+    def __init__(self):
+        self.urls = []
+        self.changed_dns = []
+        self.tenants = []
+        for name in ('a', 'b', 'common'):
+            dn = 'uni/tn-%s' % name
+            children = [{'fvBD': {'attributes': {'name': 'bd', 'dn': dn + '/BD-bd'}, 'children': []}}]
+            if name == 'common':
+                children.append({'vzBrCP': {'attributes': {'name': 'shared', 'dn': dn + '/brc-shared'},
+                                            'children': []}})
+            if name == 'b':
+                epg_dn = dn + '/ap-app/epg-epg'
+                epg = {'fvAEPg': {'attributes': {'name': 'epg', 'dn': epg_dn},
+                                  'children': [{'fvRsBd': {'attributes': {'tnFvBDName': 'bd',
+                                                                          'dn': epg_dn + '/rsbd'}}},
+                                               {'fvRsCons': {'attributes': {'tnVzBrCPName': 'shared',
+                                                                            'dn': epg_dn + '/rscons-shared'}}}]}}
+                children.append({'fvAp': {'attributes': {'name': 'app', 'dn': dn + '/ap-app'},
+                                          'children': [epg]}})
+            self.tenants.append({'fvTenant': {'attributes': {'name': name, 'dn': dn}, 'children': children}})
+
+    def iter_imdata(self, url, min_page_size=None):
+        if 'query-target=subtree' in url:
+            return [{'fvTenant': {'attributes': tenant['fvTenant']['attributes']}} for tenant in self.tenants]
+        self.urls.append(url)
+        return list(self.tenants)
+
+    def get_changes_since(self, class_names, timestamp, naming_only=False):
+        return [{'fvBD': {'attributes': {'dn': dn}}} for dn in self.changed_dns]
+
+    def get(self, url):
+        self.urls.append(url)
+        name = url.split('/tn-')[1].split('.json')[0]
+        data = {'imdata': [tenant for tenant in self.tenants if tenant['fvTenant']['attributes']['name'] == name]}
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps(data).encode()
+        return resp
+
+
+class ModTsSession(object):
+    """
+    Session stub serving tenants with a bridge domain and a fixed set of modified MOs
+    """
+    def __init__(self):
+        self.urls = []
+        self.changed_dns = []
+
+    def get_changes_since(self, class_names, timestamp, naming_only=False):
+        return [{'fvBD': {'attributes': {'dn': dn}}} for dn in self.changed_dns]
+
+    def iter_imdata(self, url):
+        return [{'fvTenant': {'attributes': {'name': name, 'dn': 'uni/tn-' + name}}} for name in ('a', 'b')]
+
+    def get(self, url):
+        self.urls.append(url)
+        name = url.split('/tn-')[1].split('.json')[0]
+        data = {'imdata': [{'fvTenant': {'attributes': {'name': name, 'dn': 'uni/tn-' + name},
+                                         'children': [{'fvBD': {'attributes': {'name': 'bd1',
+                                                                               'dn': 'uni/tn-%s/BD-bd1' % name},
+                                                                'children': []}}]}}]}
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps(data).encode()
+        return resp
+
 
 class TestAppProfile(unittest.TestCase):
     """